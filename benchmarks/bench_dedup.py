@@ -0,0 +1,64 @@
+# Patent family grouping on synthetic records: MinHash signature and LSH grouping times, and the
+# recall of planted near-duplicate families. One record per family is the original; the others
+# repeat it with a word changed, as translated filings in other jurisdictions do.
+# Run from the repository root: python benchmarks/bench_dedup.py [--records 1000 100000]
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from modules.patent_dedup import minhash_signatures, family_groups
+
+WORDS = 5000
+ABSTRACT_WORDS = 120
+FAMILY_SIZE = 4
+CHANGED_WORDS = 1
+
+
+def records(n, rng):
+    vocab = np.array([f"w{i}" for i in range(WORDS)])
+    families = np.arange(n) // FAMILY_SIZE
+    texts = []
+    base = None
+    for i in range(n):
+        if i % FAMILY_SIZE == 0:
+            base = vocab[rng.integers(0, WORDS, ABSTRACT_WORDS)]
+            words = base
+        else:
+            words = base.copy()
+            words[rng.integers(0, ABSTRACT_WORDS, CHANGED_WORDS)] = vocab[rng.integers(0, WORDS, CHANGED_WORDS)]
+        texts.append(" ".join(words))
+    return texts, families
+
+
+def run(n, seed=0):
+    texts, families = records(n, np.random.default_rng(seed))
+    start = time.perf_counter()
+    signatures = minhash_signatures(texts)
+    signed = time.perf_counter()
+    groups = family_groups(signatures)
+    grouped = time.perf_counter()
+    # A planted family is recovered when all its records, and no others, share one group
+    recovered = sum(len(set(groups[families == family])) == 1 for family in range(families.max() + 1)
+                    if (groups == groups[families == family][0]).sum() == FAMILY_SIZE)
+    return {"records": n, "signatures_s": round(signed - start, 3), "grouping_s": round(grouped - signed, 3),
+            "families": int(families.max() + 1), "groups": int(groups.max() + 1), "recovered": int(recovered),
+            "recall": round(recovered / (families.max() + 1), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    for n in args.records:
+        print(json.dumps(run(n)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# Headless rerun benchmark for every dashboard page on synthetic datasets scaled from data/ and
+# Patents/. Each (scale, page) runs in its own process against a Streamlit stand-in, and reports
+# exclusive time per phase (load, filter, figure, render, other) for each rerun plus peak RSS.
+# Run from the repository root: python benchmarks/bench_pages.py [--scales 10 100 1000] [--pages Map ...]
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+warnings.filterwarnings("ignore", message="Workbook contains no default style")
+
+DATA_ROOT = os.path.join(ROOT, "benchmarks", ".data")
+PHASES = ["load", "filter", "figure", "render"]
+
+# page label -> (module, scripted widget answers that exercise the page's hot paths)
+PAGES = {
+    "Map": ("modules.map_module", {
+        "st_folium": {"bounds": {"_southWest": {"lat": 20.0, "lng": 60.0}, "_northEast": {"lat": 50.0, "lng": 150.0}}},
+    }),
+    "Database Manager": ("modules.data_management_module", {
+        "Enter search term(s), separated by commas:": "china, industrial",
+        "Search patents (separate terms with commas):": "electrolyte",
+    }),
+    "References": ("modules.references_module", {"Enter search keyword:": "report"}),
+    "Analytics": ("modules.analytics_module", {"🔎 Filter patents by keyword (comma separated):": "lithium"}),
+    "Market Intelligence": ("modules.market_intelligence_module", {}),
+    "💡 Suggestions": ("modules.ideas_module", {}),
+}
+
+# Functions attributed to a phase, as (module, attribute); the page modules are patched where
+# they look the names up, so nested calls (a load inside a cached chart builder) are still split
+PHASE_FUNCTIONS = {
+    "load": [
+        ("modules.company_model", "load_data"),
+        ("modules.company_model", "CompanyModel"),
+        ("modules.market_model", "load_market_data"),
+        ("modules.data_management_module", "load_data"),
+        ("modules.references_module", "load_data"),
+        ("modules.analytics_module", "get_patent_counts"),
+        ("modules.ideas_module", "load_ideas"),
+        ("modules.ideas_module", "count_ideas"),
+        ("modules.ideas_module", "idea_authors"),
+        ("modules.patent_store", "load_patent_table"),
+        ("modules.patent_store", "load_patent_index"),
+        ("modules.patent_store", "tables_to_frame"),
+    ],
+    "filter": [
+        ("modules.map_module", "filter_companies"),
+        ("modules.map_module", "viewport_rows"),
+        ("modules.spatial_index.SpatialIndex", "nearest"),
+        ("modules.spatial_index.SpatialIndex", "aggregate"),
+        ("modules.data_management_module", "get_table_search"),
+        ("modules.data_management_module", "search_patents"),
+        ("modules.references_module", "get_table_search"),
+        ("modules.search_engine.TableSearch", "match_terms"),
+        ("modules.search_engine.TableSearch", "match_pattern"),
+    ],
+    "figure": [
+        ("modules.map_module", "build_map"),
+        ("modules.map_module", "build_charts"),
+        ("modules.market_intelligence_module", "build_charts"),
+        ("plotly.graph_objects.Figure", "__init__"),
+    ],
+}
+
+
+# ---------------- synthetic data ----------------
+def _scale_frame(df, scale, rng, suffix_columns=(), jitter_columns=(), factor_columns=()):
+    if df.empty:
+        return df
+    out = df.iloc[np.tile(np.arange(len(df)), scale)].reset_index(drop=True)
+    copy = np.repeat(np.arange(scale), len(df))
+    for col in suffix_columns:
+        if col in out.columns:
+            tag = pd.Series(np.where(copy > 0, " #" + copy.astype(str), ""), index=out.index)
+            out[col] = out[col].astype(str).where(out[col].notna()) + tag
+    for col in jitter_columns:
+        if col in out.columns:
+            out[col] = out[col] + np.where(copy > 0, rng.normal(0, 2.0, len(out)), 0.0)
+    for col in factor_columns:
+        if col in out.columns:
+            out[col] = out[col] * np.where(copy > 0, rng.uniform(0.5, 1.5, len(out)), 1.0)
+    return out
+
+
+def make_dataset(scale, data_root=DATA_ROOT, seed=0):
+    # Returns (data_dir, patent_dir); datasets are generated once and reused by later runs
+    base = os.path.join(data_root, f"x{scale}")
+    data_dir, patent_dir = os.path.join(base, "data"), os.path.join(base, "Patents")
+    if os.path.exists(os.path.join(base, "ready")):
+        return data_dir, patent_dir
+    shutil.rmtree(base, ignore_errors=True)
+    os.makedirs(data_dir)
+    os.makedirs(patent_dir)
+    rng = np.random.default_rng(seed)
+
+    sheets = pd.read_excel(os.path.join(ROOT, "data", "LiPF6_data.xlsx"), sheet_name=None, engine="openpyxl")
+    scaled = {
+        "Companies": _scale_frame(sheets["Companies"], scale, rng, suffix_columns=["Company"],
+                                  jitter_columns=["lat", "lon"],
+                                  factor_columns=["Current Capacity (t/year)", "Expansion Plans (t/year)"]),
+        "References": _scale_frame(sheets["References"], scale, rng, suffix_columns=["Reference"]),
+        "Patents_Favorites": _scale_frame(sheets["Patents_Favorites"], scale, rng, suffix_columns=["Publication Number"]),
+        "Dashboard_Ideas": _scale_frame(sheets["Dashboard_Ideas"], scale, rng, suffix_columns=["Idea"]),
+    }
+    with pd.ExcelWriter(os.path.join(data_dir, "LiPF6_data.xlsx"), engine="openpyxl") as writer:
+        for name, df in scaled.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    shutil.copy(os.path.join(ROOT, "data", "LiPF6_Market_Intelligence.xlsx"), data_dir)
+
+    source_dir = os.path.join(ROOT, "Patents")
+    for fname in sorted(os.listdir(source_dir)):
+        if fname.lower().endswith((".xlsx", ".xls")):
+            df = pd.read_excel(os.path.join(source_dir, fname), engine="openpyxl")
+            target = os.path.join(patent_dir, os.path.splitext(fname)[0] + ".xlsx")
+            _scale_frame(df, scale, rng, suffix_columns=["Publication Number"]).to_excel(target, index=False)
+
+    # Build the patent store up front, as a deployed dashboard would already have it
+    from modules.patent_store import sync_store
+    sync_store(patent_dir)
+
+    open(os.path.join(base, "ready"), "w").close()
+    return data_dir, patent_dir
+
+
+# ---------------- timing ----------------
+class PhaseTimer:
+    # Exclusive timing: entering a phase pauses the enclosing one, so phases never double count
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._stack = []  # [phase, started]
+
+    @contextmanager
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self.totals[outer[0]] += now - outer[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            inner = self._stack.pop()
+            self.totals[inner[0]] += now - inner[1]
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def reset(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+
+
+def _resolve(path):
+    import importlib
+    parts = path.split(".")
+    for i in range(len(parts), 0, -1):
+        try:
+            obj = importlib.import_module(".".join(parts[:i]))
+        except ImportError:
+            continue
+        for attr in parts[i:]:
+            obj = getattr(obj, attr)
+        return obj
+    raise ImportError(path)
+
+
+def _instrument(timer):
+    for phase, targets in PHASE_FUNCTIONS.items():
+        for owner_path, attr in targets:
+            owner = _resolve(owner_path)
+            original = getattr(owner, attr)
+
+            @functools.wraps(original)
+            def timed(*args, _original=original, _phase=phase, **kwargs):
+                with timer.phase(_phase):
+                    return _original(*args, **kwargs)
+
+            setattr(owner, attr, timed)
+
+
+def _peak_rss_mb():
+    # VmHWM is the peak resident set of this process image only (ru_maxrss would include the
+    # parent's peak, inherited across fork); falls back to ru_maxrss off Linux
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reset_peak_rss():
+    # Linux resets VmHWM to the current RSS when "5" is written to clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def run_page(page, reruns):
+    # Runs in the child process, after SPS_DATA_DIR / SPS_PATENT_DIR have been set
+    from benchmarks import streamlit_standin
+    st = streamlit_standin.install()
+    module_name, answers = PAGES[page]
+
+    import importlib
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_s = time.perf_counter() - start
+
+    timer = PhaseTimer()
+    _instrument(timer)
+    st.timer = timer
+    st.answers = answers
+    baseline_mb = _peak_rss_mb()
+
+    runs = []
+    for rerun in range(reruns):
+        timer.reset()
+        _reset_peak_rss()
+        start = time.perf_counter()
+        module.show()
+        total = time.perf_counter() - start
+        phases = {name: round(seconds, 6) for name, seconds in timer.totals.items()}
+        phases["other"] = round(max(total - sum(timer.totals.values()), 0.0), 6)
+        runs.append({"rerun": rerun, "total_s": round(total, 6), "phases": phases,
+                     "peak_rss_mb": round(_peak_rss_mb(), 1)})
+
+    return {"import_s": round(import_s, 6), "baseline_rss_mb": round(baseline_mb, 1), "runs": runs}
+
+
+def _child(args):
+    os.environ["SPS_DATA_DIR"] = args.data_dir
+    os.environ["SPS_PATENT_DIR"] = args.patent_dir
+    print(json.dumps(run_page(args.page, args.reruns), ensure_ascii=False))
+
+
+def run(scales, pages, reruns, data_root):
+    for scale in scales:
+        start = time.perf_counter()
+        data_dir, patent_dir = make_dataset(scale, data_root)
+        generate_s = time.perf_counter() - start
+        for page in pages:
+            # A fresh process per page keeps caches and peak memory from leaking between measurements
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--page", page, "--reruns", str(reruns),
+                 "--data-dir", data_dir, "--patent-dir", patent_dir],
+                capture_output=True, text=True, cwd=ROOT)
+            result = {"scale": scale, "page": page, "generate_s": round(generate_s, 3)}
+            if proc.returncode == 0:
+                result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+            else:
+                result["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), choices=list(PAGES))
+    parser.add_argument("--reruns", type=int, default=3, help="rerun 0 is cold, later reruns hit the caches")
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--page", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--patent-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args)
+    else:
+        run(args.scales, args.pages, args.reruns, args.data_root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Ranked (BM25) patent search on synthetic records split into files: term matrix build, save and
+# load per file, and top-k query latency over all files for rare, common and mixed queries.
+# Words follow a Zipf distribution, as in real abstracts.
+# Run from the repository root: python benchmarks/bench_ranked.py [--records 100000 1000000] [--files 10]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from modules.ranked_search import PATENT_FIELDS, TermMatrix, top_k
+
+WORDS = 50000
+TITLE_WORDS = 8
+ABSTRACT_WORDS = 60
+QUERIES = {"rare": "w40000 w45000", "common": "w1 w2", "mixed": "w3 w500 w20000 w30000"}
+TITLE, ABSTRACT = list(PATENT_FIELDS)
+
+
+def records(n, rng):
+    vocab = np.array([f"w{i}" for i in range(WORDS)], dtype=object)
+    words = vocab[np.minimum(rng.zipf(1.3, (n, TITLE_WORDS + ABSTRACT_WORDS)) - 1, WORDS - 1)]
+    return pd.DataFrame({TITLE: [" ".join(row) for row in words[:, :TITLE_WORDS]],
+                         ABSTRACT: [" ".join(row) for row in words[:, TITLE_WORDS:]]})
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+def run(n, files, k, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    per_file = n // files
+    result = {"records": n, "files": files, "k": k, "build_s": 0.0, "save_s": 0.0, "load_s": 0.0}
+    matrices = []
+    with tempfile.TemporaryDirectory() as folder:
+        for i in range(files):
+            df = records(per_file, rng)
+            start = time.perf_counter()
+            matrix = TermMatrix.build(df, PATENT_FIELDS)
+            built = time.perf_counter()
+            path = os.path.join(folder, f"{i}.bm25.npz")
+            matrix.save(path)
+            saved = time.perf_counter()
+            matrices.append(TermMatrix.load(path))
+            result["build_s"] += built - start
+            result["save_s"] += saved - built
+            result["load_s"] += time.perf_counter() - saved
+    for key in ("build_s", "save_s", "load_s"):
+        result[key] = round(result[key], 3)
+    for name, query in QUERIES.items():
+        result[f"query_{name}_ms"] = _best_ms(lambda: top_k(matrices, query, k), repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for n in args.records:
+        print(json.dumps(run(n, args.files, args.k, args.repeat)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Compares the shared vectorized search engine with the old DataFrame.apply(axis=1) searches.
+# Run from the repository root: python benchmarks/bench_search.py [--sizes 1000 100000 1000000]
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from modules.search_engine import TableSearch  # noqa: E402
+
+
+def make_table(base, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    # Make rows distinct so matches are spread through the table
+    for col in df.columns:
+        if df[col].dtype == object or pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype(str) + " #" + pd.Series(rng.integers(0, 10_000, n_rows)).astype(str)
+    return df
+
+
+def apply_terms(df, terms, column):
+    if column == "All":
+        return df.apply(lambda row: all(any(term in str(cell).lower() for cell in row) for term in terms), axis=1).to_numpy()
+    return df[column].astype(object).map(str).apply(lambda cell: all(term in cell.lower() for term in terms)).to_numpy()
+
+
+def apply_pattern(df, pattern, column):
+    if column == "All":
+        return df.apply(lambda row: row.astype(object).map(str).str.contains(pattern, case=False).any(), axis=1).to_numpy()
+    return df[column].astype(object).map(str).str.contains(pattern, case=False).to_numpy()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(sizes, apply_limit):
+    from modules.data_loader import load_data
+    cases = [
+        ("Companies", ["china", "industrial"], "All", "terms"),
+        ("Companies", ["lipf6"], "Technology", "terms"),
+        ("References", "benchmark", "All", "pattern"),
+        ("References", "report", "Note", "pattern"),
+    ]
+    tables = {name: load_data(name) for name in {case[0] for case in cases}}
+    results = []
+    for n_rows in sizes:
+        for sheet, query, column, kind in cases:
+            df = make_table(tables[sheet], n_rows)
+            engine, build_s = timed(TableSearch, df)
+            if kind == "terms":
+                mask, query_s = timed(engine.match_terms, query, column)
+            else:
+                mask, query_s = timed(engine.match_pattern, query, column)
+            row = {"sheet": sheet, "rows": n_rows, "column": column, "query": query,
+                   "build_s": build_s, "query_s": query_s, "matches": int(mask.sum())}
+            if n_rows <= apply_limit:
+                old_fn = apply_terms if kind == "terms" else apply_pattern
+                expected, apply_s = timed(old_fn, df, query, column)
+                row["apply_s"] = apply_s
+                row["same_result"] = bool(np.array_equal(expected.astype(bool), mask))
+            results.append(row)
+            print(json.dumps(row), flush=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--apply-limit", type=int, default=1_000_000,
+                        help="skip the slow apply-based baseline above this many rows")
+    args = parser.parse_args()
+    run(args.sizes, args.apply_limit)
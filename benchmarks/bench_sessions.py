@@ -0,0 +1,86 @@
+# Memory and load time for many concurrent sessions sharing the data layer. Each simulated
+# session (a thread) loads every sheet and the combined patent frame the way the pages do, edits
+# one cell of its Companies frame, and keeps everything referenced, as a live session would.
+# Run from the repository root: python benchmarks/bench_sessions.py [--scale 10] [--users 1 10 50]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_pages import DATA_ROOT, make_dataset
+
+SHEETS = ["Companies", "References", "Patents_Favorites", "Dashboard_Ideas"]
+
+
+def _rss_mb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def run_sessions(users):
+    # Runs in the child process, after SPS_DATA_DIR / SPS_PATENT_DIR have been set
+    from modules.data_loader import load_data, cache_stats
+    from modules import patent_store
+
+    fnames = patent_store.list_patent_files()
+    baseline_mb = _rss_mb()
+    held = []
+    lock = threading.Lock()
+
+    def session():
+        frames = [load_data(sheet) for sheet in SHEETS]
+        frames.append(patent_store.load_patents(fnames))
+        companies = frames[0]
+        companies.iloc[0, 0] = "edited"  # an unsaved data_editor change, private to this session
+        with lock:
+            held.append(frames)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    rss_mb = _rss_mb()
+    return {"users": users, "load_s": round(elapsed, 3), "baseline_rss_mb": round(baseline_mb, 1),
+            "rss_mb": round(rss_mb, 1), "growth_mb": round(rss_mb - baseline_mb, 1),
+            "frame_loads": cache_stats()["loads"]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--data-root", default=DATA_ROOT)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(run_sessions(args.child)))
+        return
+
+    data_dir, patent_dir = make_dataset(args.scale, args.data_root)
+    env = dict(os.environ, SPS_DATA_DIR=data_dir, SPS_PATENT_DIR=patent_dir)
+    for users in args.users:
+        # A fresh process per user count, so every run starts from cold caches
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(users)],
+                              capture_output=True, text=True, cwd=ROOT, env=env)
+        result = {"scale": args.scale}
+        if proc.returncode == 0:
+            result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+        else:
+            result["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Spatial index timings on synthetic producer sites: build, incremental update, viewport KPIs
+# (bounding box + capacity and scale counts), radius and k-nearest queries.
+# Run from the repository root: python benchmarks/bench_spatial.py [--sites 1000 100000]
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from modules.spatial_index import SpatialIndex
+
+VIEWPORTS = {"europe": (35.0, -10.0, 60.0, 30.0), "east_asia": (20.0, 100.0, 45.0, 145.0),
+             "pacific": (-30.0, 150.0, 30.0, -150.0), "world": (-90.0, -180.0, 90.0, 180.0)}
+
+
+def _best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+def run(sites, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = np.clip(rng.normal(30, 20, sites), -85, 85)
+    lon = rng.uniform(-180, 180, sites)
+    capacity = rng.lognormal(8, 1, sites)
+    scale_codes = rng.integers(0, 4, sites)
+    ids = np.arange(sites)
+
+    result = {"sites": sites, "build_ms": _best_ms(lambda: SpatialIndex(lat, lon, ids), repeat)}
+    index = SpatialIndex(lat, lon, ids)
+
+    moved = rng.choice(sites, max(1, sites // 100), replace=False)
+    lat2, lon2 = lat.copy(), lon.copy()
+    lat2[moved] += rng.normal(0, 1, len(moved))
+    result["update_1pct_ms"] = _best_ms(lambda: index.updated(lat2, lon2, ids), repeat)
+
+    def viewport(box):
+        rows = index.bbox(*box)
+        return np.nansum(capacity[rows]), np.bincount(scale_codes[rows], minlength=4)
+
+    for name, box in VIEWPORTS.items():
+        result[f"viewport_{name}_ms"] = _best_ms(lambda: viewport(box), repeat)
+    result["radius_500km_ms"] = _best_ms(lambda: index.radius(48.0, 10.0, 500.0), repeat)
+    result["nearest_10_ms"] = _best_ms(lambda: index.nearest(48.0, 10.0, 10), repeat)
+    result["regions_ms"] = _best_ms(lambda: index.aggregate(capacity), repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for sites in args.sites:
+        print(json.dumps(run(sites, args.repeat)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Cold-start report for main_app.py: for each page, a fresh interpreter runs the app against the
+# Streamlit stand-in under python -X importtime, and reports time to the sidebar (first paint),
+# total time, import time and which heavy dependencies were loaded. --eager imports every page
+# module first, as main_app.py did before the lazy page registry, for comparison.
+# Run from the repository root: python benchmarks/bench_startup.py [--pages References ...] [--eager]
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PAGES = ["Map", "Database Manager", "References", "Analytics", "Market Intelligence", "💡 Suggestions"]
+HEAVY_MODULES = ["numpy", "pandas", "pyarrow", "plotly", "folium", "geopy", "openpyxl"]
+TOP_IMPORTS = 10
+
+
+def _child(page, eager):
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from benchmarks import streamlit_standin
+    st = streamlit_standin.install()
+    st.answers = {"Go to:": page}
+    marks = {}
+    radio = st.radio
+
+    def first_paint(label, options, *args, **kwargs):
+        marks.setdefault("sidebar_s", round(time.perf_counter() - start, 6))
+        return radio(label, options, *args, **kwargs)
+
+    st.radio = first_paint
+    if eager:
+        import importlib
+        for module in ["map_module", "data_management_module", "references_module", "analytics_module",
+                       "market_intelligence_module", "ideas_module"]:
+            importlib.import_module("modules." + module)
+
+    import runpy
+    runpy.run_path(os.path.join(ROOT, "main_app.py"), run_name="__main__")
+    marks["total_s"] = round(time.perf_counter() - start, 6)
+    marks["heavy_modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(json.dumps(marks))
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:   self [us] | cumulative | imported package"
+    self_us = 0
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        self_us += int(fields[0])
+        name = fields[2].rstrip()
+        if not name.startswith("  "):  # nested imports are indented further
+            top.append((int(fields[1]), name.strip()))
+    top.sort(reverse=True)
+    return self_us / 1e6, [{"module": name, "cumulative_s": us / 1e6} for us, name in top[:TOP_IMPORTS]]
+
+
+def run(pages, eager):
+    # The app writes its SQLite store next to the workbook, so run against a scratch copy of data/
+    data_dir = tempfile.mkdtemp(prefix="sps_startup_")
+    try:
+        for name in os.listdir(os.path.join(ROOT, "data")):
+            if name.endswith(".xlsx"):
+                shutil.copy(os.path.join(ROOT, "data", name), data_dir)
+        env = dict(os.environ, SPS_DATA_DIR=data_dir)
+        for page in pages:
+            command = [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", page]
+            if eager:
+                command.append("--eager")
+            start = time.perf_counter()
+            proc = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, env=env)
+            result = {"page": page, "eager": eager, "process_s": round(time.perf_counter() - start, 6)}
+            if proc.returncode == 0:
+                result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+                result["import_s"], result["top_imports"] = parse_importtime(proc.stderr)
+            else:
+                result["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", nargs="+", default=PAGES, choices=PAGES)
+    parser.add_argument("--eager", action="store_true", help="import every page module up front (old main_app.py)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child, args.eager)
+    else:
+        run(args.pages, args.eager)
+
+
+if __name__ == "__main__":
+    main()
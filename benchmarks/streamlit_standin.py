@@ -0,0 +1,141 @@
+# Headless stand-in for the parts of the Streamlit API the dashboard pages use. Widgets return
+# scripted answers (by label) or their defaults, and output calls do the serialization work the
+# real frontend would trigger, timed as the "render" phase.
+import sys
+import types
+from contextlib import contextmanager
+
+
+class _Block:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(_module, name)
+
+
+class StreamlitStandIn(types.ModuleType):
+    def __init__(self):
+        super().__init__("streamlit")
+        self.answers = {}  # widget label -> value
+        self.timer = None  # PhaseTimer from bench_pages
+        self.session_state = {}
+        self.sidebar = _Block()
+
+    # ---------------- helpers ----------------
+    def _answer(self, label, default):
+        return self.answers.get(label, default)
+
+    @contextmanager
+    def _render(self):
+        if self.timer is None:
+            yield
+        else:
+            with self.timer.phase("render"):
+                yield
+
+    # ---------------- layout ----------------
+    def set_page_config(self, **kwargs):
+        pass
+
+    def columns(self, spec, **kwargs):
+        count = spec if isinstance(spec, int) else len(spec)
+        return [_Block() for _ in range(count)]
+
+    def container(self, **kwargs):
+        return _Block()
+
+    def expander(self, label, **kwargs):
+        return _Block()
+
+    def form(self, key, **kwargs):
+        return _Block()
+
+    def fragment(self, func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    # ---------------- widgets ----------------
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return self._answer(label, options[index] if options else None)
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return self._answer(label, list(default or []))
+
+    def radio(self, label, options, index=0, **kwargs):
+        return self._answer(label, list(options)[index])
+
+    def text_input(self, label, value="", **kwargs):
+        return self._answer(label, value)
+
+    def text_area(self, label, value="", **kwargs):
+        return self._answer(label, value)
+
+    def number_input(self, label, min_value=None, max_value=None, value="min", **kwargs):
+        if value == "min":
+            value = min_value if min_value is not None else 0.0
+        return self._answer(label, value)
+
+    def checkbox(self, label, value=False, **kwargs):
+        return self._answer(label, value)
+
+    def button(self, label, **kwargs):
+        return self._answer(label, False)
+
+    def form_submit_button(self, label="Submit", **kwargs):
+        return self._answer(label, False)
+
+    def data_editor(self, data, **kwargs):
+        self.dataframe(data)
+        return data
+
+    # ---------------- output ----------------
+    def dataframe(self, data, **kwargs):
+        import pyarrow as pa  # imported lazily so startup benchmarks see only the app's imports
+        with self._render():
+            if type(data).__name__ == "Styler":
+                data.to_html()  # what Streamlit does with a styled frame's display values
+                data = data.data
+            pa.Table.from_pandas(data)
+
+    def table(self, data, **kwargs):
+        self.dataframe(data)
+
+    def write(self, *args, **kwargs):
+        for arg in args:
+            if hasattr(arg, "to_dict") and hasattr(arg, "columns"):
+                self.dataframe(arg)
+
+    def plotly_chart(self, figure, **kwargs):
+        with self._render():
+            figure.to_json()
+
+    def _noop(self, *args, **kwargs):
+        pass
+
+    title = header = subheader = markdown = caption = info = warning = error = success = _noop
+    metric = balloons = progress = toast = _noop
+
+    def rerun(self):
+        pass
+
+
+def st_folium(m, **kwargs):
+    with _module._render():
+        m.get_root().render()
+    return _module._answer("st_folium", {})
+
+
+_module = StreamlitStandIn()
+
+
+def install():
+    # Must run before any dashboard module is imported
+    sys.modules["streamlit"] = _module
+    folium_module = types.ModuleType("streamlit_folium")
+    folium_module.st_folium = st_folium
+    sys.modules["streamlit_folium"] = folium_module
+    return _module
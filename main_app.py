@@ -1,32 +1,32 @@
+import importlib
 import streamlit as st
-from modules.map_module import show as show_map
-from modules.data_management_module import show as show_data_manager
-from modules.references_module import show as show_references
-from modules.analytics_module import show as show_analytics
-from modules.market_intelligence_module import show as show_market_intel
-from modules.ideas_module import show as show_ideas
+from modules import perf
+
+# Page label -> module with a show() function. Modules are imported on first navigation, so
+# folium, plotly, pyarrow and friends load only with the pages that use them.
+PAGES = {
+    "Map": "modules.map_module",
+    "Database Manager": "modules.data_management_module",
+    "References": "modules.references_module",
+    "Analytics": "modules.analytics_module",
+    "Market Intelligence": "modules.market_intelligence_module",
+    "💡 Suggestions": "modules.ideas_module",
+}
+
+
+def show_page(page):
+    importlib.import_module(PAGES[page]).show()
+
 
 st.set_page_config(layout="wide")
 
 st.sidebar.title("🔍 Navigation")
-page = st.sidebar.radio("Go to:", [
-    "Map",
-    "Database Manager",
-    "References",
-    "Analytics",
-    "Market Intelligence",
-    "💡 Suggestions"
-])
-
-if page == "Map":
-    show_map()
-elif page == "Database Manager":
-    show_data_manager()
-elif page == "References":
-    show_references()
-elif page == "Analytics":
-    show_analytics()
-elif page == "Market Intelligence":
-    show_market_intel()
-elif page == "💡 Suggestions":
-    show_ideas()
\ No newline at end of file
+page = st.sidebar.radio("Go to:", list(PAGES))
+show_perf = st.sidebar.checkbox("⏱️ Performance panel", key="perf_panel")
+
+with perf.rerun(page, record=show_perf) as run:
+    show_page(page)
+
+if show_perf:
+    from modules.perf_panel import show_panel
+    show_panel(run)
@@ -1,26 +1,54 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
+import numpy as np
 import os
-from modules.data_loader import load_data
+from modules.company_model import get_company_model, CAPACITY, EXPANSION
+from modules.patent_store import PATENT_FOLDER, FileConverting
+from modules.patent_aggregates import patent_counts as get_patent_counts
+from modules import perf
 
-PATENT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Patents")
 
+GROUP_ALL = "(all companies)"
+GROUP_COLUMNS = ["Country", "Technology", "Project Scale"]
 
-def get_internal_kpis(companies_df):
+
+def get_internal_kpis(model):
+    kpis = model.kpis
+    concentration = model.concentration(CAPACITY)
     return {
-        "Total Companies": len(companies_df),
-        "Total Current Capacity (t/year)": companies_df["Current Capacity (t/year)"].sum(),
-        "Average Capacity per Company": companies_df["Current Capacity (t/year)"].mean(),
-        "Industrial Scale Projects": (companies_df["Project Scale"].str.contains("industrial", case=False)).sum()
+        "Total Companies": kpis["companies"],
+        "Total Current Capacity (t/year)": kpis["total_capacity"],
+        "Average Capacity per Company": kpis["mean_capacity"],
+        "Industrial Scale Projects": kpis["mentions"]["industrial"],
+        "Capacity HHI (0-10,000)": np.nan_to_num(concentration["hhi"]),
+        "Top-4 Capacity Share (%)": np.nan_to_num(concentration["cr4"] * 100)
     }
 
 
+def show_concentration(model):
+    st.subheader("🏭 Capacity Concentration")
+    field = st.radio("Capacity", [CAPACITY, EXPANSION], horizontal=True, key="concentration_field")
+    group_by = st.selectbox("Group by", [GROUP_ALL] + [c for c in GROUP_COLUMNS if c in model.frame.columns],
+                            key="concentration_group")
+
+    if group_by == GROUP_ALL:
+        stats = model.concentration(field)
+        cols = st.columns(4)
+        cols[0].metric("Gini", f"{stats['gini']:.3f}")
+        cols[1].metric("HHI", f"{stats['hhi']:,.0f}")
+        cols[2].metric("CR4", f"{stats['cr4']:.1%}")
+        cols[3].metric("CR8", f"{stats['cr8']:.1%}")
+    else:
+        table = model.concentration(field, group_by).sort_values("total", ascending=False)
+        st.dataframe(table.style.format({"total": "{:,.0f}", "gini": "{:.3f}", "hhi": "{:,.0f}",
+                                         "cr4": "{:.1%}", "cr8": "{:.1%}"}))
+
+
 def show():
     st.header("📊 Analytics Dashboard")
 
-    companies_df = load_data("Companies")
-    internal_kpis = get_internal_kpis(companies_df)
+    model = get_company_model()
+    internal_kpis = get_internal_kpis(model)
 
     st.subheader("📌 KPI Comparison")
 
@@ -40,8 +68,12 @@ def show():
                 st.caption(f"🎯 Attainment: {attainment:.1f}%")
 
     st.markdown("---")
+
+    show_concentration(model)
+
+    st.markdown("---")
     
-    st.subheader("📚 Patents per Company (Pareto Chart)")
+    st.subheader("📚 Patent Families per Company (Pareto Chart)")
 
     search_keywords = st.text_input("🔎 Filter patents by keyword (comma separated):")
     keywords = [kw.strip().lower() for kw in search_keywords.split(",") if kw.strip()] if search_keywords else []
@@ -49,19 +81,11 @@ def show():
     patent_counts = {}
 
     if os.path.exists(PATENT_FOLDER):
-        files = [f for f in os.listdir(PATENT_FOLDER) if f.lower().endswith(".xlsx")]
-        for file in files:
-            path = os.path.join(PATENT_FOLDER, file)
-            try:
-                df = pd.read_excel(path)
-                company = os.path.splitext(file)[0]
-                if keywords:
-                    df_filtered = df[df.apply(lambda row: any(kw in str(cell).lower() for cell in row for kw in keywords), axis=1)]
-                    count = len(df_filtered)
-                else:
-                    count = len(df)
-                patent_counts[company] = count
-            except Exception as e:
+        patent_counts, errors = get_patent_counts(keywords)
+        for file, e in errors.items():
+            if isinstance(e, FileConverting):
+                st.info(f"⏳ {e}")
+            else:
                 st.warning(f"❌ Error reading {file}: {e}")
 
     if patent_counts:
@@ -77,12 +101,13 @@ def show():
             textposition='outside'
         ))
         fig.update_layout(
-            title="Number of Patents per Company",
-            yaxis_title="Patent Count",
+            title="Unique Patent Families per Company",
+            yaxis_title="Patent Families",
             xaxis_title="Company",
             template="plotly_white",
             height=450
         )
-        st.plotly_chart(fig)
+        with perf.span("plotly.render"):
+            st.plotly_chart(fig)
     else:
         st.info("No patent data available or no matches found.")
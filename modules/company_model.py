@@ -0,0 +1,155 @@
+import threading
+import numpy as np
+import pandas as pd
+from modules.data_loader import load_data, data_version
+from modules.search_engine import cell_text
+from modules.concentration import ConcentrationTracker
+from modules.spatial_index import SpatialIndex
+from modules import perf
+
+# Typed view of the Companies sheet for the read-only pages (map, analytics). The sheet is
+# validated and converted once per data version: low-cardinality text becomes categorical, so
+# the Project Scale keyword checks run over the distinct labels only, capacities become float
+# arrays, coordinates one contiguous (n, 2) array, and the headline KPIs are computed up front.
+COMPANIES_SHEET = "Companies"
+CAPACITY = "Current Capacity (t/year)"
+EXPANSION = "Expansion Plans (t/year)"
+SCHEMA = {
+    "Company": "text",
+    "Country": "category",
+    "Address": "text",
+    "Key Clients": "text",
+    "Technology": "category",
+    "Project Scale": "category",
+    "lat": "float",
+    "lon": "float",
+    CAPACITY: "float",
+    EXPANSION: "float",
+}
+REQUIRED_COLUMNS = ["Company", "Country", "Project Scale", "lat", "lon", CAPACITY]
+
+SCALE_KEYWORDS = ["industrial", "pilot", "upcoming"]
+SCALE_OTHER = "other"
+
+
+def project_scale_masks(scale):
+    # keyword -> boolean array of rows whose Project Scale mentions it (case-insensitive)
+    if isinstance(scale.dtype, pd.CategoricalDtype):
+        labels = cell_text(pd.Series(scale.cat.categories)).str.lower()
+        codes = scale.cat.codes.to_numpy()  # -1 for missing, which picks the trailing False
+        return {keyword: np.append(labels.str.contains(keyword, regex=False).to_numpy(dtype=bool), False)[codes]
+                for keyword in SCALE_KEYWORDS}
+    text = cell_text(scale).str.lower()
+    return {keyword: text.str.contains(keyword, regex=False).to_numpy(dtype=bool) for keyword in SCALE_KEYWORDS}
+
+
+def project_scale_category(scale):
+    masks = project_scale_masks(scale)
+    return np.select([masks[keyword] for keyword in SCALE_KEYWORDS], SCALE_KEYWORDS, default=SCALE_OTHER)
+
+
+def validate_companies(df):
+    # Returns (typed copy, list of issues); a missing required column is an error
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Companies sheet is missing column(s): {', '.join(missing)}")
+    typed = df.copy(deep=False)  # converted columns are replaced, the rest stay shared with df
+    issues = []
+    for col, kind in SCHEMA.items():
+        if col not in typed.columns:
+            continue
+        if kind == "float":
+            values = pd.to_numeric(typed[col], errors="coerce")
+            bad = int((values.isna() & typed[col].notna()).sum())
+            if bad:
+                issues.append(f"{col}: {bad} non-numeric value(s) treated as empty")
+            typed[col] = values.astype("float64")
+        elif kind == "category":
+            typed[col] = typed[col].astype("category")
+    return typed, issues
+
+
+class CompanyModel:
+    def __init__(self, df, version=None, previous=None):
+        self.version = version
+        self.frame, self.issues = validate_companies(df)
+        self.capacity = self.frame[CAPACITY].to_numpy(dtype=np.float64)
+        self.expansion = self.frame[EXPANSION].to_numpy(dtype=np.float64) if EXPANSION in self.frame.columns \
+            else np.full(len(self.frame), np.nan)
+        self.coords = np.ascontiguousarray(self.frame[["lat", "lon"]].to_numpy(dtype=np.float64))
+        self.has_coords = ~np.isnan(self.coords).any(axis=1)
+        self.scale_masks = project_scale_masks(self.frame["Project Scale"])
+        self.scale = pd.Categorical(np.select([self.scale_masks[k] for k in SCALE_KEYWORDS], SCALE_KEYWORDS,
+                                              default=SCALE_OTHER), categories=SCALE_KEYWORDS + [SCALE_OTHER])
+        self.kpis = self._kpis()
+        self._concentration = {}
+        # The spatial index and concentration trackers of the previous version are updated for the
+        # rows that changed
+        self._spatial = previous._spatial.updated(self.coords[:, 0], self.coords[:, 1], self.frame.index) \
+            if previous is not None and previous._spatial is not None else None
+        self._trackers = {}  # (field, column) -> ConcentrationTracker
+        for (field, column), tracker in (previous._trackers.items() if previous is not None else []):
+            if field in self.frame.columns and (column is None or column in self.frame.columns):
+                self._trackers[(field, column)] = tracker.updated(*self._tracker_data(field, column))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _kpis(self):
+        capacity = self.capacity[~np.isnan(self.capacity)]
+        codes = self.scale.codes
+        return {
+            "companies": len(self.frame),
+            "total_capacity": float(capacity.sum()),
+            "mean_capacity": float(capacity.mean()) if len(capacity) else float("nan"),
+            "total_expansion": float(np.nansum(self.expansion)),
+            "with_coordinates": int(self.has_coords.sum()),
+            # Rows mentioning each scale keyword, and rows per scale category (first keyword wins)
+            "mentions": {keyword: int(mask.sum()) for keyword, mask in self.scale_masks.items()},
+            "per_scale": {scale: int((codes == i).sum()) for i, scale in enumerate(self.scale.categories)},
+        }
+
+    def capacity_values(self, field=CAPACITY):
+        return self.capacity if field == CAPACITY else self.expansion if field == EXPANSION \
+            else self.frame[field].to_numpy(dtype=np.float64)
+
+    def _tracker_data(self, field, column):
+        return self.capacity_values(field), None if column is None else self.frame[column], self.frame.index
+
+    def concentration(self, field=CAPACITY, column=None):
+        # Overall stats dict, or a per-group DataFrame when column is given; memoized per model
+        key = (field, column)
+        if key not in self._concentration:
+            tracker = self._trackers.get(key)
+            if tracker is None:
+                tracker = self._trackers[key] = ConcentrationTracker(*self._tracker_data(field, column))
+            self._concentration[key] = tracker.stats() if column is None \
+                else tracker.table(pd.factorize(self.frame[column], sort=True)[1])
+        return self._concentration[key]
+
+    @property
+    def spatial(self):
+        if self._spatial is None:
+            self._spatial = SpatialIndex(self.coords[:, 0], self.coords[:, 1], self.frame.index)
+        return self._spatial
+
+    def positions(self, column=None, value="All"):
+        # Row positions where column equals value ("All" keeps every row)
+        if column is None or value == "All":
+            return np.arange(len(self.frame))
+        return np.flatnonzero((self.frame[column] == value).to_numpy(dtype=bool, na_value=False))
+
+
+_lock = threading.Lock()
+_model = None
+
+
+def get_company_model():
+    # Rebuilt only when the Companies sheet changes; shared by every session
+    global _model
+    version = data_version(COMPANIES_SHEET)
+    with _lock:
+        if _model is None or _model.version != version:
+            with perf.span("companies.model"):
+                _model = CompanyModel(load_data(COMPANIES_SHEET), version, previous=_model)
+        return _model
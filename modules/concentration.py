@@ -0,0 +1,207 @@
+import bisect
+import numpy as np
+import pandas as pd
+
+# Market concentration of capacity: Lorenz curve, Gini, Herfindahl-Hirschman index (on the usual
+# 0-10,000 scale) and CR4/CR8 (combined share of the four/eight largest), overall or per group.
+# Missing capacities are left out. Grouped figures come from one sort of the whole array, so
+# every group is computed in the same vectorized pass; ConcentrationTracker keeps them up to date
+# as companies change instead.
+TOP_N = (4, 8)
+COLUMNS = ["companies", "total", "gini", "hhi"] + [f"cr{n}" for n in TOP_N]
+REBUILD_FRACTION = 0.25  # ConcentrationTracker.updated() starts over when more rows than this changed
+
+
+def _clean(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def lorenz_curve(values):
+    # (x, y): cumulative share of companies (smallest first) against cumulative share of capacity
+    ordered = np.sort(_clean(values))
+    cum = np.concatenate(([0.0], np.cumsum(ordered)))
+    if cum[-1] != 0:
+        cum = cum / cum[-1]
+    return np.linspace(0, 1, len(cum)), cum
+
+
+def _gini(ascending, total):
+    n = len(ascending)
+    if n == 0 or total == 0:
+        return float("nan")
+    ranks = np.arange(1, n + 1)
+    return float(2 * np.dot(ranks, ascending) / (n * total) - (n + 1) / n)
+
+
+def concentration(values):
+    ascending = np.sort(_clean(values))
+    total = float(ascending.sum())
+    stats = {"companies": len(ascending), "total": total, "gini": _gini(ascending, total)}
+    if total == 0:
+        stats.update({"hhi": float("nan")}, **{f"cr{n}": float("nan") for n in TOP_N})
+        return stats
+    stats["hhi"] = float(np.square(ascending / total).sum() * 10_000)
+    for n in TOP_N:
+        stats[f"cr{n}"] = float(ascending[-n:].sum() / total)
+    return stats
+
+
+def grouped_concentration(values, groups):
+    # DataFrame indexed by group label with the columns in COLUMNS; rows without a group are skipped
+    values = np.asarray(values, dtype=np.float64)
+    groups = groups if isinstance(groups, pd.Series) else pd.Series(groups)
+    # Categorical groups (as CompanyModel stores them) factorize without hashing any strings
+    codes, labels = pd.factorize(groups, sort=True)
+    keep = (codes >= 0) & ~np.isnan(values)
+    values, codes = values[keep], codes[keep]
+    n_groups = len(labels)
+
+    # Largest first within each group: sort by value, then stably by group (a radix sort for
+    # small integer codes)
+    order = np.argsort(-values)
+    code_type = np.int16 if n_groups <= np.iinfo(np.int16).max else np.int64
+    order = order[np.argsort(codes[order].astype(code_type), kind="stable")]
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    rank = np.arange(len(values)) - starts[codes]  # 0 for each group's largest
+
+    totals = np.bincount(codes, weights=values, minlength=n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = values / totals[codes]
+        result = {"companies": counts, "total": totals,
+                  "hhi": np.bincount(codes, weights=shares ** 2, minlength=n_groups) * 10_000}
+        for n in TOP_N:
+            result[f"cr{n}"] = np.bincount(codes, weights=np.where(rank < n, shares, 0.0), minlength=n_groups)
+        # Gini with ascending ranks: the k-th largest of m values has ascending rank m - k
+        ascending_rank = counts[codes] - rank
+        weighted = np.bincount(codes, weights=ascending_rank * values, minlength=n_groups)
+        result["gini"] = 2 * weighted / (counts * totals) - (counts + 1) / counts
+    empty = totals == 0
+    for col in ["gini", "hhi"] + [f"cr{n}" for n in TOP_N]:
+        result[col] = np.where(empty, np.nan, result[col])
+    return pd.DataFrame(result, index=pd.Index(labels, name="group"))[COLUMNS]
+
+
+
+def _group_labels(groups):
+    # Object array of group labels with None where missing, or None when there are no groups
+    if groups is None:
+        return None
+    groups = pd.Series(groups)
+    if isinstance(groups.dtype, pd.CategoricalDtype):
+        # Categorical groups (as CompanyModel stores them): missing (code -1) picks the trailing None
+        return np.append(groups.cat.categories.to_numpy(dtype=object), None)[groups.cat.codes.to_numpy()]
+    groups = groups.astype(object)
+    return groups.where(groups.notna(), None).to_numpy(dtype=object)
+
+
+def _same(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class ConcentrationTracker:
+    # Keeps each group's values sorted so one company changing costs a binary search and an
+    # insert/delete, not a re-sort; totals and sums of squares are updated in O(1). Rows are keyed
+    # (e.g. by the Companies _row_id), and updated() carries the tracker over to a new version of
+    # the data by touching only the rows whose value or group changed.
+    def __init__(self, values, groups=None, keys=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.groups = _group_labels(groups)
+        self.keys = pd.RangeIndex(len(self.values)) if keys is None else pd.Index(keys)
+        self._sorted = {}  # group -> ascending list of values
+        self._totals = {}
+        self._squares = {}
+        counted = self._counted(np.arange(len(self.values)))
+        values = self.values[counted]
+        if self.groups is None:
+            codes, labels = np.zeros(len(values), dtype=np.int64), [None]
+        else:
+            codes, labels = pd.factorize(self.groups[counted])
+        order = np.lexsort((values, codes))
+        values, codes = values[order], codes[order]
+        counts = np.bincount(codes, minlength=len(labels))
+        totals = np.bincount(codes, weights=values, minlength=len(labels))
+        squares = np.bincount(codes, weights=values * values, minlength=len(labels))
+        for label, group_values, total, square in zip(labels, np.split(values, np.cumsum(counts)[:-1]), totals, squares):
+            if len(group_values):
+                self._sorted[label] = group_values.tolist()
+                self._totals[label] = float(total)
+                self._squares[label] = float(square)
+
+    def _counted(self, rows):
+        # The rows among rows that take part: a value, and a group when there are groups
+        keep = ~np.isnan(self.values[rows])
+        if self.groups is not None:
+            keep &= np.array([group is not None for group in self.groups[rows]], dtype=bool)
+        return rows[keep]
+
+    def _group(self, row):
+        return None if self.groups is None else self.groups[row]
+
+    def _add(self, group, value):
+        bisect.insort(self._sorted.setdefault(group, []), value)
+        self._totals[group] = self._totals.get(group, 0.0) + value
+        self._squares[group] = self._squares.get(group, 0.0) + value * value
+
+    def _remove(self, group, value):
+        values = self._sorted[group]
+        del values[bisect.bisect_left(values, value)]
+        if values:
+            self._totals[group] -= value
+            self._squares[group] -= value * value
+        else:
+            # Reset instead of subtracting, so an emptied group doesn't keep rounding residue
+            del self._sorted[group], self._totals[group], self._squares[group]
+
+    def updated(self, values, groups=None, keys=None):
+        # Tracker for new arrays; this one is left as it is for whoever still holds it
+        values = np.asarray(values, dtype=np.float64)
+        keys = pd.RangeIndex(len(values)) if keys is None else pd.Index(keys)
+        labels = _group_labels(groups)
+        if (labels is None) != (self.groups is None) or not (keys.is_unique and self.keys.is_unique):
+            return ConcentrationTracker(values, groups, keys)
+        old = self.keys.get_indexer(keys)
+        same = old >= 0
+        matched = old[same]
+        unchanged = _same(self.values[matched], values[same])
+        if labels is not None:
+            unchanged &= self.groups[matched] == labels[same]
+        same[same] = unchanged
+        changed = np.flatnonzero(~same)
+        gone = np.ones(len(self.keys), dtype=bool)
+        gone[old[same]] = False  # old rows not carried over unchanged: deleted, or changed
+        gone = np.flatnonzero(gone)
+        if len(changed) + len(gone) > REBUILD_FRACTION * max(len(values), 1):
+            return ConcentrationTracker(values, groups, keys)
+
+        tracker = ConcentrationTracker.__new__(ConcentrationTracker)
+        tracker.values, tracker.groups, tracker.keys = values, labels, keys
+        tracker._sorted = {group: list(group_values) for group, group_values in self._sorted.items()}
+        tracker._totals = dict(self._totals)
+        tracker._squares = dict(self._squares)
+        for row in self._counted(gone).tolist():
+            tracker._remove(self._group(row), float(self.values[row]))
+        for row in tracker._counted(changed).tolist():
+            tracker._add(tracker._group(row), float(values[row]))
+        return tracker
+
+    def stats(self, group=None):
+        # Concentration of one group (group=None is everything when no groups were given)
+        ascending = self._sorted.get(group, [])
+        total = self._totals.get(group, 0.0)
+        stats = {"companies": len(ascending), "total": total,
+                 "gini": _gini(np.asarray(ascending), total) if ascending else float("nan")}
+        if not ascending or total == 0:
+            stats.update({"hhi": float("nan")}, **{f"cr{n}": float("nan") for n in TOP_N})
+            return stats
+        stats["hhi"] = self._squares[group] / (total * total) * 10_000
+        for n in TOP_N:
+            stats[f"cr{n}"] = sum(ascending[-n:]) / total
+        return stats
+
+    def table(self, labels):
+        # grouped_concentration's frame for these group labels
+        return pd.DataFrame([self.stats(label) for label in labels], index=pd.Index(labels, name="group"),
+                            columns=COLUMNS)
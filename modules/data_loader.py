@@ -1,17 +1,256 @@
 import pandas as pd
 import os
+import threading
+import time
+from collections import OrderedDict
+from modules.storage import SheetStore
+from modules import perf
 
-def get_excel_path():
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)  # always on from pandas 3; load_data relies on it
+
+# Bounds for the process-wide frame cache (least recently used entry is evicted first)
+CACHE_MAX_ENTRIES = 16
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def get_data_dir():
+    # SPS_DATA_DIR points the dashboard at another data folder (used by the benchmarks)
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_dir, "..", "data", "LiPF6_data.xlsx")
+    return os.environ.get("SPS_DATA_DIR", os.path.join(base_dir, "..", "data"))
+
+
+def get_excel_path():
+    return os.path.join(get_data_dir(), "LiPF6_data.xlsx")
+
+
+def get_db_path():
+    return os.path.join(get_data_dir(), "LiPF6_data.db")
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _nbytes(value):
+    frames = value.values() if isinstance(value, dict) else [value]
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames))
+
+
+class _PendingLoad:
+    def __init__(self):
+        self._done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set(self, value=None, error=None):
+        self.value, self.error = value, error
+        self._done.set()
+
+    def result(self):
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class FrameCache:
+    # Entries are (key -> frame or {sheet: frame}); a key's group identifies the source, and a
+    # newly loaded version of a source supersedes every older entry of the same group
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (group, value, nbytes)
+        self._loading = {}  # key -> _PendingLoad
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+    def get(self, key, group, loader):
+        # Concurrent misses on one key share a single load, and other keys are served meanwhile
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            pending = self._loading.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._loading[key] = _PendingLoad()
+        if not owner:
+            return pending.result()
+
+        start = time.perf_counter()
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            pending.set(error=e)
+            raise
+        nbytes = _nbytes(value)
+        with self._lock:
+            self.load_seconds += time.perf_counter() - start
+            self.loads += 1
+            del self._loading[key]
+            # The new version replaces the old one in one step; readers holding the old one keep it
+            self._drop_group(group)
+            self._entries[key] = (group, value, nbytes)
+            self._evict()
+        pending.set(value)
+        return value
+
+    def invalidate(self, group=None):
+        with self._lock:
+            if group is None:
+                self._entries.clear()
+            else:
+                self._drop_group(group)
+
+    def has_group(self, group):
+        with self._lock:
+            return any(entry[0] == group for entry in self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "loads": self.loads,
+                "load_seconds": self.load_seconds,
+                "entries": len(self._entries),
+                "bytes": sum(nbytes for _, _, nbytes in self._entries.values()),
+            }
+
+    def _drop_group(self, group):
+        for key in [k for k, entry in self._entries.items() if entry[0] == group]:
+            del self._entries[key]
+
+    def _evict(self):
+        total = sum(nbytes for _, _, nbytes in self._entries.values())
+        # Always keep the most recent entry, even if it alone exceeds the byte budget
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            total -= nbytes
+            self.evictions += 1
+
+
+_cache = FrameCache()
+perf.register_cache("frames", _cache.stats)
+
+
+def load_workbook(path):
+    # Every sheet of an Excel file, parsed once per (path, mtime, size)
+    key = _file_key(path)
+    return _cache.get(key, key[0], perf.timed("excel.parse")(lambda: pd.read_excel(path, sheet_name=None, engine="openpyxl")))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SheetStore(get_db_path(), get_excel_path(), workbook_loader=load_workbook)
+        _store.ensure_ready()
+        return _store
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def data_version(sheet_name=None):
+    # Changes on every write to the sheet (or to any sheet); use it to key anything derived from load_data
+    return get_store().version(sheet_name)
+
+
+def load_snapshot(sheet_name):
+    # The one frame of this sheet version that every session shares; never modify it
+    store = get_store()
+    key = (store.db_path, sheet_name, store.version(sheet_name))
+    return _cache.get(key, (store.db_path, sheet_name), perf.timed("store.read")(lambda: store.read_sheet(sheet_name)))
+
 
 def load_data(sheet_name):
-    excel_path = get_excel_path()
-    return pd.read_excel(excel_path, sheet_name=sheet_name, engine="openpyxl")
+    # Callers may modify what they get back: a shallow copy shares the snapshot's columns, and
+    # copy-on-write copies only the columns a caller actually changes
+    return load_snapshot(sheet_name).copy(deep=False)
+
+
+def query_data(sheet_name, order_by=(), descending=False, limit=None, offset=0, terms=None, search_columns=None,
+               equals=None, index=()):
+    # A filtered, ordered window read straight from the store (not cached); index lists column
+    # groups to keep indexed for these queries, e.g. [("Timestamp",), ("Author", "Timestamp")]
+    store = get_store()
+    for columns in index:
+        store.ensure_index(sheet_name, columns)
+    with perf.span("store.query"):
+        return store.query_sheet(sheet_name, order_by, descending, limit, offset, terms, search_columns, equals)
+
+
+def count_data(sheet_name, terms=None, search_columns=None, equals=None):
+    return get_store().count_rows(sheet_name, terms, search_columns, equals)
+
+
+def distinct_values(sheet_name, column):
+    return get_store().distinct_values(sheet_name, column)
+
+
+def _refresh(sheet_name, result):
+    # Load the new version right after a write, so sessions switch to it without each reloading;
+    # sheets nobody has loaded whole (like the paged ideas) are left alone
+    store = get_store()
+    if _cache.has_group((store.db_path, sheet_name)):
+        load_snapshot(sheet_name)
+    return result
+
+
+def save_data(df, sheet_name, base=None):
+    # Only rows that differ are written; pass base (the frame the edit started from) when saving
+    # data_editor output so rows changed concurrently by someone else are left alone
+    with perf.span("store.write"):
+        result = get_store().save_sheet(sheet_name, df, base=base)
+    return _refresh(sheet_name, result)
+
+
+def append_rows(df, sheet_name):
+    with perf.span("store.write"):
+        result = get_store().append_rows(sheet_name, df)
+    return _refresh(sheet_name, result)
+
+
+def update_row(sheet_name, row_id, values):
+    with perf.span("store.write"):
+        result = get_store().update_row(sheet_name, row_id, values)
+    _refresh(sheet_name, result)
+
+
+def delete_rows(sheet_name, row_ids):
+    with perf.span("store.write"):
+        result = get_store().delete_rows(sheet_name, row_ids)
+    _refresh(sheet_name, result)
+
+
+def export_to_excel(path=None):
+    get_store().export_excel(path)
+
+
+def excel_conflict():
+    # The workbook on disk is newer than the database, which has edits it lacks, so it wasn't imported
+    return get_store().excel_conflict()
 
-def save_data(df, sheet_name):
-    excel_path = get_excel_path()
-    # Load existing sheets
-    with pd.ExcelWriter(excel_path, mode='a', engine='openpyxl', if_sheet_exists="replace") as writer:
-        df.to_excel(writer, sheet_name=sheet_name, index=False)
 
+def import_from_excel():
+    get_store().import_excel()
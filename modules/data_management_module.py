@@ -1,23 +1,92 @@
 import streamlit as st
-import pandas as pd
 import os
-import time
-from geopy.geocoders import Nominatim
-from modules.data_loader import load_data, save_data
-
-# Path to patent folder and favorite sheet
-PATENT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Patents")
-FAVORITES_SHEET = "Patents_Favorites"
-
-def geocode_address(address):
-    geolocator = Nominatim(user_agent="electrolyte_dashboard")
+import threading
+from concurrent.futures import as_completed
+from modules.data_loader import load_data, save_data, data_version, export_to_excel, excel_conflict, import_from_excel
+from modules.search_engine import get_table_search, split_terms
+from modules.geocoding import apply_coordinates, fill_from_cache, get_pipeline
+from modules import patent_store
+from modules.patent_store import PATENT_FOLDER
+from modules.patent_index import search_patents
+from modules.patent_dedup import FAMILY_COLUMN
+from modules.ranked_search import SCORE_COLUMN, TOP_K, top_k
+from modules.table_view import show_table, edit_table
+from modules.favorites import FAVORITES_SHEET, add_favorites
+from modules.jobs import submit, get_runner, frame_key, JobCancelled, ACTIVE
+from modules.job_view import track_job, show_job
+
+FILTER_MODE = "Filter (all terms)"
+RANKED_MODE = "Ranked by relevance"
+SEARCH_MODES = [FILTER_MODE, RANKED_MODE]
+# Columns the explorer adds to search results; favorites keep the patent records only
+RESULT_COLUMNS = [FAMILY_COLUMN, SCORE_COLUMN]
+
+_coordinates_lock = threading.Lock()
+
+
+def store_coordinates(address, lat, lon):
+    # Runs on the save job's thread as each lookup arrives
+    with _coordinates_lock:
+        companies = load_data("Companies")
+        base = companies.copy()
+        if apply_coordinates(companies, address, lat, lon):
+            save_data(companies, "Companies", base=base)
+
+
+def save_companies(job, updated_df, page_df):
+    # Background job: saves the edited rows, then geocodes the addresses the cache does not know
+    job.progress(0.0, "Saving companies…")
+    pending = fill_from_cache(updated_df)
+    save_data(updated_df, "Companies", base=page_df)
+    futures = {future: address for address, future in get_pipeline().submit_batch(pending).items()}
+    located = 0
     try:
-        location = geolocator.geocode(address)
-        if location:
-            return location.latitude, location.longitude
-    except:
-        pass
-    return None, None
+        for done, future in enumerate(as_completed(futures), 1):
+            if not future.cancelled() and future.exception() is None:
+                lat, lon = future.result()
+                if lat is not None and lon is not None:
+                    store_coordinates(futures[future], lat, lon)
+                    located += 1
+            job.progress(done / len(futures), f"Geocoded {done} of {len(futures)} new address(es)")
+    except JobCancelled:
+        for future in futures:
+            future.cancel()
+        raise
+    return {"addresses": len(futures), "located": located}
+
+
+def saved_message(result):
+    if result["addresses"]:
+        return f"✅ Database updated! Geocoded {result['located']} of {result['addresses']} new address(es)."
+    return "✅ Database updated successfully with geocoding!"
+
+
+def convert_patents(job, fnames):
+    def converted(fname, done, total):
+        job.progress(done / total, f"Converted {done} of {total} patent workbook(s)")
+    job.progress(0.0, f"Converting {len(fnames)} patent workbook(s)…")
+    entries, errors = patent_store.sync_files(fnames, on_file=converted)
+    return {"converted": len(entries), "errors": {fname: str(e) for fname, e in errors.items()}}
+
+
+def start_conversion(fnames):
+    # Converts new or changed workbooks in the background; True while that is in progress
+    stale = patent_store.stale_files(fnames)
+    if not stale:
+        return False
+    key = "convert_patents:" + ",".join(f"{fname}@{os.stat(os.path.join(PATENT_FOLDER, fname)).st_mtime_ns}"
+                                        for fname in stale)
+    latest = get_runner().latest(key)
+    if latest is not None and latest["status"] not in ACTIVE:
+        return False  # already tried; loading reports what still fails
+    track_job("patent_convert", submit("convert_patents", convert_patents, stale, key=key))
+    return True
+
+
+def add_favorites_job(job, rows):
+    job.progress(0.0, f"Saving {len(rows)} row(s) to favorites…")
+    return add_favorites(rows)
+
 
 def show():
     st.header("🗂️ Database Manager")
@@ -30,38 +99,26 @@ def show():
     search = st.text_input("Enter search term(s), separated by commas:", key="search_input")
 
     if search:
-        search_terms = [term.strip().lower() for term in search.split(",") if term.strip()]
-        if selected_column == 'All':
-            filtered = df[df.apply(lambda row: all(
-                any(term in str(cell).lower() for cell in row) for term in search_terms
-            ), axis=1)]
+        search_terms = split_terms(search)
+        table_search = get_table_search(("Companies", data_version("Companies")), df)
+        filtered = df[table_search.match_terms(search_terms, selected_column)]
+        if filtered.empty:
+            st.write("❌ No matches found!")
         else:
-            filtered = df[df[selected_column].astype(str).apply(
-                lambda cell: all(term in cell.lower() for term in search_terms)
-            )]
-        st.write(filtered if not filtered.empty else "❌ No matches found!")
+            show_table(filtered, "company_results", filterable=False)
 
     # --------------------- Section 2: Edit/Add/Delete Companies ---------------------
     st.subheader("📝 Edit, Add, or Delete Companies")
-    df = df.reset_index(drop=True)
-    edited_df = st.data_editor(df, num_rows="dynamic", key="companies_editor")
+    edited_df, page_df = edit_table(df, "companies", search_key=("Companies", data_version("Companies")),
+                                    num_rows="dynamic")
 
     if st.button("💾 Save Changes"):
         common_cols = [col for col in df.columns if col in edited_df.columns]
         updated_df = edited_df[common_cols].copy()
-
-        for idx, row in updated_df.iterrows():
-            if pd.isna(row.get('lat')) or pd.isna(row.get('lon')):
-                full_address = f"{row.get('Address', '')}, {row['Country']}"
-                lat, lon = geocode_address(full_address)
-                updated_df.at[idx, 'lat'] = lat
-                updated_df.at[idx, 'lon'] = lon
-
-        save_data(updated_df, "Companies")
-        st.success("✅ Database updated successfully with geocoding!")
+        track_job("companies_save", submit("save_companies", save_companies, updated_df, page_df,
+                                           key="save_companies:" + frame_key(updated_df)))
+    if show_job("companies_save", saved_message):
         st.balloons()
-        time.sleep(1.5)
-        st.rerun()
 
     # --------------------- Section 3: Patent Explorer ---------------------
     st.subheader("🔬 Patent Explorer")
@@ -70,7 +127,7 @@ def show():
         st.warning(f"⚠️ Patent folder not found at: {PATENT_FOLDER}")
         return
 
-    file_options = [f for f in os.listdir(PATENT_FOLDER) if f.lower().endswith(".xlsx")]
+    file_options = patent_store.list_patent_files()
     st.write("📁 Looking in:", PATENT_FOLDER)
     st.write("📄 Found files:", file_options)
 
@@ -81,79 +138,112 @@ def show():
     companies = [os.path.splitext(f)[0] for f in file_options]
     company_choice = st.selectbox("Select company file to search", ["All Companies"] + companies)
 
+    files_to_load = file_options if company_choice == "All Companies" else \
+        [f for f in file_options if patent_store.company_name(f) == company_choice]
+    converting = start_conversion(files_to_load)
+    if converting:
+        st.info("⏳ Converting new or changed patent workbooks in the background; the explorer opens when they are ready.")
+    converted = show_job("patent_convert", lambda result: f"✅ Converted {result['converted']} patent workbook(s).")
+    if converted and converted["result"]:
+        for fname, error in converted["result"]["errors"].items():
+            st.warning(f"❌ Error loading {fname}: {error}")
+
     def load_patents():
-        dfs = []
-        files_to_load = file_options if company_choice == "All Companies" else [company_choice + ".xlsx"]
-        for fname in files_to_load:
-            path = os.path.join(PATENT_FOLDER, fname)
+        loaded = []
+        indexes = []
+        # Anything still stale (a conversion that failed) is retried here before the
+        # (memory-mapped) tables are opened
+        entries, errors = patent_store.sync_files(files_to_load)
+        for fname, e in errors.items():
+            st.warning(f"❌ Error loading {fname}: {e}")
+        for fname in entries:
             try:
-                df_ = pd.read_excel(path)
-                df_["Source Company"] = os.path.splitext(fname)[0]
-                dfs.append(df_)
+                patent_store.load_patent_table(fname)
+                index = patent_store.load_patent_index(fname)
+                loaded.append(fname)
+                indexes.append(index)
             except Exception as e:
                 st.warning(f"❌ Error loading {fname}: {e}")
-        if dfs:
-            return pd.concat(dfs, ignore_index=True)
-        else:
-            return pd.DataFrame()
+        # The combined frame is shared by every session looking at the same files
+        return patent_store.load_patents(loaded), indexes, loaded
 
-    if company_choice:
-        patent_df = load_patents()
+    if company_choice and not converting:
+        patent_df, patent_indexes, patent_files = load_patents()
 
         if patent_df.empty:
             st.info("No data available from selected files.")
         else:
-            st.markdown("**Select columns to search**")
-            search_cols = st.multiselect("Columns:", patent_df.columns.tolist())
-            query = st.text_input("Search patents (separate terms with commas):")
-
-            if query and search_cols:
-                terms = [t.strip().lower() for t in query.split(",") if t.strip()]
-
-                def row_matches(row):
-                    combined_text = " ".join([str(row[col]).lower() for col in search_cols if col in row])
-                    return all(term in combined_text for term in terms)
-
-                results = patent_df[patent_df.apply(row_matches, axis=1)].reset_index(drop=True)
-                st.dataframe(results, use_container_width=True)
+            st.caption(f"{len(patent_df):,} records in {patent_df[FAMILY_COLUMN].nunique():,} unique patent families")
+            search_mode = st.radio("Search mode", SEARCH_MODES, horizontal=True, key="patent_search_mode")
+            ranked = search_mode == RANKED_MODE
+            if ranked:
+                # Titles and abstracts, best matches first
+                top = st.number_input("Top results", min_value=1, max_value=1000, value=TOP_K, step=10, key="patent_top_k")
+                query = st.text_input("Search patents by relevance:", key="patent_ranked_query")
+            else:
+                st.markdown("**Select columns to search**")
+                search_cols = st.multiselect("Columns:", [col for col in patent_df.columns if col not in RESULT_COLUMNS])
+                query = st.text_input("Search patents (separate terms with commas):")
+                prefix_only = st.checkbox("Match word beginnings only", key="patent_prefix")
+            one_per_family = st.checkbox("Show one record per patent family", key="patent_one_per_family")
+
+            if query and (ranked or search_cols):
+                if ranked:
+                    matrices = [patent_store.load_patent_matrix(fname) for fname in patent_files]
+                    rows, scores = top_k(matrices, query, int(top))
+                    results = patent_df.iloc[rows].assign(**{SCORE_COLUMN: scores.round(3)})
+                else:
+                    terms = [t.strip().lower() for t in query.split(",") if t.strip()]
+                    rows = search_patents(patent_df, patent_indexes, terms, search_cols, prefix=prefix_only)
+                    results = patent_df.iloc[rows]
+                st.caption(f"{len(results):,} {'top-ranked' if ranked else 'matching'} records in "
+                           f"{results[FAMILY_COLUMN].nunique():,} unique patent families")
+                if one_per_family:
+                    results = results.drop_duplicates(FAMILY_COLUMN)
+                results = results.reset_index(drop=True)
+                page = show_table(results, "patent_results", use_container_width=True)
 
                 st.markdown("### ⭐ Save Patents to Favorites")
 
                 selected_indexes = st.multiselect(
                     "Select row indexes to save:",
-                    options=list(results.index),
+                    options=list(page.index),
                     placeholder="Type or pick row numbers..."
                 )
 
                 if st.button("⭐ Add Selected Rows to Favorites"):
                     try:
-                        selected_rows = results.loc[selected_indexes]
-                        try:
-                            favorites = load_data(FAVORITES_SHEET)
-                            combined = pd.concat([favorites, selected_rows]).drop_duplicates()
-                        except:
-                            combined = selected_rows
-                        save_data(combined, FAVORITES_SHEET)
-                        st.success("✅ Selected rows added to favorites!")
+                        added = add_favorites(results.loc[selected_indexes].drop(columns=RESULT_COLUMNS, errors="ignore"))
+                        st.success(f"✅ {added} selected row(s) added to favorites!")
                     except Exception as e:
                         st.error(f"❌ Error processing selection: {e}")
 
                 if st.button("⭐ Add All Results to Favorites"):
-                    try:
-                        favorites = load_data(FAVORITES_SHEET)
-                        combined = pd.concat([favorites, results]).drop_duplicates()
-                    except:
-                        combined = results
-                    save_data(combined, FAVORITES_SHEET)
-                    st.success("✅ All search results added to favorites!")
+                    rows = results.drop(columns=RESULT_COLUMNS, errors="ignore")
+                    track_job("favorites_add", submit("add_favorites", add_favorites_job, rows,
+                                                      key="add_favorites:" + frame_key(rows)))
 
     # --------------------- View & Remove Favorites ---------------------
     st.subheader("📁 Favorite Patents")
+    show_job("favorites_add", lambda added: f"✅ {added} search result(s) added to favorites!")
     try:
         fav_df = load_data(FAVORITES_SHEET)
-        edited_fav = st.data_editor(fav_df, num_rows="dynamic", key="fav_editor")
+        edited_fav, fav_page = edit_table(fav_df, "favorites", num_rows="dynamic")
         if st.button("💾 Save Updated Favorites"):
-            save_data(edited_fav, FAVORITES_SHEET)
+            save_data(edited_fav, FAVORITES_SHEET, base=fav_page)
             st.success("Favorites updated!")
     except:
         st.info("No favorites saved yet.")
+
+    # --------------------- Excel Export ---------------------
+    st.subheader("📤 Excel Export")
+    if st.button("📤 Export database to Excel"):
+        export_to_excel()
+        st.success("✅ All sheets written to LiPF6_data.xlsx")
+    if excel_conflict():
+        st.warning("LiPF6_data.xlsx changed on disk, but the database has edits that aren't in it, so it "
+                   "wasn't imported. Export to keep the database, or import to replace it with the workbook.")
+        if st.button("📥 Import workbook (discards database edits)"):
+            import_from_excel()
+            st.success("✅ Database replaced with LiPF6_data.xlsx")
+            st.rerun()
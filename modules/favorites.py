@@ -0,0 +1,62 @@
+import threading
+import pandas as pd
+from modules.data_loader import load_data, append_rows, data_version
+from modules.search_engine import cell_text
+from modules.patent_store import SOURCE_COLUMN
+
+# Patent favorites keyed by (publication number, source company) rather than by every column,
+# so a re-exported patent whose legal status or abstract changed is still the same favorite.
+# The keys already saved are held in a set per sheet version; adding k rows costs O(k) lookups
+# and one append of the new rows, and the sheet is never rewritten.
+FAVORITES_SHEET = "Patents_Favorites"
+ID_COLUMN = "Publication Number"
+KEY_COLUMNS = [ID_COLUMN, SOURCE_COLUMN]
+
+_lock = threading.Lock()
+_index = {"version": None, "keys": set()}
+
+
+def favorite_keys(df):
+    # One hashable key per row; rows without a publication number fall back to their full content
+    parts = [cell_text(df[col]).str.strip() if col in df.columns else pd.Series("", index=df.index)
+             for col in KEY_COLUMNS]
+    missing = (parts[0] == "") | df[ID_COLUMN].isna() if ID_COLUMN in df.columns else pd.Series(True, index=df.index)
+    keys = list(zip(*parts))
+    if missing.any():
+        content = list(zip(*(cell_text(df[col]) for col in df.columns)))
+        keys = [("", tuple(row)) if miss else key for key, miss, row in zip(keys, missing, content)]
+    return keys
+
+
+def _saved_keys():
+    # Caller holds _lock
+    version = data_version(FAVORITES_SHEET)
+    if _index["version"] != version:
+        try:
+            favorites = load_data(FAVORITES_SHEET)
+        except ValueError:
+            favorites = pd.DataFrame(columns=KEY_COLUMNS)
+        _index["keys"] = set(favorite_keys(favorites))
+        _index["version"] = version
+    return _index["keys"]
+
+
+def add_favorites(rows):
+    # Appends the rows that are not favorites yet (repeats within rows count once); returns how many
+    with _lock:
+        saved = _saved_keys()
+        keep = []
+        for key in favorite_keys(rows):
+            keep.append(key not in saved)
+            saved.add(key)
+        new_rows = rows[keep]
+        if new_rows.empty:
+            return 0
+        try:
+            result = append_rows(new_rows, FAVORITES_SHEET)
+        except Exception:
+            _index["version"] = None  # the key set now has unsaved keys; rebuild it next time
+            raise
+        # Our own append is already in the key set; a write by someone else before it is not
+        _index["version"] = result["version"] if result["previous_version"] == _index["version"] else None
+        return len(new_rows)
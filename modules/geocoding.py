@@ -0,0 +1,191 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import pandas as pd
+from modules.data_loader import get_data_dir
+from modules import perf
+
+# Geocoding for company saves: a persistent address -> coordinate cache in front of a pluggable
+# backend, with duplicate addresses collapsed and lookups spread over a few worker threads
+# under a shared rate limit (Nominatim's usage policy allows one request per second).
+GEOCODE_CACHE_NAME = "geocode_cache.json"  # in the data folder
+GEOCODE_MISS_TTL = 30 * 24 * 3600  # seconds an address the backend didn't find is not asked again
+GEOCODE_WORKERS = 2
+GEOCODE_RATE_PER_SECOND = 1.0
+USER_AGENT = "electrolyte_dashboard"
+
+
+class NominatimGeocoder:
+    def __init__(self, user_agent=USER_AGENT, timeout=10):
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def geocode(self, address):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from geopy.geocoders import Nominatim
+            client = self._local.client = Nominatim(user_agent=self.user_agent, timeout=self.timeout)
+        location = client.geocode(address)
+        if location:
+            return location.latitude, location.longitude
+        return None, None
+
+
+class StaticGeocoder:
+    # Local stand-in backend: answers from a dict and never touches the network
+    def __init__(self, coordinates=None):
+        self.coordinates = dict(coordinates or {})
+        self.calls = []
+
+    def geocode(self, address):
+        self.calls.append(address)
+        return self.coordinates.get(address, (None, None))
+
+
+class RateLimiter:
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class GeocodeCache:
+    # address -> [lat, lon]; addresses the backend didn't find are kept as [None, None, time
+    # cached] and asked again once GEOCODE_MISS_TTL has passed
+    def __init__(self, path=None, miss_ttl=GEOCODE_MISS_TTL):
+        self.path = path or os.path.join(get_data_dir(), GEOCODE_CACHE_NAME)
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as fh:
+                    self._entries = {address: tuple(coords) for address, coords in json.load(fh).items()}
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def get(self, address):
+        with self._lock:
+            entry = self._load().get(address)
+        if entry is None:
+            return None
+        if entry[0] is None or entry[1] is None:
+            # Misses cached without a time predate the TTL and are retried too
+            if len(entry) < 3 or time.time() - entry[2] > self.miss_ttl:
+                return None
+            return None, None
+        return entry[:2]
+
+    def set(self, address, coords):
+        lat, lon = coords
+        with self._lock:
+            self._load()[address] = (lat, lon) if lat is not None and lon is not None else (None, None, time.time())
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(self._entries, fh, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class GeocodingPipeline:
+    def __init__(self, backend=None, cache=None, workers=GEOCODE_WORKERS, rate_per_second=GEOCODE_RATE_PER_SECOND):
+        self.backend = backend or NominatimGeocoder()
+        self.cache = cache or GeocodeCache()
+        self.limiter = RateLimiter(rate_per_second)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="geocode")
+        self._lock = threading.Lock()
+        self._in_flight = {}  # address -> Future
+
+    @perf.timed("geocode.lookup")
+    def _lookup(self, address):
+        self.limiter.wait()
+        coords = self.backend.geocode(address)
+        # Misses are cached for GEOCODE_MISS_TTL; exceptions (network errors) are not cached at all
+        self.cache.set(address, coords)
+        return coords
+
+    def _done(self, address, future):
+        with self._lock:
+            self._in_flight.pop(address, None)
+
+    def submit(self, address):
+        cached = self.cache.get(address)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            future = self._in_flight.get(address)
+            if future is None:
+                future = self._executor.submit(self._lookup, address)
+                self._in_flight[address] = future
+                future.add_done_callback(lambda f, address=address: self._done(address, f))
+        return future
+
+    def submit_batch(self, addresses):
+        # One lookup per distinct address, however often it appears in the batch
+        return {address: self.submit(address) for address in dict.fromkeys(addresses)}
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = GeocodingPipeline()
+        return _pipeline
+
+
+def set_pipeline(pipeline):
+    global _pipeline
+    with _pipeline_lock:
+        _pipeline = pipeline
+
+
+def company_addresses(df):
+    # "Address, Country" of every row (a missing Address column counts as empty)
+    address = df['Address'].astype(object).map(str) if 'Address' in df.columns else pd.Series("", index=df.index)
+    return address + ", " + df['Country'].astype(object).map(str)
+
+
+def missing_coordinates(df):
+    return df['lat'].isna() | df['lon'].isna()
+
+
+def fill_from_cache(df, pipeline=None):
+    # Fill what the cache already knows in place; returns the addresses that still need a lookup
+    pipeline = pipeline or get_pipeline()
+    pending = []
+    missing = missing_coordinates(df)
+    for idx, address in zip(df.index[missing], company_addresses(df[missing])):
+        coords = pipeline.cache.get(address)
+        if coords is not None:
+            df.at[idx, 'lat'], df.at[idx, 'lon'] = coords
+        else:
+            pending.append(address)
+    return list(dict.fromkeys(pending))
+
+
+def apply_coordinates(df, address, lat, lon):
+    if df.empty:
+        return False
+    rows = missing_coordinates(df) & (company_addresses(df) == address)
+    df.loc[rows, 'lat'] = lat
+    df.loc[rows, 'lon'] = lon
+    return bool(rows.any())
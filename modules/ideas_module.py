@@ -1,28 +1,93 @@
 import streamlit as st
 import pandas as pd
-import os
 from datetime import datetime
-from modules.data_loader import load_data, save_data
+from functools import lru_cache
+from modules.data_loader import query_data, count_data, distinct_values, data_version, append_rows, update_row, delete_rows
+from modules.search_engine import split_terms
 
 IDEAS_SHEET = "Dashboard_Ideas"
+IDEA_COLUMNS = ["Author", "Idea", "Response", "Timestamp"]
+SEARCH_COLUMNS = ["Author", "Idea", "Response"]
+# Newest first, and newest first per author
+IDEA_INDEXES = [("Timestamp",), ("Author", "Timestamp")]
+IDEAS_PER_PAGE = 10
+ALL_AUTHORS = "All authors"
+EDITING_KEY = "idea_editing"
+COUNT_CACHE_SIZE = 64
+
+
+def load_ideas(limit=None, offset=0, terms=None, author=None):
+    # One newest-first window of ideas, read from the store's indexes rather than the whole sheet
+    equals = {"Author": author} if author else None
+    try:
+        return query_data(IDEAS_SHEET, order_by=["Timestamp"], descending=True, limit=limit, offset=offset,
+                          terms=terms, search_columns=SEARCH_COLUMNS, equals=equals, index=IDEA_INDEXES)
+    except ValueError:
+        return pd.DataFrame(columns=IDEA_COLUMNS)
+
+
+@lru_cache(maxsize=COUNT_CACHE_SIZE)
+def _count_ideas(version, terms, author):
+    try:
+        return count_data(IDEAS_SHEET, terms=terms, search_columns=SEARCH_COLUMNS,
+                          equals={"Author": author} if author else None)
+    except ValueError:
+        return 0
 
 
-def load_ideas():
+def count_ideas(terms=None, author=None):
+    # Counting scans the sheet, so counts are kept until the next write to it
+    return _count_ideas(data_version(IDEAS_SHEET), tuple(terms) if terms else None, author)
+
+
+@lru_cache(maxsize=1)
+def _idea_authors(version):
     try:
-        return load_data(IDEAS_SHEET)
-    except:
-        return pd.DataFrame(columns=["Author", "Idea", "Response", "Timestamp"])
+        return [str(author) for author in distinct_values(IDEAS_SHEET, "Author")]
+    except ValueError:
+        return []
+
+
+def idea_authors():
+    return _idea_authors(data_version(IDEAS_SHEET))
 
 
-def save_ideas(df):
-    save_data(df, IDEAS_SHEET)
+def add_idea(author, idea_text):
+    append_rows(pd.DataFrame([{"Author": author, "Idea": idea_text, "Response": "", "Timestamp": datetime.now()}]), IDEAS_SHEET)
+
+
+def update_idea(idea_id, **values):
+    update_row(IDEAS_SHEET, idea_id, values)
+
+
+def delete_idea(idea_id):
+    delete_rows(IDEAS_SHEET, [idea_id])
+
+
+def show_editor(idx, row):
+    # Edit and response widgets exist only for the idea being edited
+    edited_idea = st.text_area("Edit your idea:", value=row['Idea'], key=f"edit_{idx}")
+    current_response = row["Response"] if pd.notna(row["Response"]) else ""
+    response = st.text_area("Your response:", value=current_response, key=f"response_{idx}")
+    col1, col2, col3 = st.columns(3)
+    if col1.button("💾 Save", key=f"save_{idx}"):
+        update_idea(idx, Idea=edited_idea, Response=response)
+        st.session_state[EDITING_KEY] = None
+        st.success("✏️ Idea updated!")
+        st.rerun()
+    if col2.button("Cancel", key=f"cancel_{idx}"):
+        st.session_state[EDITING_KEY] = None
+        st.rerun()
+    if col3.button("🗑️ Delete this idea", key=f"delete_{idx}"):
+        delete_idea(idx)
+        st.session_state[EDITING_KEY] = None
+        st.success("🗑️ Idea deleted!")
+        st.rerun()
 
 
 def show():
     st.title("💡 Dashboard Improvement Ideas")
 
-    ideas_df = load_ideas()
-
     st.subheader("📝 Submit a New Idea")
     with st.form("idea_form"):
         author = st.text_input("Your name")
@@ -30,58 +95,57 @@ def show():
         submitted = st.form_submit_button("Submit Idea")
 
         if submitted and author.strip() != "" and idea_text.strip() != "":
-            new_idea = pd.DataFrame([{"Author": author, "Idea": idea_text, "Response": "", "Timestamp": datetime.now()}])
-            ideas_df = pd.concat([ideas_df, new_idea], ignore_index=True)
-            save_ideas(ideas_df)
+            add_idea(author, idea_text)
             st.success("✅ Idea submitted successfully!")
             st.rerun()
 
     st.markdown("---")
     st.subheader("💬 All Suggestions")
 
-    for idx, row in ideas_df.iterrows():
+    col1, col2, col3 = st.columns([3, 2, 1])
+    query = col1.text_input("Search ideas (separate terms with commas):", key="ideas_search")
+    author_choice = col2.selectbox("Author", [ALL_AUTHORS] + idea_authors(), key="ideas_author")
+    terms = split_terms(query) if query else None
+    author_filter = None if author_choice == ALL_AUTHORS else author_choice
+
+    total = count_ideas(terms, author_filter)
+    pages = max(1, -(-total // IDEAS_PER_PAGE))
+    if st.session_state.get("ideas_page", 1) > pages:
+        st.session_state["ideas_page"] = pages
+    page = col3.number_input("Page", min_value=1, max_value=pages, step=1, key="ideas_page")
+    offset = (int(page) - 1) * IDEAS_PER_PAGE
+    ideas_df = load_ideas(IDEAS_PER_PAGE, offset, terms, author_filter)
+    if total:
+        st.caption(f"Ideas {offset + 1}–{offset + len(ideas_df)} of {total}, newest first")
+    else:
+        st.info("No ideas found.")
+
+    editing = st.session_state.get(EDITING_KEY)
+    for position, (idx, row) in enumerate(ideas_df.iterrows()):
         with st.container():
-            st.markdown(f"**💡 Idea #{idx+1}**")
+            # Numbered oldest = 1 within the current search, as in the full list
+            st.markdown(f"**💡 Idea #{total - offset - position}**")
+            submitted_on = row['Timestamp'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['Timestamp']) else "unknown date"
             st.markdown(f"""
                 <div style='padding:10px; background:#2c2f33; color:#ffffff; border-radius:10px'>
                     <i style='color:#bbb; font-size:13px;'>by {row['Author']}</i><br>
                     <b>{row['Idea']}</b><br>
-                    <small><i>Submitted on {row['Timestamp'].strftime('%Y-%m-%d %H:%M')}</i></small>
+                    <small><i>Submitted on {submitted_on}</i></small>
                 </div>
             """, unsafe_allow_html=True)
 
-            # Edit idea
-            with st.expander("✏️ Edit Idea"):
-                edited_idea = st.text_area("Edit your idea:", value=row['Idea'], key=f"edit_{idx}")
-                if st.button("Save Edit", key=f"save_{idx}"):
-                    ideas_df.at[idx, "Idea"] = edited_idea
-                    save_ideas(ideas_df)
-                    st.success("✏️ Idea updated!")
-                    st.rerun()
-
-            # Response to idea
-            with st.expander("💬 Respond to this idea"):
-                current_response = row["Response"] if pd.notna(row["Response"]) else ""
-                response = st.text_area("Your response:", value=current_response, key=f"response_{idx}")
-                if st.button("Save Response", key=f"response_btn_{idx}"):
-                    ideas_df.at[idx, "Response"] = response
-                    save_ideas(ideas_df)
-                    st.success("💬 Response saved!")
-                    st.rerun()
-
             # Display saved response if exists
-            if pd.notna(row["Response"]) and row["Response"].strip() != "":
+            if pd.notna(row["Response"]) and str(row["Response"]).strip() != "":
                 st.markdown(f"""
                     <div style='margin-top:5px; padding:10px; background:#dce7f8; color:#000; border-left: 4px solid #1f77b4; border-radius:5px'>
                         <b>🗨️ Response:</b><br>{row['Response']}
                     </div>
                 """, unsafe_allow_html=True)
 
-            # Delete button
-            if st.button("🗑️ Delete this idea", key=f"delete_{idx}"):
-                ideas_df = ideas_df.drop(index=idx).reset_index(drop=True)
-                save_ideas(ideas_df)
-                st.success("🗑️ Idea deleted!")
+            if editing == idx:
+                show_editor(idx, row)
+            elif st.button("✏️ Edit or respond", key=f"open_{idx}"):
+                st.session_state[EDITING_KEY] = idx
                 st.rerun()
 
             st.markdown("---")
@@ -0,0 +1,51 @@
+import streamlit as st
+from modules.jobs import get_runner, ACTIVE, DONE, CANCELLED
+
+# Progress of a session's background jobs. The session remembers the id of the job it started
+# under a slot name; while the job runs, a fragment redraws the progress bar every
+# JOB_POLL_SECONDS without rerunning the page, and once the job ends the whole page reruns so
+# it reads the saved data. The outcome is reported once and the slot is freed.
+JOB_POLL_SECONDS = 1.0
+JOBS_STATE = "background_jobs"
+
+
+def track_job(slot, job_id):
+    st.session_state.setdefault(JOBS_STATE, {})[slot] = job_id
+
+
+def tracked_job(slot):
+    return st.session_state.get(JOBS_STATE, {}).get(slot)
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(slot, job_id):
+    runner = get_runner()
+    job = runner.get(job_id)
+    if job is None or job["status"] not in ACTIVE:
+        st.rerun()
+    label = job["message"] or ("Waiting to start…" if job["status"] == "queued" else "Working…")
+    st.progress(job["progress"] or 0.0, text=label)
+    if st.button("✖ Cancel", key=f"{slot}_cancel"):
+        runner.cancel(job_id)
+
+
+def show_job(slot, success=None):
+    # Draws the job in slot; returns the finished job (once) so the caller can react to its result
+    job_id = tracked_job(slot)
+    if job_id is None:
+        return None
+    job = get_runner().get(job_id)
+    if job is not None and job["status"] in ACTIVE:
+        _job_progress(slot, job_id)
+        return None
+    del st.session_state[JOBS_STATE][slot]
+    if job is None:
+        return None
+    if job["status"] == DONE:
+        if success is not None:
+            st.success(success(job["result"]) if callable(success) else success)
+    elif job["status"] == CANCELLED:
+        st.warning("Cancelled.")
+    else:
+        st.error(f"❌ {job['error']}")
+    return job
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from modules.data_loader import get_data_dir
+
+# Background jobs for slow dashboard actions (saves with geocoding, bulk favorites, patent
+# conversion). Jobs run on a small thread pool in the server process, so they share the frame
+# caches and the row store; their status, progress and JSON result live in a SQLite table, so a
+# later rerun (or another session) picks them up. A job submitted under the key of one that is
+# still queued or running is not started again.
+JOB_WORKERS = int(os.environ.get("SPS_JOB_WORKERS", 0)) or 2
+JOB_HISTORY = 200  # finished jobs kept in the table
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+JOB_COLUMNS = ["id", "kind", "key", "status", "progress", "message", "result", "error",
+               "created", "started", "finished"]
+
+
+def get_jobs_path():
+    return os.path.join(get_data_dir(), "LiPF6_jobs.db")
+
+
+def _process_start(pid):
+    # Start time of a process (clock ticks since boot), so a reused pid isn't taken for its
+    # predecessor; "" where /proc isn't available
+    try:
+        with open(f"/proc/{pid}/stat") as fh:
+            text = fh.read()
+    except OSError:
+        return ""
+    return text[text.rindex(")") + 2:].split()[19]
+
+
+def _process_owner():
+    # host:pid:start time of this process, recorded on the jobs it runs
+    pid = os.getpid()
+    return f"{socket.gethostname()}:{pid}:{_process_start(pid)}"
+
+
+def _owner_alive(owner):
+    # Whether the process that owns a job may still finish it. Processes on other hosts can't be
+    # checked and are assumed alive; jobs recorded before owners were (owner None) are not.
+    if owner is None:
+        return False
+    host, pid, start = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return not start or _process_start(pid) == start
+
+
+def frame_key(df):
+    # Content digest of a frame, for job keys that should match when the same rows are resubmitted
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(repr(list(df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    # Handed to the job function as its first argument
+    def __init__(self, runner, job_id):
+        self.runner = runner
+        self.id = job_id
+
+    @property
+    def cancelled(self):
+        return self.runner._cancel_requested(self.id)
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, fraction, message=None):
+        # Records progress (0..1); raises JobCancelled once a cancel was requested
+        self.runner._update(self.id, progress=min(max(float(fraction), 0.0), 1.0), message=message)
+        self.check()
+
+
+class JobRunner:
+    def __init__(self, db_path, workers=JOB_WORKERS):
+        self.db_path = os.path.abspath(db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._futures = {}  # job id -> Future, for jobs of this process that have not finished
+        self._active_keys = {}  # key -> job id
+        self._cancels = set()
+        self.owner = _process_owner()
+        # Jobs left queued or running by a server process that has exited can no longer finish;
+        # those of other live processes sharing the data folder are left to them
+        conn = self._connect()
+        stale = [job_id for job_id, owner in conn.execute("SELECT id, owner FROM jobs WHERE status IN (?, ?)", ACTIVE)
+                 if not _owner_alive(owner)]
+        conn.executemany("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                         [(FAILED, "Interrupted by a server restart", time.time(), job_id) for job_id in stale])
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT, key TEXT, status TEXT, "
+                         "progress REAL, message TEXT, result TEXT, error TEXT, created REAL, started REAL, "
+                         "finished REAL, owner TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, created)")
+            if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")  # tables created before owners
+                except sqlite3.OperationalError:
+                    pass  # added by another process meanwhile
+            self._local.conn = conn
+        return conn
+
+    def _update(self, job_id, **values):
+        assignments = ", ".join(f"{col} = ?" for col in values)
+        self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(zip(JOB_COLUMNS, row))
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    # ---------------- submitting and running ----------------
+    def submit(self, kind, fn, *args, key=None, **kwargs):
+        # Runs fn(job, *args, **kwargs) in the background; returns the job id
+        with self._lock:
+            if key is not None and key in self._active_keys:
+                return self._active_keys[key]
+            job_id = uuid.uuid4().hex
+            conn = self._connect()
+            conn.execute("INSERT INTO jobs (id, kind, key, status, progress, created, owner) VALUES (?, ?, ?, ?, 0, ?, ?)",
+                         (job_id, kind, key, QUEUED, time.time(), self.owner))
+            conn.execute("DELETE FROM jobs WHERE status NOT IN (?, ?) AND id NOT IN "
+                         "(SELECT id FROM jobs ORDER BY created DESC LIMIT ?)", (*ACTIVE, JOB_HISTORY))
+            if key is not None:
+                self._active_keys[key] = job_id
+            self._futures[job_id] = self._executor.submit(self._run, job_id, key, fn, args, kwargs)
+            return job_id
+
+    def _run(self, job_id, key, fn, args, kwargs):
+        try:
+            if self._cancel_requested(job_id):
+                raise JobCancelled()
+            self._update(job_id, status=RUNNING, started=time.time())
+            result = fn(Job(self, job_id), *args, **kwargs)
+            self._update(job_id, status=DONE, progress=1.0, result=json.dumps(result, default=str),
+                         finished=time.time())
+        except JobCancelled:
+            self._update(job_id, status=CANCELLED, finished=time.time())
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=f"{type(e).__name__}: {e}", finished=time.time())
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._cancels.discard(job_id)
+                if key is not None and self._active_keys.get(key) == job_id:
+                    del self._active_keys[key]
+
+    def _cancel_requested(self, job_id):
+        return job_id in self._cancels
+
+    def cancel(self, job_id):
+        # Queued jobs never start; running ones stop at their next progress report
+        with self._lock:
+            if job_id in self._futures:
+                self._cancels.add(job_id)
+                self._update(job_id, message="Cancelling…")
+
+    # ---------------- queries ----------------
+    def get(self, job_id):
+        row = self._connect().execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def latest(self, key):
+        row = self._connect().execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE key = ? "
+                                      f"ORDER BY created DESC LIMIT 1", (key,)).fetchone()
+        return self._row(row)
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(get_jobs_path())
+        return _runner
+
+
+def submit(kind, fn, *args, key=None, **kwargs):
+    return get_runner().submit(kind, fn, *args, key=key, **kwargs)
@@ -1,16 +1,107 @@
 import streamlit as st
 import pandas as pd
-import folium
 from streamlit_folium import st_folium
 import plotly.graph_objects as go
 import numpy as np
-from modules.data_loader import load_data
+from functools import lru_cache
+from modules.data_loader import data_version
+from modules.map_rendering import RENDER_MODES, build_map
+from modules.company_model import get_company_model, CAPACITY, SCALE_KEYWORDS
+from modules.concentration import lorenz_curve
+from modules.table_view import show_table
+from modules import perf
+
+CHART_CACHE_SIZE = 32
+TOP_REGIONS = 10
+NEARBY_MODES = ["Nearest", "Within radius"]
+
+
+def filter_companies(df, column_choice, selected_value):
+    # df is the company model's shared frame; hand out a (copy-on-write) copy even unfiltered, so
+    # nothing the page adds to it reaches other sessions
+    if selected_value != "All":
+        return df[df[column_choice] == selected_value]
+    return df.copy(deep=False)
+
+
+def viewport_box(bounds):
+    # (south, west, north, east) from st_folium's bounds, or None until the map reports them;
+    # Leaflet longitudes run past ±180 once the map is panned around the globe
+    try:
+        south, west = bounds["_southWest"]["lat"], bounds["_southWest"]["lng"]
+        north, east = bounds["_northEast"]["lat"], bounds["_northEast"]["lng"]
+    except (KeyError, TypeError):
+        return None
+    if None in (south, west, north, east):
+        return None
+    if east - west >= 360:
+        return south, -180.0, north, 180.0
+    return south, (west + 180) % 360 - 180, north, (east + 180) % 360 - 180
+
+
+def viewport_rows(model, rows, box):
+    # The positions among rows whose site lies in the box (all of rows when there is no box)
+    if box is None:
+        return rows
+    in_view = np.zeros(len(model), dtype=bool)
+    in_view[model.spatial.bbox(*box)] = True
+    return rows[in_view[rows]]
+
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+@perf.timed("map.charts")
+def build_charts(version, filter_colors, column_choice, selected_value):
+    # Figures depend only on the Companies data version and these filters, so they are built
+    # once per combination and shared by every session; version just keys the cache
+    model = get_company_model()
+    rows = model.positions(column_choice, selected_value)
+    masks = model.scale_masks
+    keep = (masks["industrial"][rows] & ('red' in filter_colors)) | \
+           (masks["pilot"][rows] & ('green' in filter_colors)) | \
+           (masks["upcoming"][rows] & ('blue' in filter_colors))
+    rows = rows[keep]
+    filtered_df = pd.DataFrame({'Company': model.frame['Company'].to_numpy()[rows], 'Volume': model.capacity[rows]})
+
+    top_df = filtered_df.sort_values(by='Volume', ascending=False).head(10)
+    total_filtered = filtered_df['Volume'].sum()
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=top_df['Company'],
+        y=top_df['Volume'],
+        marker_color='lightskyblue',
+        text=(top_df['Volume'] / total_filtered * 100).apply(lambda x: f"{x:.2f}%"),
+        textposition='outside'
+    ))
+    fig.update_layout(
+        template="plotly_dark",
+        yaxis_title="Production Capacity (t/year)",
+        xaxis_title="Company",
+        height=450,
+        margin=dict(t=50)
+    )
+
+    x, cum_data = lorenz_curve(filtered_df['Volume'].values)
+    fig_lorenz = go.Figure()
+    fig_lorenz.add_trace(go.Scatter(x=x, y=cum_data, mode='lines', name='Lorenz Curve'))
+    fig_lorenz.add_shape(type='line', x0=0, y0=0, x1=1, y1=1, line=dict(dash='dash', color='green'))
+    fig_lorenz.update_layout(xaxis_title="Cumulative Companies", yaxis_title="Cumulative Capacity")
+
+    labels = filtered_df['Company'].tolist()
+    values = filtered_df['Volume'].tolist()
+    fig_pie = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.3)])
+    fig_pie.update_layout(title="Current Capacity Distribution by Company")
+    return fig, fig_lorenz, fig_pie
+
+
+perf.register_cache("map_charts", perf.lru_stats(build_charts))
 
 
 def show():
     st.title("🌍 Global LiPF₆ Producers Map")
 
-    df = load_data("Companies")
+    model = get_company_model()
+    df = model.frame
 
     # FILTERS BLOCK
     st.subheader("🔍 Filters")
@@ -21,63 +112,37 @@ def show():
         unique_values = df[column_choice].dropna().unique().tolist()
         selected_value = st.selectbox(f"Filter by value in '{column_choice}'", ["All"] + unique_values)
 
-    if selected_value != "All":
-        df = df[df[column_choice] == selected_value]
+    df = filter_companies(df, column_choice, selected_value)
 
     # MAP BLOCK
-    seen_coords = set()
-
-    def adjust_coords(lat, lon):
-        offset = 0.02
-        while (lat, lon) in seen_coords:
-            lat += offset
-            lon += offset
-        seen_coords.add((lat, lon))
-        return lat, lon
-
-    m = folium.Map(location=[20, 0], zoom_start=2, tiles="cartodbpositron")
-    color_counts = {"red": 0, "green": 0, "blue": 0}
-
-    for _, row in df.iterrows():
-        if pd.notnull(row['lat']) and pd.notnull(row['lon']):
-            lat, lon = adjust_coords(row['lat'], row['lon'])
-            project_type = str(row['Project Scale']).lower()
-            if "industrial" in project_type:
-                color = 'red'
-                color_counts['red'] += 1
-            elif "pilot" in project_type:
-                color = 'green'
-                color_counts['green'] += 1
-            elif "upcoming" in project_type:
-                color = 'blue'
-                color_counts['blue'] += 1
-            else:
-                color = 'gray'
-
-            html_popup = f"""
-            <div style='width:200px; font-size: 14px;'>
-                <h4>{row['Company']}</h4>
-                <p><b>Country:</b> {row['Country']}<br>
-                <b>Address:</b> {row.get('Address', 'N/A')}<br>
-                <b>Current Capacity:</b> {row['Current Capacity (t/year)']} tons/year <br>
-                <b>Expansion Plans:</b> {row['Expansion Plans (t/year)']} tons/year <br>
-                <b>Key Clients:</b> {row['Key Clients']}<br>
-                <b>Technology:</b> {row['Technology']}<br>
-                <b>Scale:</b> {row['Project Scale']}</p>
-            </div>
-            """
-            folium.Marker(
-                location=[lat, lon],
-                tooltip=row['Company'],
-                icon=folium.Icon(color=color, icon="info-sign"),
-                popup=folium.Popup(html_popup, max_width=250)
-            ).add_to(m)
-
-    st_folium(m, width=700, height=500)
+    render_mode = st.radio("Map rendering", RENDER_MODES, horizontal=True, key="map_render_mode")
+    m, color_counts = build_map(df, render_mode)
+
+    with perf.span("map.render"):
+        map_state = st_folium(m, width=700, height=500, returned_objects=["bounds"])
+
+    # VIEWPORT BLOCK: KPIs of the filtered sites inside the current map view
+    rows = model.positions(column_choice, selected_value)
+    box = viewport_box((map_state or {}).get("bounds"))
+    visible = viewport_rows(model, rows[model.has_coords[rows]], box)
+    scale_counts = np.bincount(model.scale.codes[visible], minlength=len(model.scale.categories))
+    cols = st.columns(2 + len(SCALE_KEYWORDS))
+    cols[0].metric("Sites in view", f"{len(visible):,}")
+    cols[1].metric("Capacity in view", f"{np.nansum(model.capacity[visible]):,.0f} t/year")
+    for col, keyword, count in zip(cols[2:], SCALE_KEYWORDS, scale_counts):
+        col.metric(keyword.capitalize(), f"{count:,}")
+    regions = model.spatial.aggregate(model.capacity, visible).nlargest(TOP_REGIONS, "total")
+    with st.expander("Capacity by region in view"):
+        st.dataframe(pd.DataFrame({
+            "Region": [f"{s:+.0f}°..{n:+.0f}°, {w:+.0f}°..{e:+.0f}°" for s, n, w, e in
+                       zip(regions["south"], regions["north"], regions["west"], regions["east"])],
+            "Sites": regions["sites"],
+            "Capacity (t/year)": regions["total"],
+        }), hide_index=True)
 
     # LEGEND + KPIs BLOCK
     total_companies = color_counts['red'] + color_counts['green'] + color_counts['blue']
-    total_capacity = df['Current Capacity (t/year)'].sum()
+    total_capacity = df[CAPACITY].sum()
 
     st.markdown(f"""
     <div style="display: flex; align-items: flex-start; justify-content: space-between; background-color: #333; color: white; padding: 10px; border-radius: 5px;">
@@ -101,53 +166,46 @@ def show():
     st.subheader("🏆 Pareto of Top Producers")
     filter_colors = st.multiselect("Filter project types: ", ["red", "green", "blue"], default=["red", "green", "blue"])
 
-    df['Volume'] = df['Current Capacity (t/year)']
-    filtered_df = df[df['Project Scale'].str.lower().apply(lambda x: \
-                        ('industrial' in x and 'red' in filter_colors) or \
-                        ('pilot' in x and 'green' in filter_colors) or \
-                        ('upcoming' in x and 'blue' in filter_colors))]
-
-    top_df = filtered_df.sort_values(by='Volume', ascending=False).head(10)
-    total_filtered = filtered_df['Volume'].sum()
-
-    fig = go.Figure()
-    fig.add_trace(go.Bar(
-        x=top_df['Company'],
-        y=top_df['Volume'],
-        marker_color='lightskyblue',
-        text=(top_df['Volume'] / total_filtered * 100).apply(lambda x: f"{x:.2f}%"),
-        textposition='outside'
-    ))
-    fig.update_layout(
-        template="plotly_dark",
-        yaxis_title="Production Capacity (t/year)",
-        xaxis_title="Company",
-        height=450,
-        margin=dict(t=50)
-    )
-    st.plotly_chart(fig)
+    fig, fig_lorenz, fig_pie = build_charts(data_version("Companies"), tuple(sorted(filter_colors)), column_choice, selected_value)
+    with perf.span("plotly.render"):
+        st.plotly_chart(fig)
 
     # LORENZ CURVE BLOCK
     st.subheader("📈 Lorenz Curve")
-    sorted_data = np.sort(filtered_df['Volume'].values)
-    cum_data = np.cumsum(sorted_data)
-    cum_data = np.insert(cum_data, 0, 0)
-    cum_data = cum_data / cum_data[-1]
-    x = np.linspace(0, 1, len(cum_data))
-    fig_lorenz = go.Figure()
-    fig_lorenz.add_trace(go.Scatter(x=x, y=cum_data, mode='lines', name='Lorenz Curve'))
-    fig_lorenz.add_shape(type='line', x0=0, y0=0, x1=1, y1=1, line=dict(dash='dash', color='green'))
-    fig_lorenz.update_layout(xaxis_title="Cumulative Companies", yaxis_title="Cumulative Capacity")
-    st.plotly_chart(fig_lorenz)
+    with perf.span("plotly.render"):
+        st.plotly_chart(fig_lorenz)
 
     # PIE CHART BLOCK
     st.subheader("🍰 Global Capacity Distribution")
-    labels = filtered_df['Company'].tolist()
-    values = filtered_df['Volume'].tolist()
-    fig_pie = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.3)])
-    fig_pie.update_layout(title="Current Capacity Distribution by Company")
-    st.plotly_chart(fig_pie)
+    with perf.span("plotly.render"):
+        st.plotly_chart(fig_pie)
+
+    # NEARBY PRODUCERS BLOCK
+    st.subheader("📍 Nearby Producers")
+    located = rows[model.has_coords[rows]]
+    if len(located):
+        names = model.frame["Company"].to_numpy()
+        col1, col2, col3 = st.columns([3, 2, 1])
+        with col1:
+            origin = st.selectbox("Producers near", located, format_func=lambda i: str(names[i]), key="nearby_origin")
+        with col2:
+            nearby_mode = st.radio("Find", NEARBY_MODES, horizontal=True, key="nearby_mode")
+        with col3:
+            if nearby_mode == NEARBY_MODES[0]:
+                amount = st.number_input("Producers", min_value=1, max_value=100, value=5, key="nearby_k")
+            else:
+                amount = st.number_input("Radius (km)", min_value=1, max_value=20000, value=500, key="nearby_km")
+        lat, lon = model.coords[origin]
+        if nearby_mode == NEARBY_MODES[0]:
+            found, distances = model.spatial.nearest(lat, lon, int(amount), exclude=origin)
+        else:
+            found, distances = model.spatial.radius(lat, lon, float(amount))
+            keep = found != origin
+            found, distances = found[keep], distances[keep]
+        nearby = model.frame.iloc[found][["Company", "Country", "Project Scale", CAPACITY]].assign(
+            **{"Distance (km)": np.round(distances, 1)})
+        st.dataframe(nearby, hide_index=True)
 
     # FINAL DATAFRAME BLOCK
     st.subheader("📋 Full Company Dataset")
-    st.dataframe(df)
\ No newline at end of file
+    show_table(df, "map_companies")
\ No newline at end of file
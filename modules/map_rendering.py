@@ -0,0 +1,131 @@
+import pandas as pd
+import numpy as np
+import folium
+from folium.plugins import FastMarkerCluster
+from modules.search_engine import cell_text
+from modules.company_model import project_scale_category
+from modules import perf
+
+# Map builders for map_module. "Per-marker" is the original one folium.Marker per company;
+# "Clustered" ships the sites as one compact array that the browser turns into clustered
+# markers, with popup HTML built only when a popup is opened.
+RENDER_AUTO = "Auto"
+RENDER_CLUSTERED = "Clustered"
+RENDER_PER_MARKER = "Per-marker"
+RENDER_MODES = [RENDER_AUTO, RENDER_CLUSTERED, RENDER_PER_MARKER]
+CLUSTER_THRESHOLD = 500  # Auto switches to clustering above this many sites
+DUPLICATE_OFFSET = 0.02
+
+SCALE_COLORS = {"industrial": "red", "pilot": "green", "upcoming": "blue", "other": "gray"}
+POPUP_FIELDS = ["Company", "Country", "Address", "Current Capacity (t/year)", "Expansion Plans (t/year)",
+                "Key Clients", "Technology", "Project Scale"]
+
+_CLUSTER_CALLBACK = """
+var escapeHtml = function (text) {
+    return String(text).replace(/[&<>"']/g, function (c) {
+        return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+    });
+};
+var callback = function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: row[2], prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindTooltip(escapeHtml(row[3]));
+    marker.bindPopup(function () {
+        var f = row.slice(3).map(escapeHtml);
+        return "<div style='width:200px; font-size: 14px;'><h4>" + f[0] + "</h4>" +
+            "<p><b>Country:</b> " + f[1] + "<br><b>Address:</b> " + f[2] + "<br>" +
+            "<b>Current Capacity:</b> " + f[3] + " tons/year <br>" +
+            "<b>Expansion Plans:</b> " + f[4] + " tons/year <br>" +
+            "<b>Key Clients:</b> " + f[5] + "<br><b>Technology:</b> " + f[6] + "<br>" +
+            "<b>Scale:</b> " + f[7] + "</p></div>";
+    }, {maxWidth: 250});
+    return marker;
+};
+"""
+
+
+def spread_duplicates(lat, lon, offset=DUPLICATE_OFFSET):
+    # Repeats of a coordinate move north-east in offset steps until no other site is there, so a
+    # shifted marker never covers another site; only the (few) repeats are visited one by one
+    repeat = pd.DataFrame({"lat": lat, "lon": lon}).duplicated().to_numpy()
+    if not repeat.any():
+        return lat, lon
+    lat, lon = lat.copy(), lon.copy()
+    taken = set(zip(lat[~repeat].tolist(), lon[~repeat].tolist()))
+    last = {}  # coordinate -> position its previous repeat took, where the search resumes
+    for i in np.flatnonzero(repeat).tolist():
+        origin = (float(lat[i]), float(lon[i]))
+        position = last.get(origin, origin)
+        while position in taken:
+            position = (position[0] + offset, position[1] + offset)
+        taken.add(position)
+        last[origin] = position
+        lat[i], lon[i] = position
+    return lat, lon
+
+
+def map_sites(df):
+    # Sites with coordinates, their display positions and marker colors, as flat arrays
+    has_coords = (df["lat"].notna() & df["lon"].notna()).to_numpy()
+    sites = df[has_coords]
+    lat, lon = spread_duplicates(sites["lat"].to_numpy(dtype=float), sites["lon"].to_numpy(dtype=float))
+    categories = project_scale_category(sites["Project Scale"])
+    colors = pd.Series(categories, dtype=object).map(SCALE_COLORS).to_numpy(dtype=object)
+    return sites, lat, lon, colors
+
+
+def color_counts(colors):
+    return {color: int((colors == color).sum()) for color in ["red", "green", "blue"]}
+
+
+def resolve_mode(mode, n_sites):
+    if mode == RENDER_AUTO:
+        return RENDER_CLUSTERED if n_sites > CLUSTER_THRESHOLD else RENDER_PER_MARKER
+    return mode
+
+
+def _popup_columns(sites):
+    columns = []
+    for field in POPUP_FIELDS:
+        if field in sites.columns:
+            columns.append(cell_text(sites[field]).to_numpy(dtype=object))
+        else:
+            columns.append(np.full(len(sites), "N/A", dtype=object))
+    return columns
+
+
+@perf.timed("map.build")
+def build_map(df, mode=RENDER_AUTO):
+    sites, lat, lon, colors = map_sites(df)
+    m = folium.Map(location=[20, 0], zoom_start=2, tiles="cartodbpositron")
+    if resolve_mode(mode, len(sites)) == RENDER_CLUSTERED:
+        # One row per site: [lat, lon, color, popup fields...]; object dtype keeps lat/lon numeric
+        data = np.column_stack([lat, lon, colors] + _popup_columns(sites)).tolist() if len(sites) else []
+        FastMarkerCluster(data, callback=_CLUSTER_CALLBACK).add_to(m)
+    else:
+        _add_markers(m, sites, lat, lon, colors)
+    return m, color_counts(colors)
+
+
+def _add_markers(m, sites, lat, lon, colors):
+    fields = _popup_columns(sites)
+    for i in range(len(sites)):
+        company, country, address, capacity, expansion, clients, technology, scale = (col[i] for col in fields)
+        html_popup = f"""
+        <div style='width:200px; font-size: 14px;'>
+            <h4>{company}</h4>
+            <p><b>Country:</b> {country}<br>
+            <b>Address:</b> {address}<br>
+            <b>Current Capacity:</b> {capacity} tons/year <br>
+            <b>Expansion Plans:</b> {expansion} tons/year <br>
+            <b>Key Clients:</b> {clients}<br>
+            <b>Technology:</b> {technology}<br>
+            <b>Scale:</b> {scale}</p>
+        </div>
+        """
+        folium.Marker(
+            location=[lat[i], lon[i]],
+            tooltip=company,
+            icon=folium.Icon(color=colors[i], icon="info-sign"),
+            popup=folium.Popup(html_popup, max_width=250)
+        ).add_to(m)
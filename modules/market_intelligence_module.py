@@ -1,99 +1,154 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import numpy as np
+from functools import lru_cache
+from modules.market_model import get_market_tables, market_version, DEMAND, VALUE, CAGR
+from modules.data_loader import data_version
+from modules.table_view import show_table
+from modules import perf
 
-def show():
-    st.header("📈 Global LiPF₆ Market Intelligence")
-
-    # Global LiPF₆ Market Data for 2024
-    global_data = {
-        "Metric": [
-            "Effective Production Capacity (2024)",
-            "Actual Production Output (2024)",
-            "Market Value (2024)",
-            "Projected Market Value (2031)",
-            "CAGR (2024-2031)"
-        ],
-        "Value": [
-            "390,000 metric tons",
-            "187,000 metric tons",
-            "$3.134 billion",
-            "$5.946 billion",
-            "9.7%"
-        ],
-        "Source": [
-            "[EVTank](https://news.metal.com/newscontent/103222503/Prices-Are-Expected-to-Rise-The-LiPF6-Industry-May-Face-a-Supply-and-Demand-Tightening-Ahead-of-Schedule)",
-            "[SMM Analysis](https://www.metal.com/en/newscontent/103144700)",
-            "[Valuates Reports](https://reports.valuates.com/market-reports/QYRE-Auto-34C9597/global-lipf6)",
-            "[Valuates Reports](https://reports.valuates.com/market-reports/QYRE-Auto-34C9597/global-lipf6)",
-            "[Valuates Reports](https://reports.valuates.com/market-reports/QYRE-Auto-34C9597/global-lipf6)"
-        ]
-    }
-
-    global_df = pd.DataFrame(global_data)
-
-    # Display Global Market Data
-    st.subheader("🌐 Global LiPF₆ Market Data (2024)")
-    st.table(global_df)
-
-    # Comparative Analysis with Internal Database
-    st.subheader("🏭 Comparative Analysis with Internal Database")
-
-    # Example internal database data (replace with actual data)
-    internal_data = {
-        "Company": ["Company A", "Company B", "Company C", "Company D", "Company E"],
-        "Country": ["Country X", "Country Y", "Country Z", "Country W", "Country V"],
-        "Production Capacity (2024)": [50000, 40000, 30000, 20000, 10000]  # in metric tons
-    }
-
-    internal_df = pd.DataFrame(internal_data)
-    total_internal_capacity = internal_df["Production Capacity (2024)"].sum()
+TOP_COMPANIES = 10
+CHART_CACHE_SIZE = 16
 
-    # Calculate percentage share of each company
-    internal_df["Global Capacity Share (%)"] = (internal_df["Production Capacity (2024)"] / 390000) * 100
 
-    # Display Internal Database
-    st.dataframe(internal_df)
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+@perf.timed("market.charts")
+def build_charts(market_key, companies_version, year):
+    # Keyed like market_tables, so figures are rebuilt only when a source file changes
+    tables = get_market_tables()
+    by_year = tables["by_year"]
 
-    # Key Insights
-    st.subheader("🔍 Key Insights")
-    st.markdown(f"- **Total Internal Production Capacity (2024):** {total_internal_capacity:,} metric tons")
-    st.markdown(f"- **Global Effective Production Capacity (2024):** 390,000 metric tons")
-    st.markdown(f"- **Global Actual Production Output (2024):** 187,000 metric tons")
-    st.markdown(f"- **Capacity Utilization Rate (2024):** {187000 / 390000 * 100:.2f}%")
+    fig_trend = go.Figure()
+    fig_trend.add_trace(go.Scatter(x=by_year["Year"], y=by_year["demand"], mode="lines+markers",
+                                   name="Global Demand (consensus)"))
+    fig_trend.add_trace(go.Scatter(x=by_year["Year"], y=by_year["demand_max"], mode="lines",
+                                   line=dict(width=0), showlegend=False))
+    fig_trend.add_trace(go.Scatter(x=by_year["Year"], y=by_year["demand_min"], mode="lines", line=dict(width=0),
+                                   fill="tonexty", name="Source range"))
+    fig_trend.add_trace(go.Scatter(x=by_year["Year"], y=by_year["tracked_capacity"], mode="lines+markers",
+                                   name="Tracked Capacity", line=dict(dash="dash")))
+    fig_trend.update_layout(xaxis_title="Year", yaxis_title="t/year", xaxis=dict(tickformat="d", dtick=1),
+                            yaxis=dict(tickformat=","), template="plotly_white")
 
-    # Bar Chart: Internal Production Capacities
-    st.subheader("📊 Internal Production Capacities")
+    shares = tables["shares"]
+    top_df = shares[shares["Year"] == year].nlargest(TOP_COMPANIES, "capacity")
     fig = go.Figure(data=[
         go.Bar(
-            x=internal_df["Company"],
-            y=internal_df["Production Capacity (2024)"],
-            text=internal_df["Global Capacity Share (%)"].apply(lambda x: f"{x:.2f}%"),
+            x=top_df["Company"],
+            y=top_df["capacity"],
+            text=(top_df["share"] * 100).apply(lambda x: f"{x:.2f}%"),
             textposition='auto',
             marker_color='lightskyblue'
         )
     ])
     fig.update_layout(
-        title="Company-wise Production Capacities (2024)",
+        title=f"Company-wise Production Capacities vs. {year} Global Demand",
         xaxis_title="Company",
-        yaxis_title="Production Capacity (metric tons)",
+        yaxis_title="Production Capacity (t/year)",
         yaxis=dict(tickformat=","),
         template="plotly_white"
     )
-    st.plotly_chart(fig)
 
-    # Pie Chart: Global Capacity Distribution
-    st.subheader("🍰 Global Capacity Distribution")
-    labels = internal_df["Company"].tolist() + ["Other Global Capacity"]
-    values = internal_df["Production Capacity (2024)"].tolist() + [390000 - total_internal_capacity]
-    fig = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.3)])
-    fig.update_layout(
-        title="Global LiPF₆ Production Capacity Distribution (2024)",
+    demand = float(by_year.loc[by_year["Year"] == year, "demand"].iloc[0])
+    tracked = float(by_year["tracked_capacity"].iloc[0])
+    labels = top_df["Company"].tolist() + ["Other Tracked Producers"]
+    values = top_df["capacity"].tolist() + [tracked - top_df["capacity"].sum()]
+    if demand > tracked:
+        labels.append("Untracked Global Demand")
+        values.append(demand - tracked)
+    fig_pie = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.3)])
+    fig_pie.update_layout(
+        title=f"Global LiPF₆ Demand Coverage ({year})",
         template="plotly_white"
     )
-    st.plotly_chart(fig)
+    return fig_trend, fig, fig_pie
+
+
+perf.register_cache("market_charts", perf.lru_stats(build_charts))
+
+
+def show():
+    st.header("📈 Global LiPF₆ Market Intelligence")
+
+    try:
+        tables = get_market_tables()
+    except (FileNotFoundError, ValueError) as e:
+        st.error(f"Could not load the market intelligence workbook: {e}")
+        return
+    by_year = tables["by_year"]
+    if by_year.empty:
+        st.warning("The market intelligence workbook has no dated estimates.")
+        return
+
+    years = by_year["Year"].tolist()
+    year = st.selectbox("Year", years, index=len(years) - 1)
+    row = by_year[by_year["Year"] == year].iloc[0]
+
+    # Global Market Data from the analyst sources
+    st.subheader(f"🌐 Global LiPF₆ Market Data ({year})")
+    market = tables["market"]
+    sources = market[market["Year"] == year]
+    st.table(pd.DataFrame({
+        "Source": "[" + sources["Reference Name"].astype(str) + "](" + sources["Source URL"].astype(str) + ")"
+        if "Source URL" in sources.columns else sources["Reference Name"],
+        DEMAND: sources[DEMAND].map("{:,.0f}".format),
+        VALUE: sources[VALUE].map("${:,.2f}".format),
+        CAGR: sources[CAGR].map("{:.1f}%".format),
+    }))
 
-    # Note on Data Accuracy
-    st.info("**Note:** The internal database data is based on the provided example. Please ensure that your actual internal data is accurate and up-to-date for precise analysis.")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Global Demand (consensus)", f"{row['demand']:,.0f} t/year",
+                help=f"Mean of {int(row['sources'])} source(s); range {row['demand_min']:,.0f} - {row['demand_max']:,.0f}")
+    col2.metric("Market Value", f"${row['market_value']:,.2f} billion")
+    col3.metric("CAGR", f"{row['cagr']:.1f}%")
 
+    # Comparative Analysis with Internal Database
+    st.subheader("🏭 Comparative Analysis with Internal Database")
+    shares = tables["shares"]
+    company_df = shares[shares["Year"] == year].drop(columns=["Year", "demand"]).rename(columns={
+        "capacity": "Current Capacity (t/year)",
+        "expansion": "Expansion Plans (t/year)",
+        "share": "Global Demand Share (%)",
+        "share_with_expansion": "Share incl. Expansion (%)",
+    }).sort_values("Current Capacity (t/year)", ascending=False)
+    company_df[["Global Demand Share (%)", "Share incl. Expansion (%)"]] *= 100
+    show_table(company_df, "market_companies")
+
+    # Key Insights
+    st.subheader("🔍 Key Insights")
+    st.markdown(f"- **Total Internal Production Capacity:** {row['tracked_capacity']:,.0f} t/year")
+    st.markdown(f"- **Internal Capacity incl. Expansion Plans:** {row['planned_capacity']:,.0f} t/year")
+    st.markdown(f"- **Global Demand ({year}):** {row['demand']:,.0f} t/year")
+    st.markdown(f"- **Demand / Tracked Capacity ({year}):** {row['utilization'] * 100:.2f}%"
+                f" ({row['utilization_with_expansion'] * 100:.2f}% with expansions)")
+
+    countries = tables["by_country"]
+    countries = countries[countries["Year"] == year].sort_values("capacity", ascending=False)
+    st.markdown("**Share of global demand by country**")
+    st.dataframe(pd.DataFrame({
+        "Country": countries["Country"],
+        "Current Capacity (t/year)": countries["capacity"],
+        "Global Demand Share (%)": countries["share"] * 100,
+    }), hide_index=True)
+
+    fig_trend, fig, fig_pie = build_charts(market_version(), data_version("Companies"), year)
+
+    # Time series of the consensus by year
+    st.subheader("📅 Demand over Time")
+    with perf.span("plotly.render"):
+        st.plotly_chart(fig_trend)
+    trend = by_year[["Year", "sources", "demand", "market_value", "cagr", "utilization"]].rename(columns={
+        "sources": "Sources", "demand": DEMAND, "market_value": VALUE, "cagr": CAGR,
+        "utilization": "Demand / Tracked Capacity",
+    })
+    st.dataframe(trend, hide_index=True)
+
+    # Bar Chart: Internal Production Capacities
+    st.subheader("📊 Internal Production Capacities")
+    with perf.span("plotly.render"):
+        st.plotly_chart(fig)
+
+    # Pie Chart: Global Capacity Distribution
+    st.subheader("🍰 Global Capacity Distribution")
+    with perf.span("plotly.render"):
+        st.plotly_chart(fig_pie)
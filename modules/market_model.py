@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from modules.data_loader import get_data_dir, load_workbook, data_version
+from modules.company_model import get_company_model
+from modules import perf
+
+# Market Intelligence tables: the analyst estimates in LiPF6_Market_Intelligence.xlsx joined with
+# the Companies capacities. The workbook goes through data_loader's shared frame cache, and the
+# derived tables are memoized on (workbook mtime/size, Companies data version), so they are
+# rebuilt only when one of the two sources changes.
+MARKET_SHEET = "Market Intelligence"
+DEMAND = "Global Demand (t/year)"
+VALUE = "Market Value ($ Billion)"
+CAGR = "CAGR (%)"
+MARKET_COLUMNS = ["Reference Name", DEMAND, VALUE, CAGR, "Year"]
+DERIVED_CACHE_SIZE = 8
+
+
+def get_market_path():
+    return os.path.join(get_data_dir(), "LiPF6_Market_Intelligence.xlsx")
+
+
+def market_version():
+    stat = os.stat(get_market_path())
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_market_data():
+    sheets = load_workbook(get_market_path())
+    if MARKET_SHEET not in sheets:
+        raise ValueError(f"Worksheet named '{MARKET_SHEET}' not found")
+    df = sheets[MARKET_SHEET].copy()
+    missing = [col for col in MARKET_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Market Intelligence sheet is missing column(s): {', '.join(missing)}")
+    for col in [DEMAND, VALUE, CAGR, "Year"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.dropna(subset=["Year"]).astype({"Year": "int64"})
+
+
+@lru_cache(maxsize=DERIVED_CACHE_SIZE)
+@perf.timed("market.tables")
+def market_tables(market_key, companies_version):
+    # The keys only select the cache entry; callers pass market_version() and data_version("Companies")
+    market = load_market_data()
+    model = get_company_model()
+
+    # Consensus per year across the analyst sources
+    by_year = market.groupby("Year").agg(
+        sources=("Reference Name", "count"),
+        demand=(DEMAND, "mean"), demand_min=(DEMAND, "min"), demand_max=(DEMAND, "max"),
+        market_value=(VALUE, "mean"), cagr=(CAGR, "mean"),
+    ).reset_index()
+    tracked = np.nansum(model.capacity)
+    planned = tracked + np.nansum(model.expansion)
+    by_year["tracked_capacity"] = tracked
+    by_year["planned_capacity"] = planned
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Demand the tracked producers would need to serve, as a share of their capacity
+        by_year["utilization"] = by_year["demand"] / tracked if tracked else np.nan
+        by_year["utilization_with_expansion"] = by_year["demand"] / planned if planned else np.nan
+
+    # Every company against every year's consensus demand, in one cross join
+    companies = pd.DataFrame({
+        "Company": model.frame["Company"].to_numpy(),
+        "Country": model.frame["Country"].astype(object).to_numpy(),
+        "capacity": model.capacity,
+        "expansion": model.expansion,
+    })
+    shares = companies.merge(by_year[["Year", "demand"]], how="cross")
+    shares["share"] = shares["capacity"] / shares["demand"]
+    shares["share_with_expansion"] = (shares["capacity"] + shares["expansion"].fillna(0)) / shares["demand"]
+
+    by_country = (companies.groupby("Country", observed=True)[["capacity", "expansion"]].sum()
+                  .reset_index().merge(by_year[["Year", "demand"]], how="cross"))
+    by_country["share"] = by_country["capacity"] / by_country["demand"]
+
+    return {"market": market, "by_year": by_year, "shares": shares, "by_country": by_country}
+
+
+perf.register_cache("market_tables", perf.lru_stats(market_tables))
+
+
+def get_market_tables():
+    return market_tables(market_version(), data_version("Companies"))
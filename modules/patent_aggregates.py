@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from modules import patent_store
+from modules.patent_store import PATENT_FOLDER, SOURCE_COLUMN
+
+# Per-company counts of unique patent families for the analytics Pareto chart. Family groups are
+# formed across every file once per set of file versions; keyword hits are answered by each
+# file's inverted index and memoized per file version, so a new or changed file is the only one
+# that gets processed again.
+MAX_KEYWORD_MASKS = 512
+
+_lock = threading.Lock()
+_keyword_masks = OrderedDict()  # (folder, fname, sha1, keywords) -> row mask
+_groups = {}  # (folder, fnames, sha1s) -> family group ids; only the latest is kept
+
+
+def _keyword_mask(fname, entry, keywords, folder):
+    key = (folder, fname, entry["sha1"], keywords)
+    with _lock:
+        if key in _keyword_masks:
+            _keyword_masks.move_to_end(key)
+            return _keyword_masks[key]
+
+    table = patent_store.load_patent_table(fname, folder)
+    index = patent_store.load_patent_index(fname, folder)
+    columns = [col for col in table.column_names if col != SOURCE_COLUMN]
+    mask = index.any_cell_matches(keywords, columns, lambda col: table.column(col).to_pandas().tolist())
+
+    with _lock:
+        _keyword_masks[key] = mask
+        while len(_keyword_masks) > MAX_KEYWORD_MASKS:
+            _keyword_masks.popitem(last=False)
+    return mask
+
+
+def _family_groups(entries, folder):
+    key = (folder, tuple(entries), tuple(entry["sha1"] for entry in entries.values()))
+    with _lock:
+        if key in _groups:
+            return _groups[key]
+    groups = patent_store.load_family_groups(list(entries), folder)
+    with _lock:
+        _groups.clear()
+        _groups[key] = groups
+    return groups
+
+
+def patent_counts(keywords=(), folder=PATENT_FOLDER):
+    # company -> unique patent families (among the records matching a keyword, if any are given)
+    keywords = tuple(keywords)
+    counts = {}
+    # Files a background job is converting are left out rather than waited for
+    entries, errors = patent_store.sync_files(patent_store.list_patent_files(folder), folder, wait=False)
+    try:
+        groups = _family_groups(entries, folder)
+    except Exception as e:
+        # Without family groups every record counts on its own
+        errors["family groups"] = e
+        groups = None
+    offset = 0
+    for fname, entry in entries.items():
+        rows = slice(offset, offset + entry["rows"])
+        offset += entry["rows"]
+        try:
+            mask = _keyword_mask(fname, entry, keywords, folder) if keywords else np.ones(entry["rows"], dtype=bool)
+            counts[patent_store.company_name(fname)] = (
+                len(np.unique(groups[rows][mask])) if groups is not None else int(mask.sum()))
+        except Exception as e:
+            errors[fname] = e
+    return counts, errors
@@ -0,0 +1,201 @@
+import numpy as np
+import bisect
+from array import array
+import os
+import pickle
+import re
+from itertools import chain
+from modules import perf
+
+# Inverted index over the patent tables: per column, token -> sorted row ids.
+# Tokens are the \w+ runs of str(cell).lower(), which is exactly the text the Patent Explorer
+# matches against, so index lookups return a superset of the matching rows and only
+# multi-word or punctuated terms need to be checked against the cell text.
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text)
+
+
+def add_tokens(token_rows, values, start=0):
+    # token -> row ids, kept as compact int32 arrays so large tables can be indexed batch by batch
+    for row, value in enumerate(values, start):
+        for token in set(tokenize(str(value).lower())):
+            rows = token_rows.get(token)
+            if rows is None:
+                rows = token_rows[token] = array("i")
+            rows.append(row)
+
+
+class ColumnIndex:
+    def __init__(self, vocab, postings, offsets):
+        self.vocab = vocab  # sorted list of tokens
+        self.postings = postings  # row ids of vocab[i] are postings[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets
+        self._blob = None
+        self._starts = None
+
+    @classmethod
+    def build(cls, values):
+        token_rows = {}
+        add_tokens(token_rows, values)
+        return cls.from_token_rows(token_rows)
+
+    @classmethod
+    def from_token_rows(cls, token_rows):
+        vocab = sorted(token_rows)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum([len(token_rows[t]) for t in vocab], out=offsets[1:])
+        postings = np.fromiter(chain.from_iterable(token_rows[t] for t in vocab), dtype=np.int32, count=int(offsets[-1]))
+        return cls(vocab, postings, offsets)
+
+    def _substring_vocab_ids(self, token):
+        if self._blob is None:
+            # All tokens in one newline separated string, so a substring scan runs in C
+            self._blob = "\n" + "\n".join(self.vocab)
+            self._starts = np.cumsum([1] + [len(t) + 1 for t in self.vocab[:-1]]) if self.vocab else np.zeros(0, dtype=np.int64)
+        positions = [m.start() for m in re.finditer(re.escape(token), self._blob)]
+        if not positions:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.searchsorted(self._starts, positions, side="right") - 1)
+
+    def _prefix_vocab_ids(self, token):
+        lo = bisect.bisect_left(self.vocab, token)
+        hi = bisect.bisect_left(self.vocab, token + "\U0010ffff", lo)
+        return np.arange(lo, hi)
+
+    def mark_rows(self, token, mask, prefix=False):
+        vocab_ids = self._prefix_vocab_ids(token) if prefix else self._substring_vocab_ids(token)
+        if len(vocab_ids) == 0:
+            return
+        starts = self.offsets[vocab_ids]
+        lengths = self.offsets[vocab_ids + 1] - starts
+        # Gather every posting slice at once: position k of slice j is starts[j] + k
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        mask[self.postings[shift + np.arange(int(lengths.sum()))]] = True
+
+
+class PatentIndex:
+    def __init__(self, n_rows, columns):
+        self.n_rows = n_rows
+        self.columns = columns  # column name -> ColumnIndex
+        self._lowered = {}  # column name -> lowercased cell text, filled on first text check
+
+    @classmethod
+    def build(cls, df):
+        return cls(len(df), {col: ColumnIndex.build(df[col].tolist()) for col in df.columns})
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            pickle.dump({"n_rows": self.n_rows, "columns": {
+                col: (idx.vocab, idx.postings, idx.offsets) for col, idx in self.columns.items()
+            }}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as fh:
+            data = pickle.load(fh)
+        return cls(data["n_rows"], {col: ColumnIndex(*parts) for col, parts in data["columns"].items()})
+
+    def token_mask(self, token, columns, prefix=False):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for col in columns:
+            if col in self.columns:
+                self.columns[col].mark_rows(token, mask, prefix)
+        return mask
+
+    def candidates(self, terms, columns, prefix=False):
+        mask = np.ones(self.n_rows, dtype=bool)
+        for term in terms:
+            for token in tokenize(term):
+                mask &= self.token_mask(token, columns, prefix)
+                if not mask.any():
+                    return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(mask)
+
+    def any_cell_matches(self, keywords, columns, cell_values):
+        # Rows where some keyword occurs inside a single cell; cell_values(col) returns the column's cells
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for keyword in keywords:
+            tokens = tokenize(keyword)
+            for col in columns:
+                col_mask = ~mask
+                for token in tokens:
+                    col_mask &= self.token_mask(token, [col])
+                rows = np.flatnonzero(col_mask)
+                if _needs_text_check(keyword) and len(rows):
+                    texts = self.lowered(col, cell_values(col))
+                    rows = rows[np.asarray([keyword in texts[row] for row in rows], dtype=bool)]
+                mask[rows] = True
+        return mask
+
+    def lowered(self, col, values):
+        texts = self._lowered.get(col)
+        if texts is None:
+            texts = [str(v).lower() for v in values]
+            self._lowered[col] = texts
+        return texts
+
+
+class IndexBuilder:
+    # Builds a PatentIndex from consecutive row batches; only the postings are kept, not the rows
+    def __init__(self):
+        self.n_rows = 0
+        self._token_rows = {}  # column name -> token -> row ids
+
+    def add(self, df):
+        for col in df.columns:
+            add_tokens(self._token_rows.setdefault(col, {}), df[col].tolist(), self.n_rows)
+        self.n_rows += len(df)
+
+    def finish(self):
+        return PatentIndex(self.n_rows, {col: ColumnIndex.from_token_rows(token_rows)
+                                         for col, token_rows in self._token_rows.items()})
+
+
+def _needs_text_check(term):
+    # A bare word is fully answered by the index; anything with spaces or punctuation is verified
+    return tokenize(term) != [term]
+
+
+def _term_in_text(term, text, prefix):
+    if prefix:
+        return re.search(r"(?<!\w)" + re.escape(term), text) is not None
+    return term in text
+
+
+def _row_matches(texts, row, terms, prefix):
+    for term in terms:
+        if any(_term_in_text(term, col_texts[row], prefix) for col_texts in texts):
+            continue
+        # Cells are joined with a space, so only a term containing one can span two columns
+        if " " in term and _term_in_text(term, " ".join(col_texts[row] for col_texts in texts), prefix):
+            continue
+        return False
+    return True
+
+
+@perf.timed("patents.search")
+def search_patents(df, indexes, terms, columns, prefix=False):
+    # indexes are the per-file PatentIndex objects, in the order their tables were concatenated into df
+    columns = [col for col in columns if col in df.columns]
+    if not terms:
+        return np.arange(len(df))
+    if not columns:
+        return np.zeros(0, dtype=np.int64)
+
+    to_check = [term for term in terms if _needs_text_check(term)]
+    found = []
+    offset = 0
+    for index in indexes:
+        rows = index.candidates(terms, columns, prefix)
+        if to_check and len(rows):
+            texts = [index.lowered(col, df[col].iloc[offset:offset + index.n_rows].tolist()) for col in columns]
+            keep = [_row_matches(texts, row, to_check, prefix) for row in rows]
+            rows = rows[np.asarray(keep, dtype=bool)]
+        found.append(rows + offset)
+        offset += index.n_rows
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
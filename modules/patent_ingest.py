@@ -0,0 +1,149 @@
+import datetime
+import os
+import pyarrow as pa
+
+# Streaming ingestion of the patent exports into Arrow IPC files. Rows are read with openpyxl in
+# read-only mode and never held more than batch_rows at a time: a first pass writes every cell as
+# text to a scratch stream while recording what kinds of values each column holds, and a second
+# pass over that stream casts each column to the type pd.read_excel would have given it.
+INGEST_BATCH_ROWS = int(os.environ.get("SPS_INGEST_BATCH_ROWS", 10_000))
+
+# Cell text that pd.read_excel reads as missing by default
+NA_STRINGS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+
+def _cell_value(value):
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        # pd.read_excel turns whole floats back into ints
+        return int(value)
+    return value
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, datetime.datetime):
+        return "datetime"
+    return "text"
+
+
+def column_names(header):
+    # Same naming as pd.read_excel: blank headers become "Unnamed: i", repeats get ".1", ".2", ...
+    names = []
+    seen = {}
+    for i, name in enumerate(header):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def iter_rows(path):
+    # Yields the column names, then one list of cell values per data row (first worksheet)
+    from openpyxl import load_workbook  # only needed when a file is (re)ingested
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # Exporters often write a wrong <dimension>; without a reset read-only mode trusts it
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        while header and header[-1] is None:
+            header.pop()
+        width = len(header)
+        yield column_names(header)
+
+        blank = 0
+        for row in rows:
+            values = [_cell_value(v) for v in row[:width]]
+            values += [None] * (width - len(values))
+            if all(v is None for v in values):
+                # Blank rows are kept only when more data follows, as pd.read_excel does
+                blank += 1
+                continue
+            for _ in range(blank):
+                yield [None] * width
+            blank = 0
+            yield values
+    finally:
+        workbook.close()
+
+
+def _final_type(kinds, has_null):
+    if not kinds:
+        return pa.float64()
+    if kinds == {"int"} and not has_null:
+        return pa.int64()
+    if kinds <= {"int", "float"}:
+        return pa.float64()
+    if kinds == {"datetime"}:
+        return pa.timestamp("us")
+    if kinds == {"bool"} and not has_null:
+        return pa.bool_()
+    return pa.large_string()
+
+
+def _text_batch(names, rows):
+    columns = list(zip(*rows))
+    arrays = [pa.array([None if v is None else str(v) for v in col], type=pa.large_string()) for col in columns]
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def excel_to_arrow(source, path, batch_rows=None, constants=None, on_batch=None):
+    # Writes the first sheet of source to the Arrow IPC file at path and returns the row count.
+    # constants adds fixed text columns (name -> value); on_batch sees every final record batch.
+    batch_rows = batch_rows or INGEST_BATCH_ROWS
+    constants = constants or {}
+    scratch_path = path + ".raw"
+    rows = iter_rows(source)
+    names = next(rows)
+    kinds = [set() for _ in names]
+    has_null = [False] * len(names)
+
+    text_schema = pa.schema([(name, pa.large_string()) for name in names])
+    with pa.OSFile(scratch_path, "wb") as sink, pa.ipc.new_stream(sink, text_schema) as writer:
+        batch = []
+        for values in rows:
+            for i, value in enumerate(values):
+                if value is None:
+                    has_null[i] = True
+                else:
+                    kinds[i].add(_kind(value))
+            batch.append(values)
+            if len(batch) >= batch_rows:
+                writer.write_batch(_text_batch(names, batch))
+                batch = []
+        if batch:
+            writer.write_batch(_text_batch(names, batch))
+
+    types = [_final_type(k, n) for k, n in zip(kinds, has_null)]
+    schema = pa.schema(list(zip(names, types)) + [(name, pa.large_string()) for name in constants])
+    n_rows = 0
+    try:
+        with pa.memory_map(scratch_path, "r") as source_map, pa.OSFile(path, "wb") as sink, \
+                pa.ipc.new_file(sink, schema) as writer:
+            for text in pa.ipc.open_stream(source_map):
+                if text.num_rows == 0:
+                    continue
+                arrays = [col.cast(t) for col, t in zip(text.columns, types)]
+                arrays += [pa.array([value] * text.num_rows, type=pa.large_string()) for value in constants.values()]
+                batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+                writer.write_batch(batch)
+                if on_batch is not None:
+                    on_batch(batch)
+                n_rows += batch.num_rows
+    finally:
+        os.remove(scratch_path)
+    return n_rows
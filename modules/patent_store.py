@@ -0,0 +1,400 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from modules.patent_index import PatentIndex, IndexBuilder
+from modules.patent_ingest import excel_to_arrow
+from modules.patent_dedup import (FAMILY_COLUMN, FAMILY_KEY_COLUMNS, NUM_HASHES, record_signatures, family_keys,
+                                  family_groups)
+from modules.ranked_search import PATENT_FIELDS, TermMatrix, TermMatrixBuilder
+from modules.data_loader import FrameCache
+from modules import perf
+
+# Columnar sidecars for the Patents/*.xlsx exports. Each workbook is converted once into an
+# uncompressed Arrow IPC file that is memory-mapped on read, plus an inverted search index, a BM25
+# term matrix for ranked search and MinHash signatures for family grouping, all rebuilt only when
+# the source file's content changes.
+PATENT_FOLDER = os.environ.get("SPS_PATENT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Patents"))
+STORE_DIRNAME = ".store"
+MANIFEST_NAME = "manifest.json"
+SOURCE_COLUMN = "Source Company"
+# Processes used to convert stale workbooks (defaults to one per core)
+INGEST_WORKERS = int(os.environ.get("SPS_INGEST_WORKERS", 0)) or os.cpu_count() or 1
+PATENT_FRAME_CACHE_SIZE = 4  # file selections whose combined frame is kept
+
+_lock = threading.RLock()
+_tables = {}  # (folder, fname, sha1) -> memory-mapped pa.Table
+_indexes = {}  # (folder, fname, sha1) -> PatentIndex
+_signatures = {}  # (folder, fname, sha1) -> MinHash signatures, one row per record
+_matrices = {}  # (folder, fname, sha1) -> TermMatrix
+_converting = {}  # (folder, fname) -> threading.Event set once its conversion has finished
+_building = {}  # (cache id, key) -> threading.Event set once _cached has loaded that entry
+_frames = FrameCache(max_entries=PATENT_FRAME_CACHE_SIZE)  # (folder, fnames, sha1s) -> DataFrame
+perf.register_cache("patent_frames", _frames.stats)
+
+
+class FileConverting(Exception):
+    # sync_files(wait=False) was asked for a file another caller is converting
+    pass
+
+
+def get_store_dir(folder=PATENT_FOLDER):
+    return os.path.join(folder, STORE_DIRNAME)
+
+
+def list_patent_files(folder=PATENT_FOLDER):
+    return [f for f in os.listdir(folder) if f.lower().endswith(".xlsx")]
+
+
+def company_name(fname):
+    return os.path.splitext(fname)[0]
+
+
+def _sidecar_path(folder, fname):
+    return os.path.join(get_store_dir(folder), company_name(fname) + ".arrow")
+
+
+def _index_path(folder, fname):
+    return os.path.join(get_store_dir(folder), company_name(fname) + ".index.pkl")
+
+
+def _matrix_path(folder, fname):
+    return os.path.join(get_store_dir(folder), company_name(fname) + ".bm25.npz")
+
+
+def _signature_path(folder, fname):
+    return os.path.join(get_store_dir(folder), company_name(fname) + ".minhash.npy")
+
+
+def _save_signatures(path, signatures):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.save(fh, signatures)
+    os.replace(tmp_path, path)
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_manifest(folder):
+    path = os.path.join(get_store_dir(folder), MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(folder, manifest):
+    path = os.path.join(get_store_dir(folder), MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _write_sidecar(folder, fname):
+    # Streamed in batches, so memory stays bounded by INGEST_BATCH_ROWS rows plus the index postings
+    path = _sidecar_path(folder, fname)
+    tmp_path = path + ".tmp"
+    builder = IndexBuilder()
+    matrix = TermMatrixBuilder(PATENT_FIELDS)
+    signatures = []
+
+    def add_batch(batch):
+        df = batch.to_pandas()
+        builder.add(df)
+        matrix.add(df)
+        signatures.append(record_signatures(df))
+
+    rows = excel_to_arrow(os.path.join(folder, fname), tmp_path, constants={SOURCE_COLUMN: company_name(fname)},
+                          on_batch=add_batch)
+    os.replace(tmp_path, path)
+    builder.finish().save(_index_path(folder, fname))
+    matrix.finish().save(_matrix_path(folder, fname))
+    _save_signatures(_signature_path(folder, fname), np.concatenate(signatures) if signatures else record_signatures(pd.DataFrame()))
+    return rows
+
+
+def _check_sidecar(folder, fname, entry):
+    # (entry, stat, sha1); entry is None when the sidecar has to be (re)built from the workbook
+    stat = os.stat(os.path.join(folder, fname))
+    exists = os.path.exists(_sidecar_path(folder, fname))
+    if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size and exists:
+        return entry, stat, entry["sha1"]
+    sha1 = _file_sha1(os.path.join(folder, fname))
+    if entry and entry["sha1"] == sha1 and exists:
+        # Touched but unchanged: only the recorded mtime needs refreshing
+        return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": sha1, "rows": entry["rows"]}, stat, sha1
+    return None, stat, sha1
+
+
+def _ingest(folder, fnames, workers):
+    # Yields (fname, row count or exception); openpyxl parsing is CPU-bound, so several stale
+    # files are converted in separate processes, each writing its own sidecar and index
+    if workers <= 1 or len(fnames) <= 1:
+        for fname in fnames:
+            try:
+                yield fname, _write_sidecar(folder, fname)
+            except Exception as e:
+                yield fname, e
+        return
+    # Spawned, not forked: callers are threads of a multithreaded server, and a forked child could
+    # inherit a lock another thread was holding
+    with ProcessPoolExecutor(max_workers=min(workers, len(fnames)), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_write_sidecar, folder, fname): fname for fname in fnames}
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
+        finally:
+            # A caller that stops early (a cancelled job) leaves the files not yet started alone
+            for future in futures:
+                future.cancel()
+
+
+def stale_files(fnames, folder=PATENT_FOLDER):
+    # The files whose sidecar sync_files would have to (re)build. Takes no lock (the manifest is
+    # replaced atomically), so it answers while a conversion is running.
+    manifest = _load_manifest(folder)
+    stale = []
+    for fname in fnames:
+        try:
+            if _check_sidecar(folder, fname, manifest.get(fname))[0] is None:
+                stale.append(fname)
+        except OSError:
+            pass  # sync_files reports it
+    return stale
+
+
+@perf.timed("patents.sync")
+def sync_files(fnames, folder=PATENT_FOLDER, workers=None, on_file=None, wait=True):
+    # Brings the sidecars of fnames up to date; returns ({fname: manifest entry}, {fname: error}).
+    # on_file(fname, converted, total) runs after each conversion; the manifest keeps the files
+    # converted so far even if it raises. Conversions run outside the module lock, so readers of
+    # other files are not held up; a caller that needs a file another one is converting waits for
+    # it, or with wait=False gets a FileConverting error for it.
+    workers = workers or INGEST_WORKERS
+    folder_key = os.path.abspath(folder)
+    while True:
+        with _lock:
+            manifest = _load_manifest(folder)
+            entries = {}
+            errors = {}
+            pending = {}  # fname -> (stat, sha1)
+            busy = []
+            for fname in fnames:
+                if (folder_key, fname) in _converting:
+                    if wait:
+                        busy.append(_converting[(folder_key, fname)])
+                    else:
+                        errors[fname] = FileConverting(f"{fname} is being converted; it is included once that finishes")
+                    continue
+                try:
+                    entry, stat, sha1 = _check_sidecar(folder, fname, manifest.get(fname))
+                except Exception as e:
+                    errors[fname] = e
+                    continue
+                if entry is None:
+                    pending[fname] = (stat, sha1)
+                else:
+                    entries[fname] = entry
+            if not busy:
+                for fname in pending:
+                    _converting[(folder_key, fname)] = threading.Event()
+                break
+        for event in busy:
+            event.wait()
+
+    try:
+        if pending:
+            os.makedirs(get_store_dir(folder), exist_ok=True)
+        for converted, (fname, result) in enumerate(_ingest(folder, list(pending), workers), 1):
+            if isinstance(result, Exception):
+                errors[fname] = result
+            else:
+                stat, sha1 = pending[fname]
+                entries[fname] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": sha1,
+                                  "rows": result}
+            if on_file is not None:
+                on_file(fname, converted, len(pending))
+    finally:
+        with _lock:
+            try:
+                # Re-read: other callers may have saved their conversions meanwhile
+                manifest = _load_manifest(folder)
+                changed = {fname: entry for fname, entry in entries.items() if manifest.get(fname) != entry}
+                if changed:
+                    manifest.update(changed)
+                    _save_manifest(folder, manifest)
+            finally:
+                for fname in pending:
+                    _converting.pop((folder_key, fname)).set()
+    return {fname: entries[fname] for fname in fnames if fname in entries}, errors
+
+
+def ensure_sidecar(fname, folder=PATENT_FOLDER):
+    entries, errors = sync_files([fname], folder, workers=1)
+    if fname in errors:
+        raise errors[fname]
+    return entries[fname]
+
+
+def sync_store(folder=PATENT_FOLDER, workers=None):
+    return sync_files(list_patent_files(folder), folder, workers)[1]
+
+
+def load_patent_table(fname, folder=PATENT_FOLDER):
+    entry = ensure_sidecar(fname, folder)
+    key = (os.path.abspath(folder), fname, entry["sha1"])
+    with _lock:
+        table = _tables.get(key)
+        if table is None:
+            for stale in [k for k in _tables if k[:2] == key[:2]]:
+                del _tables[stale]
+            source = pa.memory_map(_sidecar_path(folder, fname), "r")
+            table = pa.ipc.open_file(source).read_all()
+            _tables[key] = table
+    return table
+
+
+def load_patent_index(fname, folder=PATENT_FOLDER):
+    entry = ensure_sidecar(fname, folder)
+    key = (os.path.abspath(folder), fname, entry["sha1"])
+    with _lock:
+        index = _indexes.get(key)
+        if index is None:
+            for stale in [k for k in _indexes if k[:2] == key[:2]]:
+                del _indexes[stale]
+            path = _index_path(folder, fname)
+            if os.path.exists(path):
+                index = PatentIndex.load(path)
+            else:
+                index = PatentIndex.build(load_patent_table(fname, folder).to_pandas())
+                index.save(path)
+            _indexes[key] = index
+    return index
+
+
+def _cached(cache, key, load):
+    # cache[key], loaded by load() outside _lock so readers of other files are not held up by a
+    # slow build; concurrent callers for one key share a single load
+    pending_key = (id(cache), key)
+    while True:
+        with _lock:
+            if key in cache:
+                return cache[key]
+            pending = _building.get(pending_key)
+            if pending is None:
+                pending = _building[pending_key] = threading.Event()
+                break
+        pending.wait()  # if that load failed, the next pass tries again
+    try:
+        value = load()
+        with _lock:
+            for stale in [k for k in cache if k[:2] == key[:2]]:
+                del cache[stale]
+            cache[key] = value
+        return value
+    finally:
+        with _lock:
+            del _building[pending_key]
+        pending.set()
+
+
+def load_patent_signatures(fname, folder=PATENT_FOLDER):
+    entry = ensure_sidecar(fname, folder)
+
+    def load():
+        path = _signature_path(folder, fname)
+        signatures = np.load(path) if os.path.exists(path) else None
+        if signatures is None or signatures.shape != (entry["rows"], NUM_HASHES):
+            # Stores converted before family grouping existed, or with another signature width
+            signatures = record_signatures(load_patent_table(fname, folder).to_pandas())
+            _save_signatures(path, signatures)
+        return signatures
+    return _cached(_signatures, (os.path.abspath(folder), fname, entry["sha1"]), load)
+
+
+def load_patent_matrix(fname, folder=PATENT_FOLDER):
+    entry = ensure_sidecar(fname, folder)
+
+    def load():
+        path = _matrix_path(folder, fname)
+        matrix = TermMatrix.load(path) if os.path.exists(path) else None
+        if matrix is None or matrix.n_rows != entry["rows"]:
+            # Stores converted before ranked search existed
+            matrix = TermMatrix.build(load_patent_table(fname, folder).to_pandas(), PATENT_FIELDS)
+            matrix.save(path)
+        return matrix
+    return _cached(_matrices, (os.path.abspath(folder), fname, entry["sha1"]), load)
+
+
+@perf.timed("patents.families")
+def load_family_groups(fnames, folder=PATENT_FOLDER):
+    # Family group id of every record of fnames, in the order load_patents concatenates them
+    signatures = [load_patent_signatures(fname, folder) for fname in fnames]
+    tables = [load_patent_table(fname, folder) for fname in fnames]
+    keys = []
+    if any(col in table.column_names for table in tables for col in FAMILY_KEY_COLUMNS):
+        # Files without a key column get nulls for it, which never join anything
+        keys = family_keys(tables_to_frame([table.select([SOURCE_COLUMN] + [col for col in FAMILY_KEY_COLUMNS
+                                                                            if col in table.column_names])
+                                            for table in tables]))
+    return family_groups(np.concatenate(signatures) if signatures else record_signatures(pd.DataFrame()), keys)
+
+
+def tables_to_frame(tables):
+    # Exports can type a column differently (a blank cell turns integers into doubles); numeric
+    # types are widened, and columns holding numbers in one export and text in another become text
+    if not tables:
+        return pd.DataFrame()
+    try:
+        table = pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        types = {}
+        for table in tables:
+            for field in table.schema:
+                if not pa.types.is_null(field.type):
+                    types.setdefault(field.name, set()).add(field.type)
+        mixed = {name for name, found in types.items() if len(found) > 1}
+        table = pa.concat_tables([_cast_columns(table, mixed, pa.large_string()) for table in tables],
+                                 promote_options="permissive")
+    return table.to_pandas()
+
+
+def _cast_columns(table, names, to_type):
+    for i, field in enumerate(table.schema):
+        if field.name in names and not pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(to_type))
+    return table
+
+
+def load_patents(fnames, folder=PATENT_FOLDER):
+    # One frame per set of files and contents, shared by every session; callers get a shallow
+    # (copy-on-write) copy
+    entries, errors = sync_files(fnames, folder, workers=1)
+    if errors:
+        raise next(iter(errors.values()))
+    key = (os.path.abspath(folder), tuple(fnames), tuple(entries[fname]["sha1"] for fname in fnames))
+    frame = _frames.get(key, key[:2], perf.timed("patents.frame")(lambda: _combined_frame(fnames, folder)))
+    return frame.copy(deep=False)
+
+
+def _combined_frame(fnames, folder):
+    frame = tables_to_frame([load_patent_table(fname, folder) for fname in fnames])
+    if len(frame):
+        frame[FAMILY_COLUMN] = load_family_groups(fnames, folder)
+    return frame
@@ -0,0 +1,267 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Timings of the dashboard's hot paths. main_app wraps each rerun in rerun(); span() and timed()
+# add the time of a named step to the rerun running on the current thread (Streamlit runs each
+# session's script on its own thread). With no rerun being recorded a span is a thread-local
+# lookup and a shared no-op context. Reruns are recorded when a session opens the sidebar
+# Performance panel, or for every session when SPS_PERF_LOG names a JSON-lines file to append
+# them to. Steps on other threads (background jobs, geocoding) are recorded only with SPS_PERF_LOG.
+PERF_LOG = os.environ.get("SPS_PERF_LOG") or None
+PERF_JSONL_NAME = "perf_runs.jsonl"  # exports go to the data folder
+PERF_PROM_NAME = "perf_metrics.prom"
+RECENT_RUNS = 200
+
+_local = threading.local()
+_lock = threading.Lock()
+_log_lock = threading.Lock()  # serializes appends to PERF_LOG without holding up _lock
+_recent = deque(maxlen=RECENT_RUNS)
+_totals = {}  # (page, span) -> [calls, seconds]; page None for steps outside a rerun
+_reruns = {}  # page -> [reruns, seconds]
+_caches = {}  # name -> stats() returning a dict with hits and misses
+_NULL = nullcontext()
+
+
+class Run:
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.seconds = 0.0
+        self.spans = {}  # name -> [calls, seconds]
+
+    def add(self, name, seconds):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def record(self):
+        return {
+            "ts": round(self.started, 3),
+            "page": self.page,
+            "total_s": round(self.seconds, 6),
+            "spans": {name: {"calls": calls, "seconds": round(seconds, 6)} for name, (calls, seconds) in self.spans.items()},
+            "rss_mb": _round(rss_mb()),
+            "peak_rss_mb": _round(peak_rss_mb()),
+            "caches": cache_stats(),
+        }
+
+
+class _Background:
+    # Collects spans that run outside any rerun, straight into the process totals
+    page = None
+
+    def add(self, name, seconds):
+        with _lock:
+            entry = _totals.setdefault((None, name), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+
+_background = _Background()
+
+
+def _current():
+    run = getattr(_local, "run", None)
+    if run is None and PERF_LOG:
+        return _background
+    return run
+
+
+@contextmanager
+def _span(run, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.add(name, time.perf_counter() - start)
+
+
+def span(name):
+    run = _current()
+    return _NULL if run is None else _span(run, name)
+
+
+def timed(name):
+    # Decorator form of span()
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            run = _current()
+            if run is None:
+                return fn(*args, **kwargs)
+            with _span(run, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def rerun(page, record=False):
+    # Records the rerun of page when record is true or SPS_PERF_LOG is set; yields the Run or None
+    if not (record or PERF_LOG):
+        yield None
+        return
+    run = _local.run = Run(page)
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        # st.rerun() and st.stop() end a script with an exception; the rerun still counts
+        run.seconds = time.perf_counter() - start
+        _local.run = None
+        _finish(run)
+
+
+def _finish(run):
+    record = run.record()
+    with _lock:
+        _recent.append(record)
+        entry = _reruns.setdefault(run.page, [0, 0.0])
+        entry[0] += 1
+        entry[1] += run.seconds
+        for name, (calls, seconds) in run.spans.items():
+            total = _totals.setdefault((run.page, name), [0, 0.0])
+            total[0] += calls
+            total[1] += seconds
+    if PERF_LOG:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with _log_lock:
+            with open(PERF_LOG, "a", encoding="utf-8") as fh:
+                fh.write(line)
+
+
+# ---------------- caches and memory ----------------
+def register_cache(name, stats):
+    # stats() -> dict with at least "hits" and "misses"
+    _caches[name] = stats
+
+
+def lru_stats(fn):
+    # stats() for a functools.lru_cache function
+    def stats():
+        info = fn.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+    return stats
+
+
+def cache_stats():
+    result = {}
+    for name, stats in list(_caches.items()):
+        values = stats()
+        lookups = values["hits"] + values["misses"]
+        result[name] = {"hits": values["hits"], "misses": values["misses"],
+                        "hit_rate": round(values["hits"] / lookups, 4) if lookups else None}
+    return result
+
+
+def _proc_status_mb(field):
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _round(mb):
+    return None if mb is None else round(mb, 1)
+
+
+def rss_mb():
+    # Resident memory of this process, or None where neither /proc nor psutil can tell
+    mb = _proc_status_mb("VmRSS:")
+    if mb is None and psutil is not None:
+        mb = psutil.Process().memory_info().rss / 1024 / 1024
+    return mb
+
+
+def peak_rss_mb():
+    mb = _proc_status_mb("VmHWM:")
+    if mb is None and resource is not None:
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    elif mb is None and psutil is not None:
+        mb = getattr(psutil.Process().memory_info(), "peak_wset", 0) / 1024 / 1024 or None  # Windows
+    return mb
+
+
+# ---------------- reports and exports ----------------
+def recent_runs(page=None):
+    with _lock:
+        return [record for record in _recent if page is None or record["page"] == page]
+
+
+def page_summary():
+    # page -> (reruns, mean seconds)
+    with _lock:
+        return {page: (count, seconds / count) for page, (count, seconds) in _reruns.items()}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    with _lock:
+        totals = dict(_totals)
+        reruns = dict(_reruns)
+    lines = ["# TYPE sps_rerun_seconds_total counter", "# TYPE sps_reruns_total counter"]
+    for page, (count, seconds) in sorted(reruns.items()):
+        lines.append(f'sps_rerun_seconds_total{{page="{_label(page)}"}} {seconds:.6f}')
+        lines.append(f'sps_reruns_total{{page="{_label(page)}"}} {count}')
+    lines += ["# TYPE sps_span_seconds_total counter", "# TYPE sps_span_calls_total counter"]
+    for (page, name), (calls, seconds) in sorted(totals.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+        labels = f'page="{_label(page or "")}",span="{_label(name)}"'
+        lines.append(f"sps_span_seconds_total{{{labels}}} {seconds:.6f}")
+        lines.append(f"sps_span_calls_total{{{labels}}} {calls}")
+    lines += ["# TYPE sps_cache_hits_total counter", "# TYPE sps_cache_misses_total counter"]
+    for name, stats in sorted(cache_stats().items()):
+        lines.append(f'sps_cache_hits_total{{cache="{_label(name)}"}} {stats["hits"]}')
+        lines.append(f'sps_cache_misses_total{{cache="{_label(name)}"}} {stats["misses"]}')
+    for metric, mb in [("sps_resident_memory_bytes", rss_mb()), ("sps_peak_resident_memory_bytes", peak_rss_mb())]:
+        if mb is not None:
+            lines += [f"# TYPE {metric} gauge", f"{metric} {mb * 1024 * 1024:.0f}"]
+    return "\n".join(lines) + "\n"
+
+
+def _write(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _data_path(name):
+    from modules.data_loader import get_data_dir  # data_loader imports this module
+    return os.path.join(get_data_dir(), name)
+
+
+def export_jsonl(path=None):
+    text = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in recent_runs())
+    return _write(path or _data_path(PERF_JSONL_NAME), text)
+
+
+def export_prometheus(path=None):
+    return _write(path or _data_path(PERF_PROM_NAME), prometheus_text())
@@ -0,0 +1,50 @@
+import streamlit as st
+import pandas as pd
+from modules import perf
+
+
+def show_panel(run):
+    # Sidebar report of the rerun that just finished, the caches and the reruns so far
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        if run is None:
+            return
+        caption = f"**{run.page}**: {run.seconds * 1000:,.0f} ms this rerun"
+        rss, peak = perf.rss_mb(), perf.peak_rss_mb()
+        # Either can be unknown on platforms without /proc, psutil or resource
+        if rss is not None:
+            caption += f" · RSS {rss:,.0f} MB"
+        if peak is not None:
+            caption += f" · peak {peak:,.0f} MB"
+        st.caption(caption)
+        if run.spans:
+            steps = pd.DataFrame([
+                {"Step": name, "Calls": calls, "ms": round(seconds * 1000, 1),
+                 "Share (%)": round(seconds / run.seconds * 100, 1) if run.seconds else 0.0}
+                for name, (calls, seconds) in run.spans.items()
+            ]).sort_values("ms", ascending=False)
+            st.dataframe(steps, hide_index=True)
+        else:
+            st.caption("No instrumented steps ran.")
+
+        caches = perf.cache_stats()
+        if caches:
+            st.markdown("**Caches**")
+            st.dataframe(pd.DataFrame([
+                {"Cache": name, "Hits": stats["hits"], "Misses": stats["misses"],
+                 "Hit rate (%)": round(stats["hit_rate"] * 100, 1) if stats["hit_rate"] is not None else None}
+                for name, stats in caches.items()
+            ]), hide_index=True)
+
+        summary = perf.page_summary()
+        if summary:
+            st.markdown("**Recorded reruns**")
+            st.dataframe(pd.DataFrame([
+                {"Page": page, "Reruns": count, "Mean ms": round(mean * 1000, 1)}
+                for page, (count, mean) in summary.items()
+            ]), hide_index=True)
+
+        col1, col2 = st.columns(2)
+        if col1.button("Export JSON lines", key="perf_export_jsonl"):
+            st.success(f"Wrote {perf.export_jsonl()}")
+        if col2.button("Export Prometheus", key="perf_export_prom"):
+            st.success(f"Wrote {perf.export_prometheus()}")
@@ -0,0 +1,195 @@
+import heapq
+import math
+import os
+import threading
+from collections import OrderedDict
+from itertools import chain, islice
+import numpy as np
+import pandas as pd
+from modules.patent_index import tokenize
+from modules import perf
+
+# Ranked (BM25) retrieval over the patent and References tables. Each segment of a table (one
+# patent file, or the References sheet) keeps a sparse term-by-record matrix in compressed rows:
+# per term, the records it occurs in and its weighted count there. A query's scores are the
+# product of that matrix with the query's term weights, accumulated with one bincount over the
+# query terms' rows only. Each segment yields its best k records and a heap merges them.
+# Collection statistics (record count, document frequencies, mean length) span all segments
+# searched, so scores are comparable across patent files.
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOP_K = 50
+SCORE_COLUMN = "Relevance"
+# Column -> weight of its words; other tables index every column with weight 1
+PATENT_FIELDS = {"Title (Translated)(English)": 2, "Abstract (Translated)(English)": 1}
+MAX_CACHED_MATRICES = 8
+
+
+class TermMatrix:
+    def __init__(self, vocab, offsets, rows, counts, lengths):
+        self.vocab = vocab  # sorted terms (object array)
+        self.offsets = offsets  # term i's entries are [offsets[i], offsets[i + 1])
+        self.rows = rows  # record of each entry, ascending within a term
+        self.counts = counts  # weighted occurrences of the term in that record
+        self.lengths = lengths  # weighted word count of each record
+        self.total_length = float(lengths.sum())
+
+    @property
+    def n_rows(self):
+        return len(self.lengths)
+
+    @classmethod
+    def build(cls, df, fields=None):
+        builder = TermMatrixBuilder(fields)
+        builder.add(df)
+        return builder.finish()
+
+    def term_id(self, term):
+        i = int(np.searchsorted(self.vocab, term))
+        return i if i < len(self.vocab) and self.vocab[i] == term else None
+
+    def doc_freq(self, term):
+        i = self.term_id(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def postings(self, term):
+        i = self.term_id(term)
+        if i is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.rows[start:end], self.counts[start:end]
+
+    def save(self, path):
+        # Terms are \w+ runs, so newlines separate them safely
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, vocab=np.frombuffer("\n".join(self.vocab.tolist()).encode("utf-8"), dtype=np.uint8),
+                     offsets=self.offsets, rows=self.rows, counts=self.counts, lengths=self.lengths)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            text = data["vocab"].tobytes().decode("utf-8")
+            vocab = np.array(text.split("\n") if text else [], dtype=object)
+            return cls(vocab, data["offsets"], data["rows"], data["counts"], data["lengths"])
+
+
+class TermMatrixBuilder:
+    # Builds a TermMatrix from consecutive row batches; only (term, record, count) entries are kept
+    def __init__(self, fields=None):
+        self.fields = fields
+        self.n_rows = 0
+        self._vocab = {}  # term -> id in order of first occurrence
+        self._terms, self._rows, self._counts, self._lengths = [], [], [], []
+
+    def add(self, df):
+        fields = self.fields or {col: 1 for col in df.columns}
+        tokens, cell_rows, cell_weights = [], [], []
+        for col, weight in fields.items():
+            if col not in df.columns:
+                continue
+            for row, value in enumerate(df[col].tolist()):
+                if isinstance(value, str):
+                    tokens.append(tokenize(value.lower()))
+                elif value is not None and not (isinstance(value, float) and math.isnan(value)):
+                    tokens.append(tokenize(str(value).lower()))
+                else:
+                    continue
+                cell_rows.append(row)
+                cell_weights.append(weight)
+        n = len(df)
+        sizes = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        rows = np.repeat(np.array(cell_rows, dtype=np.int64), sizes)
+        weights = np.repeat(np.array(cell_weights, dtype=np.float32), sizes)
+        codes, uniques = pd.factorize(np.array(list(chain.from_iterable(tokens)), dtype=object))
+        if len(codes):
+            # Sum the weights of each (term, record) pair of the batch
+            pairs, inverse = np.unique(codes * n + rows, return_inverse=True)
+            ids = np.fromiter((self._vocab.setdefault(term, len(self._vocab)) for term in uniques),
+                              dtype=np.int64, count=len(uniques))
+            self._terms.append(ids[pairs // n])
+            self._rows.append(pairs % n + self.n_rows)
+            self._counts.append(np.bincount(inverse, weights, minlength=len(pairs)).astype(np.float32))
+        self._lengths.append(np.bincount(rows, weights, minlength=n).astype(np.float32))
+        self.n_rows += n
+
+    def finish(self):
+        vocab = np.array(list(self._vocab), dtype=object)
+        alphabetical = np.argsort(vocab, kind="stable") if len(vocab) else np.zeros(0, dtype=np.int64)
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[alphabetical] = np.arange(len(vocab))
+        terms = rank[np.concatenate(self._terms)] if self._terms else np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(self._counts) if self._counts else np.zeros(0, dtype=np.float32)
+        order = np.lexsort((rows, terms))
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(vocab))))).astype(np.int64)
+        lengths = np.concatenate(self._lengths) if self._lengths else np.zeros(0, dtype=np.float32)
+        return TermMatrix(vocab[alphabetical], offsets, rows[order].astype(np.int32), counts[order], lengths)
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query.lower())))
+
+
+def _top(scores, k):
+    # Best k (score, record) of a segment, best first; ties go to the earlier record
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        kth = -np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[scores[candidates] >= kth]
+    order = np.lexsort((candidates, -scores[candidates]))[:k]
+    return [(float(scores[row]), int(row)) for row in candidates[order]]
+
+
+@perf.timed("search.ranked")
+def top_k(matrices, query, k=TOP_K):
+    # Positions (into the matrices' tables concatenated in order) and BM25 scores of the k best records
+    terms = query_terms(query)
+    n_total = sum(matrix.n_rows for matrix in matrices)
+    if not terms or not n_total or k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    mean_length = sum(matrix.total_length for matrix in matrices) / n_total or 1.0
+    idf = {}
+    for term in terms:
+        df = sum(matrix.doc_freq(term) for matrix in matrices)
+        idf[term] = math.log(1 + (n_total - df + 0.5) / (df + 0.5))
+
+    ranked = []
+    offset = 0
+    for matrix in matrices:
+        rows, weights = [], []
+        for term in terms:
+            term_rows, counts = matrix.postings(term)
+            if not len(term_rows):
+                continue
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * matrix.lengths[term_rows] / mean_length)
+            rows.append(term_rows)
+            weights.append(idf[term] * counts * (BM25_K1 + 1) / (counts + norm))
+        if rows:
+            scores = np.bincount(np.concatenate(rows), np.concatenate(weights), minlength=matrix.n_rows)
+            ranked.append([(score, offset + row) for score, row in _top(scores, k)])
+        offset += matrix.n_rows
+    # Each segment's list is best first; the heap merge keeps the overall order
+    best = list(islice(heapq.merge(*ranked, key=lambda item: (-item[0], item[1])), k))
+    return np.array([row for _, row in best], dtype=np.int64), np.array([score for score, _ in best])
+
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # key -> TermMatrix
+
+
+def get_term_matrix(key, df, fields=None):
+    # In-memory matrix of a loaded table; key it by the table's data version
+    with _lock:
+        matrix = _cache.get(key)
+        if matrix is not None:
+            _cache.move_to_end(key)
+            return matrix
+    with perf.span("search.ranked_index"):
+        matrix = TermMatrix.build(df, fields)
+    with _lock:
+        _cache[key] = matrix
+        while len(_cache) > MAX_CACHED_MATRICES:
+            _cache.popitem(last=False)
+    return matrix
@@ -1,30 +1,47 @@
 import streamlit as st
 import pandas as pd
-from modules.data_loader import load_data
-import os
+from modules.data_loader import load_data, save_data, data_version
+from modules.search_engine import get_table_search
+from modules.ranked_search import SCORE_COLUMN, get_term_matrix, top_k
+from modules.table_view import show_table, edit_table
+from modules.jobs import submit, frame_key
+from modules.job_view import track_job, show_job
+
+
+def save_references(job, edited_df, page_df):
+    job.progress(0.0, "Saving references…")
+    save_data(edited_df, "References", base=page_df)
 
 def show():
     st.header("📚 References Library")
     ref_df = load_data("References")
 
-    columns = ['All'] + ref_df.columns.tolist()
-    selected_column = st.selectbox("Filter by column:", columns)
+    ranked = st.checkbox("Rank by relevance", key="references_ranked")
+    if not ranked:
+        columns = ['All'] + ref_df.columns.tolist()
+        selected_column = st.selectbox("Filter by column:", columns)
     search = st.text_input("Enter search keyword:")
 
     if search:
-        if selected_column == 'All':
-            filtered = ref_df[ref_df.apply(lambda row: row.astype(str).str.contains(search, case=False).any(), axis=1)]
+        if ranked:
+            # The best matches over every column, best first
+            rows, scores = top_k([get_term_matrix(("References", data_version("References")), ref_df)], search)
+            filtered = ref_df.iloc[rows].assign(**{SCORE_COLUMN: scores.round(3)})
+        else:
+            table_search = get_table_search(("References", data_version("References")), ref_df)
+            filtered = ref_df[table_search.match_pattern(search, selected_column)]
+        if filtered.empty:
+            st.write("❌ No matches found!")
         else:
-            filtered = ref_df[ref_df[selected_column].astype(str).str.contains(search, case=False)]
-        st.write(filtered if not filtered.empty else "❌ No matches found!")
+            show_table(filtered, "reference_results", filterable=False)
 
     st.subheader("📑 Edit or Add References")
-    edited_df = st.data_editor(ref_df, num_rows="dynamic")
+    edited_df, page_df = edit_table(ref_df, "references", search_key=("References", data_version("References")),
+                                    num_rows="dynamic")
 
     if st.button("💾 Save References"):
-        edited_df.to_csv(ref_path, index=False)
-        st.success("✅ References updated!")
-        time.sleep(1.5)
-        st.rerun()
+        track_job("references_save", submit("save_references", save_references, edited_df, page_df,
+                                            key="save_references:" + frame_key(edited_df)))
+    show_job("references_save", "✅ References updated!")
 
 # CSV backend, interactive map filters, clickable reference button, color-coded markers
@@ -0,0 +1,81 @@
+import pandas as pd
+import numpy as np
+import re
+import threading
+from collections import OrderedDict
+from modules import perf
+
+# Vectorized multi-term search over a loaded table. Cell text is normalized once per table
+# (str(cell), as the old row-wise searches did) and every query then runs as pandas string
+# operations over whole columns instead of a Python call per row.
+CELL_SEPARATOR = "\x1f"  # never typed by users, so a term cannot match across two cells
+MAX_CACHED_TABLES = 8
+
+_lock = threading.Lock()
+_cache = OrderedDict()  # key -> TableSearch
+
+
+def cell_text(series):
+    # Same text as str(cell) for every cell; string columns convert column-wide and numbers
+    # are formatted once per distinct value
+    if series.dtype != object and pd.api.types.is_string_dtype(series.dtype):
+        return series.fillna("nan")
+    if pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_float_dtype(series.dtype):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        labels = np.array([str(value) for value in uniques] + ["nan"], dtype=object)
+        return pd.Series(labels[codes], index=series.index, dtype="str")
+    return series.astype(object).map(str).astype("str")
+
+
+class TableSearch:
+    def __init__(self, df):
+        self.columns = df.columns.tolist()
+        self.n_rows = len(df)
+        self.text = {col: cell_text(df[col]) for col in self.columns}
+        self.lower = {col: text.str.lower() for col, text in self.text.items()}
+        self.all_lower = pd.Series([""] * self.n_rows, index=df.index, dtype="str")
+        for position, col in enumerate(self.columns):
+            # Elementwise string concatenation is vectorized, unlike Series.str.cat
+            self.all_lower = self.lower[col] if position == 0 else self.all_lower + CELL_SEPARATOR + self.lower[col]
+
+    @perf.timed("search.terms")
+    def match_terms(self, terms, column="All", mode="all"):
+        # Case-insensitive substring terms, combined with AND ("all") or OR ("any")
+        text = self.all_lower if column == "All" else self.lower[column]
+        masks = [text.str.contains(term.lower(), regex=False).to_numpy(dtype=bool) for term in terms]
+        if not masks:
+            return np.ones(self.n_rows, dtype=bool)
+        return np.logical_and.reduce(masks) if mode == "all" else np.logical_or.reduce(masks)
+
+    @perf.timed("search.pattern")
+    def match_pattern(self, pattern, column="All"):
+        # Case-insensitive regular expression, true when any searched cell matches
+        try:
+            re.compile(pattern)
+            regex = True
+        except re.error:
+            regex = False
+        columns = self.columns if column == "All" else [column]
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for col in columns:
+            mask |= self.text[col].str.contains(pattern, case=False, regex=regex).to_numpy(dtype=bool)
+        return mask
+
+
+def get_table_search(key, df):
+    with _lock:
+        search = _cache.get(key)
+        if search is not None:
+            _cache.move_to_end(key)
+            return search
+    with perf.span("search.index"):
+        search = TableSearch(df)
+    with _lock:
+        _cache[key] = search
+        while len(_cache) > MAX_CACHED_TABLES:
+            _cache.popitem(last=False)
+    return search
+
+
+def split_terms(query):
+    return [term.strip().lower() for term in query.split(",") if term.strip()]
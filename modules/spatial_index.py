@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# Grid index over site coordinates for the map page. Sites are bucketed into CELL_DEGREES cells
+# numbered row-major (latitude band, then longitude), and kept sorted by cell, so a bounding box
+# is one contiguous slice per latitude band; radius and nearest-neighbour queries use the box
+# around the circle and then exact haversine distances. Results are positions into the arrays
+# the index was built from (the CompanyModel row order).
+CELL_DEGREES = 1.0
+REGION_DEGREES = 10.0  # cell size for aggregate()
+EARTH_RADIUS_KM = 6371.0088
+REBUILD_FRACTION = 0.25  # updated() re-sorts from scratch when more rows than this changed
+
+_N_ROWS = int(np.ceil(180 / CELL_DEGREES))
+_N_COLS = int(np.ceil(360 / CELL_DEGREES))
+
+
+def _rows(lat):
+    return np.clip(np.floor((np.asarray(lat, dtype=np.float64) + 90) / CELL_DEGREES), 0, _N_ROWS - 1).astype(np.int64)
+
+
+def _cols(lon):
+    return np.clip(np.floor((np.asarray(lon, dtype=np.float64) + 180) / CELL_DEGREES), 0, _N_COLS - 1).astype(np.int64)
+
+
+def _cells(lat, lon):
+    # -1 for sites without coordinates
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    cells = np.full(len(lat), -1, dtype=np.int64)
+    cells[valid] = _rows(lat[valid]) * _N_COLS + _cols(lon[valid])
+    return cells
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _same(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class SpatialIndex:
+    def __init__(self, lat, lon, ids=None, order=None, cells=None):
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.lon = np.ascontiguousarray(lon, dtype=np.float64)
+        self.ids = pd.Index(ids if ids is not None else np.arange(len(self.lat)))
+        self.cells = _cells(self.lat, self.lon) if cells is None else cells
+        if order is None:
+            order = np.flatnonzero(self.cells >= 0)
+            order = order[np.argsort(self.cells[order], kind="stable")]
+        self.order = order  # positions of the located sites, sorted by cell
+        self.sorted_cells = self.cells[order]
+
+    def __len__(self):
+        return len(self.lat)
+
+    def updated(self, lat, lon, ids):
+        # Index over new arrays (rows keyed by ids, e.g. the Companies _row_id). Rows whose id and
+        # coordinates are unchanged keep their place in the cell order; only the others are
+        # bucketed and merged in, which is linear instead of a full sort.
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        ids = pd.Index(ids)
+        if not (ids.is_unique and self.ids.is_unique):
+            return SpatialIndex(lat, lon, ids)
+        old = self.ids.get_indexer(ids)
+        same = old >= 0
+        matched = old[same]
+        same[same] = _same(self.lat[matched], lat[same]) & _same(self.lon[matched], lon[same])
+        changed = np.flatnonzero(~same)
+        if len(changed) > REBUILD_FRACTION * len(lat):
+            return SpatialIndex(lat, lon, ids)
+
+        new_position = np.full(len(self.ids), -1, dtype=np.int64)
+        new_position[old[same]] = np.flatnonzero(same)
+        kept = new_position[self.order]
+        kept = kept[kept >= 0]
+        cells = np.full(len(lat), -1, dtype=np.int64)
+        cells[same] = self.cells[old[same]]
+        cells[changed] = _cells(lat[changed], lon[changed])
+        added = changed[cells[changed] >= 0]
+        added = added[np.argsort(cells[added], kind="stable")]
+        order = np.insert(kept, np.searchsorted(cells[kept], cells[added], side="right"), added)
+        return SpatialIndex(lat, lon, ids, order=order, cells=cells)
+
+    # ---------------- queries ----------------
+    def _band_candidates(self, row_lo, row_hi, col_lo, col_hi):
+        # Positions in cells [col_lo, col_hi] of every latitude band row_lo..row_hi
+        rows = np.arange(row_lo, row_hi + 1, dtype=np.int64)
+        starts = np.searchsorted(self.sorted_cells, rows * _N_COLS + col_lo, side="left")
+        ends = np.searchsorted(self.sorted_cells, rows * _N_COLS + col_hi, side="right")
+        counts = ends - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Concatenation of the slices starts[i]:ends[i] without a Python loop
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        return self.order[np.arange(total) + offsets]
+
+    def bbox(self, south, west, north, east):
+        # Sorted positions inside the box; west > east means the box crosses the antimeridian
+        if west > east:
+            return np.union1d(self.bbox(south, west, north, 180.0), self.bbox(south, -180.0, north, east))
+        row_lo, row_hi = _rows(max(south, -90.0)), _rows(min(north, 90.0))
+        col_lo, col_hi = _cols(max(west, -180.0)), _cols(min(east, 180.0))
+        candidates = self._band_candidates(row_lo, row_hi, col_lo, col_hi)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(candidates[inside])
+
+    def radius(self, lat, lon, km):
+        # (positions, distances in km) within km of the point, nearest first
+        dlat = np.degrees(km / EARTH_RADIUS_KM)
+        south, north = lat - dlat, lat + dlat
+        if south <= -90 or north >= 90:
+            candidates = self.order
+        else:
+            # Widest longitude span of the circle, at its edge nearest a pole
+            dlon = np.degrees(km / (EARTH_RADIUS_KM * np.cos(np.radians(max(abs(south), abs(north))))))
+            west, east = lon - dlon, lon + dlon
+            if dlon >= 180:
+                spans = [(-180.0, 180.0)]
+            elif west < -180:
+                spans = [(west + 360, 180.0), (-180.0, east)]
+            elif east > 180:
+                spans = [(west, 180.0), (-180.0, east - 360)]
+            else:
+                spans = [(west, east)]
+            candidates = np.concatenate([self._band_candidates(_rows(south), _rows(north), _cols(w), _cols(e))
+                                         for w, e in spans])
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        keep = distances <= km
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, lat, lon, k, exclude=None):
+        # (positions, distances in km) of the k sites nearest the point; exclude drops one position
+        # (the site the query is centred on). The search radius doubles until it holds k sites,
+        # and everything within that radius has been measured, so the k found are the nearest.
+        wanted = k + (exclude is not None)
+        km = max(CELL_DEGREES * 111.0, 1.0)
+        while True:
+            positions, distances = self.radius(lat, lon, km)
+            if len(positions) >= wanted or km >= np.pi * EARTH_RADIUS_KM:
+                break
+            km *= 2
+        if exclude is not None:
+            keep = positions != exclude
+            positions, distances = positions[keep], distances[keep]
+        return positions[:k], distances[:k]
+
+    def aggregate(self, values, positions=None, degrees=REGION_DEGREES):
+        # Regions of degrees x degrees with their site count, summed values and mean position
+        positions = self.order if positions is None else np.asarray(positions)
+        positions = positions[self.cells[positions] >= 0]
+        lat, lon = self.lat[positions], self.lon[positions]
+        values = np.asarray(values, dtype=np.float64)[positions]
+        region_cols = int(np.ceil(360 / degrees))
+        region = (np.floor((lat + 90) / degrees).astype(np.int64) * region_cols
+                  + np.floor((lon + 180) / degrees).astype(np.int64))
+        regions, inverse = np.unique(region, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(regions))
+        south = (regions // region_cols) * degrees - 90
+        west = (regions % region_cols) * degrees - 180
+        return pd.DataFrame({
+            "south": south, "west": west, "north": np.minimum(south + degrees, 90), "east": np.minimum(west + degrees, 180),
+            "sites": counts,
+            "total": np.bincount(inverse, weights=np.nan_to_num(values), minlength=len(regions)),
+            "lat": np.bincount(inverse, weights=lat, minlength=len(regions)) / counts,
+            "lon": np.bincount(inverse, weights=lon, minlength=len(regions)) / counts,
+        })
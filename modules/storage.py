@@ -0,0 +1,429 @@
+import pandas as pd
+import numpy as np
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+# Transactional row store behind data_loader. Every workbook sheet is a SQLite table keyed by
+# ROW_ID, so edits touch only the rows that changed. The Excel workbook stays the
+# import/export format: it is imported when the database is created, or when the workbook
+# on disk is newer than the last import/export and the database has no edits since then.
+ROW_ID = "_row_id"
+META_TABLE = "_sheets"
+STATE_TABLE = "_state"
+DATETIME = "datetime"
+ID_CHUNK = 500  # ids per "IN (...)" lookup, under SQLite's bound-parameter limit
+LOWER_FUNCTION = "py_lower"  # SQL function lowercasing text with Python's Unicode rules
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _table(sheet):
+    return _quote("sheet:" + sheet)
+
+
+def to_sql_value(value):
+    if value is None or (not isinstance(value, (str, bytes)) and pd.isna(value)):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return int(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    if isinstance(value, (datetime.date, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    return str(value)
+
+
+def _row_values(df):
+    return [tuple(to_sql_value(v) for v in values) for values in df.itertuples(index=False, name=None)]
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _column_types(df):
+    return {col: DATETIME if pd.api.types.is_datetime64_any_dtype(df[col]) else "" for col in df.columns}
+
+
+class SheetStore:
+    def __init__(self, db_path, excel_path, workbook_loader=None):
+        self.db_path = os.path.abspath(db_path)
+        self.excel_path = os.path.abspath(excel_path)
+        # workbook_loader(path) -> {sheet: DataFrame}; data_loader passes its cached parser
+        self.workbook_loader = workbook_loader or (lambda path: pd.read_excel(path, sheet_name=None, engine="openpyxl"))
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._ready = False
+
+    # ---------------- connections and transactions ----------------
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function(LOWER_FUNCTION, 1, _lower, deterministic=True)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (name TEXT PRIMARY KEY, columns TEXT, types TEXT)")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (key TEXT PRIMARY KEY, value)")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        # One writer at a time in this process (RLock) and across processes (BEGIN IMMEDIATE)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = conn.total_changes
+                result = fn(conn)
+                if conn.total_changes != before:  # a transaction that wrote nothing keeps the version
+                    conn.execute(f"INSERT INTO {STATE_TABLE} VALUES ('version', 1) "
+                                 f"ON CONFLICT(key) DO UPDATE SET value = value + 1")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def _get_state(self, conn, key):
+        row = conn.execute(f"SELECT value FROM {STATE_TABLE} WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, conn, key, value):
+        conn.execute(f"INSERT INTO {STATE_TABLE} VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def _sheet_version(self, conn, sheet):
+        return int(self._get_state(conn, "version:" + sheet) or 0)
+
+    def _touch(self, conn, sheet):
+        conn.execute(f"INSERT INTO {STATE_TABLE} VALUES (?, 1) ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                     ("version:" + sheet,))
+
+    # ---------------- Excel import / export ----------------
+    def ensure_ready(self):
+        if self._ready and not self._excel_is_newer():
+            return
+        with self._lock:
+            conn = self._connect()
+            has_sheets = conn.execute(f"SELECT COUNT(*) FROM {META_TABLE}").fetchone()[0] > 0
+            # A newer workbook replaces the database only while that loses no edits; otherwise
+            # importing it is left to an explicit import_excel (see excel_conflict)
+            if os.path.exists(self.excel_path) and (not has_sheets or (self._excel_is_newer() and self.is_synced())):
+                self.import_excel()
+            self._ready = True
+
+    def _excel_is_newer(self):
+        if not os.path.exists(self.excel_path):
+            return False
+        synced = self._get_state(self._connect(), "excel_mtime_ns")
+        return synced is None or os.stat(self.excel_path).st_mtime_ns > int(synced)
+
+    def is_synced(self):
+        # Whether every write is in the workbook (nothing written since the last import/export)
+        synced = self._get_state(self._connect(), "synced_version")
+        return synced is not None and int(synced) == self.version()
+
+    def excel_conflict(self):
+        # The workbook changed on disk while the database holds edits it doesn't have
+        return self._excel_is_newer() and not self.is_synced()
+
+    def _mark_synced(self, conn, version):
+        # Runs inside _write, which bumps the version once more on commit
+        current = int(self._get_state(conn, "version") or 0)
+        self._set_state(conn, "synced_version", str(current + 1 if current == version else version))
+
+    def import_excel(self):
+        # Replaces every sheet with the workbook's, dropping edits made since the last sync
+        sheets = self.workbook_loader(self.excel_path)
+        mtime_ns = os.stat(self.excel_path).st_mtime_ns
+
+        def run(conn):
+            for name, df in sheets.items():
+                self._create_sheet(conn, name, df)
+            self._set_state(conn, "excel_mtime_ns", str(mtime_ns))
+            self._mark_synced(conn, int(self._get_state(conn, "version") or 0))
+        self._write(run)
+
+    def export_excel(self, path=None):
+        path = path or self.excel_path
+        version = self.version()
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            for name in self.sheet_names():
+                self.read_sheet(name).to_excel(writer, sheet_name=name, index=False)
+        if os.path.abspath(path) == self.excel_path:
+            # The workbook now matches the database, except for writes made while it was written
+            def run(conn):
+                self._set_state(conn, "excel_mtime_ns", str(os.stat(path).st_mtime_ns))
+                self._mark_synced(conn, version)
+            self._write(run)
+
+    # ---------------- reads ----------------
+    def version(self, sheet=None):
+        # Store-wide write counter, or the counter of writes to one sheet
+        conn = self._connect()
+        if sheet is not None:
+            return self._sheet_version(conn, sheet)
+        return int(self._get_state(conn, "version") or 0)
+
+    def sheet_names(self):
+        return [row[0] for row in self._connect().execute(f"SELECT name FROM {META_TABLE} ORDER BY rowid")]
+
+    def _meta(self, conn, sheet):
+        row = conn.execute(f"SELECT columns, types FROM {META_TABLE} WHERE name = ?", (sheet,)).fetchone()
+        if row is None:
+            raise ValueError(f"Worksheet named '{sheet}' not found")
+        return json.loads(row[0]), json.loads(row[1])
+
+    def _frame(self, conn, sheet, where="", params=()):
+        columns, types = self._meta(conn, sheet)
+        select = ", ".join([ROW_ID] + [_quote(col) for col in columns])
+        cursor = conn.execute(f"SELECT {select} FROM {_table(sheet)} {where}", params)
+        rows = cursor.fetchall()
+        df = pd.DataFrame.from_records(rows, columns=[ROW_ID] + columns).set_index(ROW_ID)
+        for col in columns:
+            if types.get(col) == DATETIME:
+                df[col] = pd.to_datetime(df[col])
+            elif df[col].dtype == object:
+                # Empty columns come back from Excel as float NaN, so do the same here
+                df[col] = df[col].astype("float64") if df[col].isna().all() else df[col].infer_objects()
+        return df
+
+    def read_sheet(self, sheet):
+        return self._frame(self._connect(), sheet, f"ORDER BY {ROW_ID}")
+
+    # ---------------- queries ----------------
+    def ensure_index(self, sheet, columns):
+        # Secondary index on columns; dropped with the table when the sheet is rewritten and
+        # recreated on the next query. Indexes don't change the data, so no version is bumped.
+        name = "index:" + sheet + ":" + ",".join(columns)
+        conn = self._connect()
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone() is None:
+            with self._lock:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_table(sheet)} "
+                             f"({', '.join(_quote(col) for col in columns)})")
+
+    def _filters(self, conn, sheet, terms=None, search_columns=None, equals=None):
+        # WHERE clause: every term (case-insensitive substring) in one of search_columns, and
+        # each column of equals holding its value
+        columns, _ = self._meta(conn, sheet)
+        clauses, params = [], []
+        for col, value in (equals or {}).items():
+            clauses.append(f"{_quote(col)} = ?")
+            params.append(to_sql_value(value))
+        searched = [col for col in (search_columns or columns) if col in columns]
+        for term in terms or []:
+            if not searched:
+                clauses.append("0")  # none of search_columns is in the sheet, so no row matches
+                continue
+            # LIKE ignores case for ASCII letters only; other terms are matched against the
+            # Unicode-lowercased cells
+            ascii_only = term.isascii()
+            cells = [_quote(col) if ascii_only else f"{LOWER_FUNCTION}({_quote(col)})" for col in searched]
+            term = term if ascii_only else term.lower()
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(" + " OR ".join(f"{cell} LIKE ? ESCAPE '\\'" for cell in cells) + ")")
+            params.extend([pattern] * len(searched))
+        return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query_sheet(self, sheet, order_by=(), descending=False, limit=None, offset=0, terms=None,
+                    search_columns=None, equals=None):
+        # One window of the sheet, filtered and ordered in SQLite
+        conn = self._connect()
+        where, params = self._filters(conn, sheet, terms, search_columns, equals)
+        direction = " DESC" if descending else ""
+        order = ", ".join([_quote(col) + direction for col in order_by] + [ROW_ID + direction])
+        window = ""
+        if limit is not None:
+            window = "LIMIT ? OFFSET ?"
+            params = params + [int(limit), int(offset)]
+        return self._frame(conn, sheet, f"{where} ORDER BY {order} {window}", params)
+
+    def count_rows(self, sheet, terms=None, search_columns=None, equals=None):
+        conn = self._connect()
+        where, params = self._filters(conn, sheet, terms, search_columns, equals)
+        return conn.execute(f"SELECT COUNT(*) FROM {_table(sheet)} {where}", params).fetchone()[0]
+
+    def distinct_values(self, sheet, column):
+        conn = self._connect()
+        self._meta(conn, sheet)
+        return [row[0] for row in conn.execute(f"SELECT DISTINCT {_quote(column)} FROM {_table(sheet)} "
+                                               f"WHERE {_quote(column)} IS NOT NULL ORDER BY 1")]
+
+    # ---------------- writes ----------------
+    def _create_sheet(self, conn, sheet, df, keep_ids=False):
+        conn.execute(f"DROP TABLE IF EXISTS {_table(sheet)}")
+        cols = "".join(f", {_quote(col)}" for col in df.columns)
+        conn.execute(f"CREATE TABLE {_table(sheet)} ({ROW_ID} INTEGER PRIMARY KEY{cols})")
+        conn.execute(f"INSERT INTO {META_TABLE} VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE SET "
+                     f"columns = excluded.columns, types = excluded.types",
+                     (sheet, json.dumps([str(c) for c in df.columns]), json.dumps(_column_types(df))))
+        self._touch(conn, sheet)
+        if keep_ids:
+            self._insert(conn, sheet, df.columns, _row_values(df), ids=[int(i) for i in df.index])
+        else:
+            self._insert(conn, sheet, df.columns, _row_values(df))
+
+    # The sheet's version changes only when rows are actually written, so a save that changes
+    # nothing keeps the caches keyed by it
+    def _insert(self, conn, sheet, columns, rows, ids=None):
+        if len(rows) == 0:
+            return
+        self._touch(conn, sheet)
+        names = ", ".join(_quote(col) for col in columns)
+        marks = ", ".join("?" for _ in columns)
+        if ids is None:
+            conn.executemany(f"INSERT INTO {_table(sheet)} ({names}) VALUES ({marks})", rows)
+        else:
+            conn.executemany(f"INSERT INTO {_table(sheet)} ({ROW_ID}, {names}) VALUES (?, {marks})",
+                             [(row_id,) + row for row_id, row in zip(ids, rows)])
+
+    def _update(self, conn, sheet, columns, updates):
+        if len(updates) == 0:
+            return
+        self._touch(conn, sheet)
+        assignments = ", ".join(f"{_quote(col)} = ?" for col in columns)
+        conn.executemany(f"UPDATE {_table(sheet)} SET {assignments} WHERE {ROW_ID} = ?",
+                         [row + (row_id,) for row_id, row in updates])
+
+    def _delete(self, conn, sheet, ids):
+        if len(ids) == 0:
+            return
+        self._touch(conn, sheet)
+        conn.executemany(f"DELETE FROM {_table(sheet)} WHERE {ROW_ID} = ?", [(int(i),) for i in ids])
+
+    def _stored_rows(self, conn, sheet, columns, ids=None):
+        # All rows, or only the given ids (so saving one page of a large sheet reads just that page)
+        select = f"SELECT {', '.join([ROW_ID] + [_quote(col) for col in columns])} FROM {_table(sheet)}"
+        if ids is None:
+            return {row[0]: tuple(row[1:]) for row in conn.execute(select)}
+        ids = sorted(ids)
+        stored = {}
+        for start in range(0, len(ids), ID_CHUNK):
+            chunk = ids[start:start + ID_CHUNK]
+            marks = ", ".join("?" for _ in chunk)
+            for row in conn.execute(f"{select} WHERE {ROW_ID} IN ({marks})", chunk):
+                stored[row[0]] = tuple(row[1:])
+        return stored
+
+    def save_sheet(self, sheet, df, base=None):
+        # Make the sheet hold df, writing only the rows that differ. When df is indexed by ROW_ID
+        # (as load_data returns it) rows are matched by id; with base, the frame the edit started
+        # from, only rows changed relative to base are written, so concurrent edits of other
+        # rows survive. Otherwise rows are matched by content.
+        def run(conn):
+            try:
+                columns, _ = self._meta(conn, sheet)
+            except ValueError:
+                columns = None
+            if columns != [str(c) for c in df.columns]:
+                self._create_sheet(conn, sheet, df, keep_ids=df.index.name == ROW_ID and _valid_ids(df.index))
+                return {"inserted": len(df), "updated": 0, "deleted": 0, "rewritten": True}
+            if df.index.name == ROW_ID:
+                return self._save_by_id(conn, sheet, df, base)
+            return self._save_by_content(conn, sheet, df)
+        return self._write(run)
+
+    def _save_by_id(self, conn, sheet, df, base):
+        if base is not None:
+            reference = dict(zip(_int_ids(base.index), _row_values(base[df.columns])))
+            ids = (set(_int_ids(df.index)) | set(reference)) - {None}
+            stored = self._stored_rows(conn, sheet, df.columns, ids)
+        else:
+            stored = self._stored_rows(conn, sheet, df.columns)
+            reference = stored
+        inserts, updates, seen = [], [], set()
+        for row_id, values in zip(df.index, _row_values(df)):
+            row_id = _as_id(row_id)
+            if row_id is not None and row_id not in stored and reference.get(row_id) == values:
+                continue  # deleted by someone else since base was loaded, and not edited here
+            if row_id is None or row_id not in stored or row_id not in reference:
+                # With base, an id outside it is not one this edit started from (an editor can
+                # number an added row like a row of another page), so the row is new
+                inserts.append(values)
+                continue
+            seen.add(row_id)
+            if reference.get(row_id) != values:
+                updates.append((row_id, values))
+        deletes = [row_id for row_id in reference if row_id not in seen and row_id in stored]
+        self._insert(conn, sheet, df.columns, inserts)
+        self._update(conn, sheet, df.columns, updates)
+        self._delete(conn, sheet, deletes)
+        return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes), "rewritten": False}
+
+    def _save_by_content(self, conn, sheet, df):
+        available = defaultdict(list)
+        for row_id, values in self._stored_rows(conn, sheet, df.columns).items():
+            available[values].append(row_id)
+        inserts = []
+        for values in _row_values(df):
+            if available.get(values):
+                available[values].pop()
+            else:
+                inserts.append(values)
+        deletes = [row_id for ids in available.values() for row_id in ids]
+        self._insert(conn, sheet, df.columns, inserts)
+        self._delete(conn, sheet, deletes)
+        return {"inserted": len(inserts), "updated": 0, "deleted": len(deletes), "rewritten": False}
+
+    def append_rows(self, sheet, df):
+        # Returns the rows inserted and the sheet's version before and after, read in the same
+        # transaction, so callers can tell whether anyone else wrote to the sheet in between
+        def run(conn):
+            previous = self._sheet_version(conn, sheet)
+            try:
+                columns, types = self._meta(conn, sheet)
+            except ValueError:
+                self._create_sheet(conn, sheet, df.iloc[0:0])
+                columns, types = self._meta(conn, sheet)
+            added = [col for col in df.columns if str(col) not in columns]
+            if added:
+                # New columns are added to the sheet (empty in its existing rows), not dropped
+                self._touch(conn, sheet)
+                for col in added:
+                    conn.execute(f"ALTER TABLE {_table(sheet)} ADD COLUMN {_quote(col)}")
+                columns = columns + [str(col) for col in added]
+                types.update(_column_types(df[added]))
+                conn.execute(f"UPDATE {META_TABLE} SET columns = ?, types = ? WHERE name = ?",
+                             (json.dumps(columns), json.dumps(types), sheet))
+            aligned = df.rename(columns=str).reindex(columns=columns)
+            self._insert(conn, sheet, columns, _row_values(aligned))
+            return {"inserted": len(aligned), "previous_version": previous, "version": self._sheet_version(conn, sheet)}
+        return self._write(run)
+
+    def update_row(self, sheet, row_id, values):
+        def run(conn):
+            self._meta(conn, sheet)
+            self._update(conn, sheet, list(values), [(int(row_id), tuple(to_sql_value(v) for v in values.values()))])
+        self._write(run)
+
+    def delete_rows(self, sheet, row_ids):
+        def run(conn):
+            self._meta(conn, sheet)
+            self._delete(conn, sheet, row_ids)
+        self._write(run)
+
+
+def _as_id(value):
+    if value is None or pd.isna(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int_ids(index):
+    return [_as_id(value) for value in index]
+
+
+def _valid_ids(index):
+    ids = _int_ids(index)
+    return None not in ids and len(set(ids)) == len(ids)
@@ -0,0 +1,81 @@
+import streamlit as st
+import numpy as np
+from modules.search_engine import TableSearch, cell_text, get_table_search, split_terms
+from modules import perf
+
+# Paginated tables: filtering, sorting and slicing happen here on the server, and only the rows
+# of the current page are handed to st.dataframe / st.data_editor. Frames keep their index, so
+# pages of a load_data frame stay keyed by _row_id and can be saved with save_data(base=page).
+PAGE_SIZES = [25, 50, 100, 250, 1000]
+DEFAULT_PAGE_SIZE = 50
+NO_SORT = "(stored order)"
+
+
+def sort_positions(df, positions, column, ascending=True):
+    values = df[column].iloc[positions].reset_index(drop=True)
+    try:
+        order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index
+    except TypeError:
+        # Mixed types (numbers and text in one column) sort by their displayed text
+        order = cell_text(values).sort_values(ascending=ascending, kind="stable").index
+    return positions[order.to_numpy()]
+
+
+@perf.timed("table.filter_sort")
+def visible_positions(df, key, search_key=None, filterable=True):
+    # Draws the filter/sort/paging controls; returns the positions of the rows on the current page
+    columns = st.columns([3, 2, 1, 1, 1])
+    query = columns[0].text_input("Filter rows", key=f"{key}_filter") if filterable else ""
+    sort_column = columns[1].selectbox("Sort by", [NO_SORT] + [str(c) for c in df.columns], key=f"{key}_sort")
+    descending = columns[2].checkbox("Descending", key=f"{key}_desc")
+    page_size = columns[3].selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE),
+                                     key=f"{key}_size")
+
+    positions = np.arange(len(df))
+    terms = split_terms(query) if query else []
+    if terms:
+        search = get_table_search(search_key, df) if search_key is not None else TableSearch(df)
+        positions = np.flatnonzero(search.match_terms(terms))
+    if sort_column != NO_SORT:
+        positions = sort_positions(df, positions, df.columns[[str(c) for c in df.columns].index(sort_column)],
+                                   ascending=not descending)
+
+    pages = max(1, -(-len(positions) // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = columns[4].number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (int(page) - 1) * page_size
+    window = positions[start:start + page_size]
+    if len(positions):
+        st.caption(f"Rows {start + 1}–{start + len(window)} of {len(positions)}"
+                   + (f" (filtered from {len(df)})" if len(positions) != len(df) else ""))
+    return window
+
+
+def show_table(df, key, search_key=None, filterable=True, **kwargs):
+    # Read-only paginated view; returns the frame of the rows on screen
+    page = df.iloc[visible_positions(df, key, search_key, filterable)]
+    st.dataframe(page, **kwargs)
+    return page
+
+
+def edit_table(df, key, search_key=None, **kwargs):
+    # Editable paginated view; returns (edited page, page as shown). Saving the edited page with
+    # save_data(edited, sheet, base=page) writes only this page's changes: rows added here are
+    # inserted, rows removed here are deleted, and rows on other pages are left untouched.
+    page = df.iloc[visible_positions(df, key, search_key)]
+    # The editor keeps its edits by row position, so every distinct page gets its own widget state
+    editor_key = f"{key}_editor_{hash(tuple(page.index))}"
+    edited = st.data_editor(page.reset_index(drop=True), key=editor_key, **kwargs)
+    return _restore_index(edited, page.index), page
+
+
+def _restore_index(edited, index):
+    # The editor sees positions 0..n-1, so the rows it adds (numbered n, n+1, ...) can't be taken
+    # for stored rows of other pages; kept rows get their index back and added ones a "new-k" label
+    labels = index.tolist()
+    edited = edited.copy(deep=False)
+    edited.index = [labels[i] if 0 <= i < len(labels) else f"new-{i - len(labels)}" for i in edited.index]
+    edited.index.name = index.name
+    return edited
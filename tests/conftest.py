@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Lets `pytest` run from any directory import the dashboard's modules package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,101 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from modules.concentration import COLUMNS, TOP_N, ConcentrationTracker, concentration, grouped_concentration
+
+
+def _brute_force(values):
+    # Definitions straight from the textbook: Gini as the mean absolute difference over twice the
+    # mean, HHI as the sum of squared percentage shares, CRn as the share of the n largest
+    values = [v for v in values if not math.isnan(v)]
+    total = sum(values)
+    stats = {"companies": len(values), "total": total}
+    if not values or total == 0:
+        return dict(stats, gini=math.nan, hhi=math.nan, **{f"cr{n}": math.nan for n in TOP_N})
+    n = len(values)
+    stats["gini"] = sum(abs(a - b) for a in values for b in values) / (2 * n * n * (total / n))
+    stats["hhi"] = sum((100 * v / total) ** 2 for v in values)
+    for top in TOP_N:
+        stats[f"cr{top}"] = sum(sorted(values, reverse=True)[:top]) / total
+    return stats
+
+
+def _brute_force_grouped(values, groups):
+    by_group = {}
+    for value, group in zip(values, groups):
+        if group is not None and not pd.isna(group):
+            by_group.setdefault(group, []).append(value)
+    # Every group with a row is listed, also when none of its capacities are known
+    labels = sorted(by_group)
+    return pd.DataFrame([_brute_force(by_group[group]) for group in labels],
+                        index=pd.Index(labels, name="group"), columns=COLUMNS)
+
+
+def _data(seed, n=400):
+    rng = np.random.default_rng(seed)
+    values = np.round(rng.lognormal(3, 1.5, n), 1)
+    values[rng.random(n) < 0.1] = np.nan
+    values[rng.random(n) < 0.05] = 0.0
+    groups = rng.choice(np.array(["China", "Japan", "Korea", "USA", "Germany", "Tiny", None], dtype=object), n,
+                        p=[0.4, 0.2, 0.15, 0.1, 0.1, 0.01, 0.04])
+    return values, groups
+
+
+def _assert_same(result, expected):
+    result = result.set_axis(result.index.astype(object))
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False, check_index_type=False, rtol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_concentration_matches_brute_force(seed):
+    values, _ = _data(seed)
+    result = concentration(values)
+    expected = _brute_force(values.tolist())
+    assert result.keys() == expected.keys()
+    np.testing.assert_allclose([result[c] for c in COLUMNS], [expected[c] for c in COLUMNS], rtol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("categorical", [False, True], ids=["object", "categorical"])
+def test_grouped_concentration_matches_brute_force(seed, categorical):
+    values, groups = _data(seed)
+    groups = pd.Series(groups, dtype="category" if categorical else object)
+    _assert_same(grouped_concentration(values, groups), _brute_force_grouped(values, groups))
+
+
+def test_small_and_empty_groups():
+    values = np.array([5.0, 0.0, 0.0, np.nan, 7.0, 1.0, 2.0])
+    groups = np.array(["one", "zeros", "zeros", "missing", "one", None, "two"], dtype=object)
+    result = grouped_concentration(values, groups)
+    _assert_same(result, _brute_force_grouped(values, groups))
+    assert result.loc["zeros", "companies"] == 2 and math.isnan(result.loc["zeros", "gini"])
+    assert result.loc["missing", "companies"] == 0
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_tracker_updates_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    values, groups = _data(seed)
+    keys = np.arange(len(values)) * 2
+    tracker = ConcentrationTracker(values, groups, keys)
+    for _ in range(5):
+        # A few companies change capacity or country, some leave and some join
+        values, groups, keys = values.copy(), groups.copy(), keys.copy()
+        changed = rng.choice(len(values), 10, replace=False)
+        values[changed[:6]] = np.where(rng.random(6) < 0.3, np.nan, np.round(rng.lognormal(3, 1.5, 6), 1))
+        groups[changed[6:]] = rng.choice(np.array(["China", "USA", "New", None], dtype=object), 4)
+        keep = np.ones(len(values), dtype=bool)
+        keep[rng.choice(len(values), 3, replace=False)] = False
+        values = np.append(values[keep], [12.5, np.nan])
+        groups = np.append(groups[keep], np.array(["Japan", "Korea"], dtype=object))
+        keys = np.append(keys[keep], [keys.max() + 1, keys.max() + 3])
+
+        tracker = tracker.updated(values, groups, keys)
+        expected = _brute_force_grouped(values, groups)
+        _assert_same(tracker.table(expected.index), expected)
+        _assert_same(tracker.table(expected.index), grouped_concentration(values, groups))
+
+    ungrouped = ConcentrationTracker(values).updated(values[::-1], keys=keys[::-1])
+    expected = _brute_force(values.tolist())
+    np.testing.assert_allclose([ungrouped.stats()[c] for c in COLUMNS], [expected[c] for c in COLUMNS], rtol=1e-9)
@@ -0,0 +1,19 @@
+import pandas as pd
+import pyarrow as pa
+from modules.patent_store import tables_to_frame
+
+
+def test_tables_to_frame_widens_integers_to_doubles():
+    # One blank cell makes an export's column double while another export's stays integer
+    frame = tables_to_frame([pa.table({"Number": pa.array([1, 2]), "Title": ["a", "b"]}),
+                             pa.table({"Number": pa.array([1.5, None])})])
+    assert frame["Number"].tolist()[:3] == [1.0, 2.0, 1.5]
+    assert pd.isna(frame["Number"].iloc[3])
+    assert frame["Title"].tolist()[:2] == ["a", "b"]
+
+
+def test_tables_to_frame_turns_numbers_mixed_with_text_into_text():
+    frame = tables_to_frame([pa.table({"Number": pa.array([1, 2]), "Other": pa.array([1, 2])}),
+                             pa.table({"Number": pa.array(["A1"]), "Other": pa.array([None], type=pa.null())})])
+    assert frame["Number"].tolist() == ["1", "2", "A1"]
+    assert frame["Other"].iloc[:2].tolist() == [1, 2]
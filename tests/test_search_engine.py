@@ -0,0 +1,67 @@
+import re
+import numpy as np
+import pandas as pd
+import pytest
+from modules.search_engine import TableSearch, split_terms
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    words = ["Lithium", "LiPF6", "electrolyte", "Salt", "ÉLAN", "straße", "Co., Ltd", "", None]
+    n = 300
+    return pd.DataFrame({
+        "Company": rng.choice(np.array(words, dtype=object), n),
+        "Country": pd.Series(rng.choice(["China", "Japan", "Korea", "USA"], n), dtype="category"),
+        "Capacity": np.where(rng.random(n) < 0.2, np.nan, rng.integers(0, 5000, n) / 4),
+        "Plants": rng.integers(0, 30, n),
+        "Founded": pd.to_datetime(rng.integers(0, 2_000_000_000, n), unit="s"),
+        "Mixed": pd.Series(rng.choice(np.array([1, 2.5, "x1", None, True], dtype=object), n), dtype=object),
+    })
+
+
+# The row-wise matching the searches used before TableSearch
+def _apply_all_columns(df, terms, mode):
+    combine = all if mode == "all" else any
+    return df.apply(lambda row: combine(any(term in str(cell).lower() for cell in row) for term in terms),
+                    axis=1).to_numpy(dtype=bool)
+
+
+def _apply_column(df, column, terms, mode):
+    combine = all if mode == "all" else any
+    return df[column].astype(object).map(str).apply(
+        lambda cell: combine(term in cell.lower() for term in terms)).to_numpy(dtype=bool)
+
+
+QUERIES = ["li", "lithium, china", "Co., 5", "ß", "élan, japan", "nan", "none", "1999", "2.5, true", "x, y, z", "t"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("mode", ["all", "any"])
+def test_match_terms_matches_apply(df, query, mode):
+    search = TableSearch(df)
+    terms = split_terms(query)
+    np.testing.assert_array_equal(search.match_terms(terms, mode=mode), _apply_all_columns(df, terms, mode))
+    for column in df.columns:
+        np.testing.assert_array_equal(search.match_terms(terms, column=column, mode=mode),
+                                      _apply_column(df, column, terms, mode), err_msg=column)
+
+
+def test_terms_do_not_match_across_cells():
+    df = pd.DataFrame({"A": ["lith"], "B": ["ium"]})
+    assert not TableSearch(df).match_terms(["lithium"])[0]
+    assert not _apply_all_columns(df, ["lithium"], "all")[0]
+
+
+def _pattern_matches(pattern, text):
+    # Regular expression when the pattern compiles, plain substring otherwise
+    try:
+        return re.search(pattern, text, re.IGNORECASE) is not None
+    except re.error:
+        return pattern.lower() in text.lower()
+
+
+@pytest.mark.parametrize("pattern", ["^li", "f6$", "1\\d", "nan", "[unclosed"])
+def test_match_pattern_matches_re(df, pattern):
+    expected = df.apply(lambda row: any(_pattern_matches(pattern, str(cell)) for cell in row), axis=1)
+    np.testing.assert_array_equal(TableSearch(df).match_pattern(pattern), expected.to_numpy(dtype=bool))
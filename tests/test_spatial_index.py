@@ -0,0 +1,98 @@
+import math
+import numpy as np
+import pytest
+from modules.spatial_index import EARTH_RADIUS_KM, SpatialIndex
+
+
+def _distance(lat1, lon1, lat2, lon2):
+    # Great-circle distance by the spherical law of cosines, independent of haversine_km
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    cos = math.sin(lat1) * math.sin(lat2) + math.cos(lat1) * math.cos(lat2) * math.cos(lon2 - lon1)
+    return EARTH_RADIUS_KM * math.acos(min(1.0, max(-1.0, cos)))
+
+
+def _brute_force(lat, lon, point):
+    # (position, distance) of every located site, nearest first
+    pairs = [(position, _distance(point[0], point[1], lat[position], lon[position]))
+             for position in range(len(lat)) if not (math.isnan(lat[position]) or math.isnan(lon[position]))]
+    return sorted(pairs, key=lambda pair: pair[1])
+
+
+@pytest.fixture
+def sites():
+    rng = np.random.default_rng(0)
+    n = 2000
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))  # uniform over the sphere, so some near the poles
+    lon = rng.uniform(-180, 180, n)
+    # Clusters at the antimeridian and the North Pole, and sites without coordinates
+    lat[:100], lon[:100] = rng.normal(10, 1, 100), rng.choice([-179.9, 179.9], 100) + rng.normal(0, 0.05, 100)
+    lat[100:150], lon[100:150] = rng.uniform(89, 90, 50), rng.uniform(-180, 180, 50)
+    lat[150:170] = np.nan
+    lon[160:180] = np.nan
+    return lat, lon
+
+
+POINTS = [(10.0, 180.0), (10.0, -179.95), (89.9, 0.0), (-89.5, 120.0), (0.0, 0.0), (51.5, -0.1), (35.0, 139.7)]
+
+
+@pytest.mark.parametrize("point", POINTS)
+@pytest.mark.parametrize("km", [1.0, 50.0, 500.0, 3000.0, 25000.0])
+def test_radius_matches_brute_force(sites, point, km):
+    lat, lon = sites
+    positions, distances = SpatialIndex(lat, lon).radius(point[0], point[1], km)
+    # Sites within a few metres of the edge may fall either way with rounding
+    expected = [position for position, distance in _brute_force(lat, lon, point) if distance <= km - 1e-6]
+    borderline = [position for position, distance in _brute_force(lat, lon, point) if abs(distance - km) <= 1e-6]
+    assert set(expected) <= set(positions.tolist()) <= set(expected) | set(borderline)
+    assert np.all(np.diff(distances) >= 0)
+    np.testing.assert_allclose(distances, [_distance(*point, lat[p], lon[p]) for p in positions], atol=1e-6)
+
+
+@pytest.mark.parametrize("point", POINTS)
+@pytest.mark.parametrize("k", [1, 5, 60, 3000])
+def test_nearest_matches_brute_force(sites, point, k):
+    lat, lon = sites
+    positions, distances = SpatialIndex(lat, lon).nearest(point[0], point[1], k)
+    expected = _brute_force(lat, lon, point)[:k]
+    assert positions.tolist() == [position for position, _ in expected]
+    np.testing.assert_allclose(distances, [distance for _, distance in expected], atol=1e-6)
+
+
+def test_nearest_excludes_the_centre(sites):
+    lat, lon = sites
+    index = SpatialIndex(lat, lon)
+    positions, _ = index.nearest(lat[500], lon[500], 5, exclude=500)
+    expected = [position for position, _ in _brute_force(lat, lon, (lat[500], lon[500])) if position != 500][:5]
+    assert positions.tolist() == expected
+
+
+@pytest.mark.parametrize("box", [(-10, -20, 30, 40), (0, 170, 20, -170), (80, -180, 90, 180), (5, 5, 5.5, 5.5)])
+def test_bbox_matches_brute_force(sites, box):
+    lat, lon = sites
+    south, west, north, east = box
+    in_lon = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+    expected = np.flatnonzero((lat >= south) & (lat <= north) & in_lon)
+    np.testing.assert_array_equal(SpatialIndex(lat, lon).bbox(*box), expected)
+
+
+def test_updated_matches_rebuilt_index(sites):
+    lat, lon = sites
+    ids = np.arange(len(lat)) * 3
+    index = SpatialIndex(lat, lon, ids)
+    rng = np.random.default_rng(1)
+    keep = np.sort(rng.choice(len(lat), len(lat) - 40, replace=False))
+    new_lat, new_lon, new_ids = lat[keep].copy(), lon[keep].copy(), ids[keep]
+    moved = rng.choice(len(keep), 60, replace=False)
+    new_lat[moved], new_lon[moved] = rng.uniform(-60, 60, 60), rng.uniform(-180, 180, 60)
+    new_lat[moved[:5]] = np.nan
+    new_lat = np.append(new_lat, [48.1, np.nan])
+    new_lon = np.append(new_lon, [11.6, 3.0])
+    new_ids = np.append(new_ids, [1, 2])
+
+    updated = index.updated(new_lat, new_lon, new_ids)
+    rebuilt = SpatialIndex(new_lat, new_lon, new_ids)
+    np.testing.assert_array_equal(updated.sorted_cells, rebuilt.sorted_cells)
+    np.testing.assert_array_equal(np.sort(updated.order), np.sort(rebuilt.order))
+    for point in POINTS:
+        np.testing.assert_array_equal(updated.radius(*point, 2000.0)[0], rebuilt.radius(*point, 2000.0)[0])
+        np.testing.assert_array_equal(updated.nearest(*point, 10)[0], rebuilt.nearest(*point, 10)[0])
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules.storage import SheetStore
+
+SHEET = "Companies"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SheetStore(tmp_path / "data.db", tmp_path / "missing.xlsx")
+    store.append_rows(SHEET, pd.DataFrame({"Company": [f"CO {i}" for i in range(20)], "Capacity": np.arange(20.0)}))
+    return store
+
+
+def test_save_without_changes_keeps_versions(store):
+    df = store.read_sheet(SHEET)
+    sheet_version, version = store.version(SHEET), store.version()
+    assert store.save_sheet(SHEET, df, base=df) == {"inserted": 0, "updated": 0, "deleted": 0, "rewritten": False}
+    assert store.save_sheet(SHEET, df) == {"inserted": 0, "updated": 0, "deleted": 0, "rewritten": False}
+    store.delete_rows(SHEET, [])
+    assert (store.version(SHEET), store.version()) == (sheet_version, version)
+
+    edited = df.copy()
+    edited.iloc[0, 0] = "RENAMED"
+    store.save_sheet(SHEET, edited, base=df)
+    assert store.version(SHEET) == sheet_version + 1
+    assert store.version() == version + 1
+
+
+def _rows(df):
+    # Brute-force view of a sheet: row id -> tuple of cells, NaN/NaT as None
+    return {int(row_id): tuple(None if pd.isna(v) else v for v in values)
+            for row_id, values in zip(df.index, df.itertuples(index=False, name=None))}
+
+
+def test_round_trip(tmp_path):
+    store = SheetStore(tmp_path / "data.db", tmp_path / "missing.xlsx")
+    df = pd.DataFrame({
+        "Company": ["A", "b", None, "Ünïcode"],
+        "Capacity": [1.5, np.nan, 3.0, 0.0],
+        "Plants": [1, 2, 3, 4],
+        "Founded": pd.to_datetime([pd.Timestamp(2001, 2, 3), None, pd.Timestamp(1999, 12, 31, 10, 30),
+                                    pd.Timestamp(2020, 1, 1)]),
+        "Notes": [np.nan] * 4,
+    })
+    store.append_rows(SHEET, df)
+    read = store.read_sheet(SHEET)
+    pd.testing.assert_frame_equal(read.reset_index(drop=True), df, check_dtype=False)
+    assert pd.api.types.is_datetime64_any_dtype(read["Founded"])
+    assert store.save_sheet(SHEET, read)["rewritten"] is False
+    assert _rows(store.read_sheet(SHEET)) == _rows(read)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("with_base", [True, False], ids=["base", "no base"])
+def test_save_by_id_matches_reference(store, seed, with_base):
+    rng = np.random.default_rng(seed)
+    base = store.read_sheet(SHEET)
+    edited = base.copy()
+    positions = rng.permutation(len(edited))
+    edited.iloc[positions[:4], 1] = rng.random(4)
+    edited = edited.drop(edited.index[positions[4:7]])
+    added = pd.DataFrame({"Company": ["NEW 1", "NEW 2"], "Capacity": [100.0, 101.0]},
+                         index=pd.Index([None, None], name=base.index.name))
+    edited = pd.concat([edited, added])
+
+    # Another writer changes rows this edit left alone, after base was read
+    store.update_row(SHEET, int(edited.index[0]), {"Company": "OTHER"})
+    store.append_rows(SHEET, pd.DataFrame({"Company": ["OTHER NEW"], "Capacity": [-1.0]}))
+    current = _rows(store.read_sheet(SHEET))
+
+    expected = dict(current)
+    for row_id in set(_rows(base)) - set(_rows(edited.iloc[:-2])):
+        del expected[row_id]
+    for row_id, values in _rows(edited.iloc[:-2]).items():
+        if not with_base or values != _rows(base)[row_id]:
+            expected[row_id] = values
+    if not with_base:
+        # Without base the frame is the whole sheet, so the other writer's new row goes
+        expected = {row_id: values for row_id, values in expected.items() if row_id in _rows(edited.iloc[:-2])}
+
+    result = store.save_sheet(SHEET, edited, base=base if with_base else None)
+    saved = _rows(store.read_sheet(SHEET))
+    new = {row_id: values for row_id, values in saved.items() if row_id not in expected}
+    assert {row_id: saved.get(row_id) for row_id in expected} == expected
+    assert sorted(new.values()) == [("NEW 1", 100.0), ("NEW 2", 101.0)]
+    assert result["inserted"] == 2
+    assert result["deleted"] == len(set(current) - set(expected))
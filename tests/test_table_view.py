@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from modules import table_view
+from modules.storage import SheetStore
+
+SHEET = "Companies"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SheetStore(tmp_path / "data.db", tmp_path / "missing.xlsx")
+    store.append_rows(SHEET, pd.DataFrame({"Company": [f"CO {i}" for i in range(100)], "Capacity": np.arange(100.0)}))
+    return store
+
+
+def _editor_adding(company):
+    # Like st.data_editor with num_rows="dynamic": an added row is numbered after the largest index
+    def data_editor(frame, key=None, **kwargs):
+        added = pd.DataFrame({"Company": [company], "Capacity": [1.0]}, index=[frame.index.max() + 1])
+        return pd.concat([frame, added])
+    return data_editor
+
+
+@pytest.mark.parametrize("positions", [np.arange(50), np.array([3, 10, 70])], ids=["first page", "filtered"])
+def test_row_added_in_editor_is_inserted(store, monkeypatch, positions):
+    df = store.read_sheet(SHEET)
+    monkeypatch.setattr(table_view, "visible_positions", lambda *args, **kwargs: positions)
+    monkeypatch.setattr(table_view.st, "data_editor", _editor_adding("NEW CO"))
+    edited, page = table_view.edit_table(df, "companies", num_rows="dynamic")
+
+    assert store.save_sheet(SHEET, edited, base=page) == {"inserted": 1, "updated": 0, "deleted": 0, "rewritten": False}
+    after = store.read_sheet(SHEET)
+    pd.testing.assert_frame_equal(after.loc[df.index], df)
+    assert after["Company"].tolist()[-1] == "NEW CO"
+
+
+def test_edited_rows_keep_their_ids(store, monkeypatch):
+    df = store.read_sheet(SHEET)
+    monkeypatch.setattr(table_view, "visible_positions", lambda *args, **kwargs: np.array([5, 60]))
+
+    def data_editor(frame, key=None, **kwargs):
+        frame = frame.copy()
+        frame.loc[1, "Company"] = "RENAMED"
+        return frame.drop(index=0)
+    monkeypatch.setattr(table_view.st, "data_editor", data_editor)
+    edited, page = table_view.edit_table(df, "companies", num_rows="dynamic")
+
+    assert store.save_sheet(SHEET, edited, base=page) == {"inserted": 0, "updated": 1, "deleted": 1, "rewritten": False}
+    after = store.read_sheet(SHEET)
+    assert df.index[5] not in after.index
+    assert after.loc[df.index[60], "Company"] == "RENAMED"
+    assert len(after) == 99
+
+
+def test_id_outside_base_is_inserted_not_updated(store):
+    # A row labelled with the id of a stored row the edit didn't start from must not overwrite it
+    df = store.read_sheet(SHEET)
+    page = df.iloc[:50]
+    edited = pd.concat([page, pd.DataFrame({"Company": ["NEW CO"], "Capacity": [1.0]}, index=[df.index[50]])])
+    edited.index.name = page.index.name
+
+    assert store.save_sheet(SHEET, edited, base=page)["inserted"] == 1
+    assert store.read_sheet(SHEET).loc[df.index[50], "Company"] == "CO 50"